@@ -1,27 +1,46 @@
 """Xiaomi Car Air Purifier BLE Integration for Home Assistant."""
 from __future__ import annotations
 
+import importlib
 import logging
-from typing import Any
-
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
+from types import ModuleType
+from typing import TYPE_CHECKING
 
 from .const import DOMAIN
-from .coordinator import XiaomiCarAirPurifierCoordinator
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.FAN]
+# Platform.SENSOR and Platform.FAN. Home Assistant is imported lazily so the
+# BLE client can be used without it, e.g. by tools/cli.py.
+PLATFORMS: list[str] = ["sensor", "fan"]
+
+
+async def _async_import(hass: HomeAssistant, name: str) -> ModuleType:
+    """Import one of the integration's modules in Home Assistant's import executor.
+
+    The coordinator pulls in the BLE client and bleak, which must not be
+    imported on the event loop.
+    """
+    return await hass.async_add_import_executor_job(
+        importlib.import_module, f"{__name__}.{name}"
+    )
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Xiaomi Car Air Purifier from a config entry."""
+    from homeassistant.exceptions import ConfigEntryNotReady
+
+    coordinator_module = await _async_import(hass, "coordinator")
+    services_module = await _async_import(hass, "services")
+
     _LOGGER.debug("Setting up Xiaomi Car Air Purifier: %s", entry.unique_id)
 
-    coordinator = XiaomiCarAirPurifierCoordinator(hass, entry)
+    coordinator = coordinator_module.XiaomiCarAirPurifierCoordinator(hass, entry)
+    await coordinator.async_load_usage()
 
     try:
         await coordinator.async_config_entry_first_refresh()
@@ -31,6 +50,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    services_module.async_setup_services(hass)
 
     return True
 
@@ -38,7 +58,17 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
-        await coordinator.async_shutdown()
+        # The coordinator shuts itself down when the entry finishes unloading
+        hass.data[DOMAIN].pop(entry.entry_id)
+        if not hass.data[DOMAIN]:
+            from .services import async_unload_services
+
+            async_unload_services(hass)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the usage counters of a removed purifier."""
+    coordinator_module = await _async_import(hass, "coordinator")
+    await coordinator_module.usage_store(hass, entry).async_remove()
@@ -1,13 +1,14 @@
 """BLE Client for Xiaomi Car Air Purifier."""
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Awaitable, Callable
 import logging
-from typing import Any
+from typing import Any, TypeVar
 
 from bleak import BleakClient
 from bleak.backends.device import BLEDevice
 from bleak.exc import BleakError
-from bleak_retry_connector import establish_connection
 
 from .const import (
     MODE_CHAR_UUID,
@@ -17,112 +18,229 @@ from .const import (
     POWER_OFF,
     POWER_ON,
 )
+from .device_log import DeviceLogger, LazyHex
+from .gatt_log import (
+    OP_CONNECT,
+    OP_DISCONNECT,
+    OP_READ,
+    OP_WRITE,
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    OUTCOME_TIMEOUT,
+    GattRecorder,
+    short_uuid,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
+# Coroutine that opens a connected client for a device. Tools swap this out to
+# drive the integration against simulated or recorded transports.
+Connector = Callable[[BLEDevice], Awaitable[BleakClient]]
+
+
+def decode_status(char_uuid: str, value: bytes) -> dict[str, Any]:
+    """Return the status fields carried by a power or mode value."""
+    if char_uuid == POWER_CHAR_UUID:
+        return {"power": bool(value[0])}
+    if char_uuid == MODE_CHAR_UUID:
+        return {"mode": MODE_NAMES.get(value[0], "Unknown"), "mode_byte": value[0]}
+    return {}
+
+
+async def establish_bleak_connection(device: BLEDevice) -> BleakClient:
+    """Connect to the device through bleak-retry-connector."""
+    # Imported on first connect: it pulls in D-Bus and adapter helpers that
+    # the simulated transports and offline tools never need
+    from bleak_retry_connector import establish_connection
+
+    return await establish_connection(BleakClient, device, device.address)
+
 
 class XiaomiCarAirPurifierBLEClient:
     """BLE client for Xiaomi Car Air Purifier."""
 
-    def __init__(self, device: BLEDevice) -> None:
+    def __init__(
+        self,
+        device: BLEDevice,
+        connector: Connector | None = None,
+        recorder: GattRecorder | None = None,
+    ) -> None:
         """Initialize the BLE client."""
         self._device = device
         self._client: BleakClient | None = None
+        self._connector = connector or establish_bleak_connection
+        # When set, every GATT interaction is recorded for later replay
+        self.recorder = recorder
+        self.log = DeviceLogger(_LOGGER, device.address if device is not None else "unknown")
+
+    async def _recorded(
+        self,
+        op: int,
+        char_uuid: str | None,
+        operation: Awaitable[_T],
+        payload: bytes = b"",
+    ) -> _T:
+        """Await a GATT operation, recording its timing and outcome."""
+        recorder = self.recorder
+        if recorder is None:
+            return await operation
+
+        char = short_uuid(char_uuid) if char_uuid else 0
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            result = await operation
+        except (TimeoutError, asyncio.CancelledError) as err:
+            recorder.record(
+                op, OUTCOME_TIMEOUT, start, loop.time() - start, char, str(err).encode()
+            )
+            raise
+        except Exception as err:
+            recorder.record(
+                op, OUTCOME_ERROR, start, loop.time() - start, char, str(err).encode()
+            )
+            raise
+        if op == OP_READ:
+            payload = bytes(result)
+        recorder.record(op, OUTCOME_OK, start, loop.time() - start, char, payload)
+        return result
 
     async def connect(self) -> bool:
         """Connect to the device."""
         try:
-            _LOGGER.debug("Connecting to %s", self._device.address)
-            self._client = await establish_connection(
-                BleakClient, self._device, self._device.address
+            self.log.debug("Connecting")
+            self._client = await self._recorded(
+                OP_CONNECT, None, self._connector(self._device)
             )
-            _LOGGER.info("Connected to %s", self._device.address)
+            self.log.debug("Connected")
             return True
         except BleakError as err:
-            _LOGGER.error("Failed to connect: %s", err)
+            self.log.error("Failed to connect: %s", err)
             return False
 
     async def disconnect(self) -> None:
         """Disconnect from the device."""
         if self._client and self._client.is_connected:
             try:
-                await self._client.disconnect()
-                _LOGGER.info("Disconnected from %s", self._device.address)
+                await self._recorded(OP_DISCONNECT, None, self._client.disconnect())
+                self.log.debug("Disconnected")
             except BleakError as err:
-                _LOGGER.error("Error during disconnect: %s", err)
+                self.log.error("Error during disconnect: %s", err)
 
     async def get_status(self) -> dict[str, Any] | None:
         """Get device status by reading characteristics."""
         if not self._client or not self._client.is_connected:
-            _LOGGER.error("Not connected to device")
+            self.log.error("Not connected to device")
             return None
 
         try:
-            # Read power state
-            power_data = await self._client.read_gatt_char(POWER_CHAR_UUID)
-            power = bool(power_data[0])
-
-            # Read mode
-            mode_data = await self._client.read_gatt_char(MODE_CHAR_UUID)
-            mode_byte = mode_data[0]
-            mode_name = MODE_NAMES.get(mode_byte, "Unknown")
-
-            _LOGGER.debug(
+            status: dict[str, Any] = {}
+            for char_uuid in (POWER_CHAR_UUID, MODE_CHAR_UUID):
+                value = await self._recorded(
+                    OP_READ, char_uuid, self._client.read_gatt_char(char_uuid)
+                )
+                status.update(decode_status(char_uuid, value))
+
+            self.log.debug(
                 "Status read - Power: %s, Mode byte: 0x%02x (%s)",
-                "ON" if power else "OFF",
-                mode_byte,
-                mode_name,
+                "ON" if status["power"] else "OFF",
+                status["mode_byte"],
+                status["mode"],
             )
 
-            return {
-                "power": power,
-                "mode": mode_name,
-                "mode_byte": mode_byte,
-            }
+            return status
 
         except BleakError as err:
-            _LOGGER.error("Failed to read status: %s", err)
+            self.log.error("Failed to read status: %s", err)
             return None
 
     async def set_power(self, power: bool) -> bool:
         """Turn device on or off."""
         if not self._client or not self._client.is_connected:
-            _LOGGER.error("Not connected to device")
+            self.log.error("Not connected to device")
             return False
 
         try:
             data = POWER_ON if power else POWER_OFF
-            _LOGGER.debug("Setting power: %s (0x%02x)", "ON" if power else "OFF", data[0])
-            await self._client.write_gatt_char(POWER_CHAR_UUID, data)
+            self.log.debug("Setting power: %s (0x%02x)", "ON" if power else "OFF", data[0])
+            await self._recorded(
+                OP_WRITE,
+                POWER_CHAR_UUID,
+                self._client.write_gatt_char(POWER_CHAR_UUID, data),
+                data,
+            )
             return True
         except BleakError as err:
-            _LOGGER.error("Failed to set power: %s", err)
+            self.log.error("Failed to set power: %s", err)
             return False
 
     async def set_mode(self, mode_name: str) -> bool:
         """Set device mode."""
         if not self._client or not self._client.is_connected:
-            _LOGGER.error("Not connected to device")
+            self.log.error("Not connected to device")
             return False
 
         if mode_name not in MODE_VALUES:
-            _LOGGER.error("Invalid mode: %s", mode_name)
+            self.log.error("Invalid mode: %s", mode_name)
             return False
 
         try:
             mode_data = MODE_VALUES[mode_name]
-            _LOGGER.debug(
-                "Setting mode: %s (%s)",
-                mode_name,
-                " ".join(f"0x{b:02x}" for b in mode_data),
+            self.log.debug("Setting mode: %s (%s)", mode_name, LazyHex(mode_data))
+            await self._recorded(
+                OP_WRITE,
+                MODE_CHAR_UUID,
+                self._client.write_gatt_char(MODE_CHAR_UUID, mode_data),
+                mode_data,
             )
-            await self._client.write_gatt_char(MODE_CHAR_UUID, mode_data)
             return True
         except BleakError as err:
-            _LOGGER.error("Failed to set mode: %s", err)
+            self.log.error("Failed to set mode: %s", err)
             return False
 
+    async def write_and_verify(
+        self, char_uuid: str, data: bytes, status: dict[str, Any] | None = None
+    ) -> dict[str, Any] | None:
+        """Write a characteristic, read back only that one and merge it into ``status``.
+
+        The write is acknowledged by the device (write with response); the
+        read-back confirms it took effect. Returns the updated status, or
+        None if the write failed or the device reports a different value.
+        """
+        if not self._client or not self._client.is_connected:
+            self.log.error("Not connected to device")
+            return None
+
+        try:
+            await self._recorded(
+                OP_WRITE,
+                char_uuid,
+                self._client.write_gatt_char(char_uuid, data, response=True),
+                data,
+            )
+            value = await self._recorded(
+                OP_READ, char_uuid, self._client.read_gatt_char(char_uuid)
+            )
+        except BleakError as err:
+            self.log.error("Failed to write %s: %s", char_uuid, err)
+            return None
+
+        written = decode_status(char_uuid, data)
+        read_back = decode_status(char_uuid, value)
+        if read_back != written:
+            self.log.warning(
+                "Write to %s not applied: wrote %s, read back %s",
+                char_uuid,
+                LazyHex(data),
+                LazyHex(value),
+            )
+            return None
+        return {**(status or {}), **read_back}
+
     @property
     def is_connected(self) -> bool:
         """Return connection status."""
         return self._client is not None and self._client.is_connected
+
@@ -8,15 +8,40 @@ import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.components.bluetooth import (
+    BluetoothCallbackMatcher,
+    BluetoothChange,
+    BluetoothScanningMode,
     BluetoothServiceInfoBleak,
     async_discovered_service_info,
+    async_last_service_info,
+    async_register_callback,
 )
+from homeassistant.core import CALLBACK_TYPE, callback
 from homeassistant.data_entry_flow import FlowResult
 
-from .const import DOMAIN, CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
+from .const import (
+    DOMAIN,
+    CONF_CONNECT_WINDOW,
+    CONF_RECORD_GATT,
+    CONF_SCAN_INTERVAL,
+    CONF_STRUCTURED_LOG,
+    CONF_WORKER,
+    DEFAULT_CONNECT_WINDOW,
+    DEFAULT_SCAN_INTERVAL,
+)
+from .discovery import DiscoveryIndex, normalize_address
 
 _LOGGER = logging.getLogger(__name__)
 
+# Built once; only the picker of discovered devices depends on the flow
+MANUAL_SCHEMA = vol.Schema({vol.Required("address"): str})
+USER_MANUAL_SCHEMA = vol.Schema(
+    {vol.Required("device", description={"suggested_value": ""}): str}
+)
+SCAN_INTERVAL_VALIDATOR = vol.All(vol.Coerce(int), vol.Range(min=10, max=600))
+CONNECT_WINDOW_VALIDATOR = vol.All(vol.Coerce(int), vol.Range(min=0, max=120))
+DISCOVERY_MATCHER = BluetoothCallbackMatcher(connectable=True)
+
 
 class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Xiaomi Car Air Purifier."""
@@ -27,6 +52,8 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize the config flow."""
         self._discovery_info: BluetoothServiceInfoBleak | None = None
         self._discovered_devices: dict[str, BluetoothServiceInfoBleak] = {}
+        self._index = DiscoveryIndex()
+        self._unsub_discovery: CALLBACK_TYPE | None = None
 
     @staticmethod
     def async_get_options_flow(
@@ -64,6 +91,39 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             },
         )
 
+    @callback
+    def _async_discovered(
+        self, service_info: BluetoothServiceInfoBleak, change: BluetoothChange
+    ) -> None:
+        """Keep the discovery index current while the flow is open."""
+        self._index.update(service_info)
+
+    @callback
+    def _async_start_index(self) -> None:
+        """Index what is already discovered, then follow new advertisements."""
+        for service_info in async_discovered_service_info(self.hass):
+            self._index.update(service_info)
+        self._unsub_discovery = async_register_callback(
+            self.hass,
+            self._async_discovered,
+            DISCOVERY_MATCHER,
+            BluetoothScanningMode.PASSIVE,
+        )
+
+    @callback
+    def async_remove(self) -> None:
+        """Stop following advertisements when the flow goes away."""
+        if self._unsub_discovery is not None:
+            self._unsub_discovery()
+            self._unsub_discovery = None
+
+    @callback
+    def _async_last_service_info(
+        self, address: str
+    ) -> BluetoothServiceInfoBleak | None:
+        """Return the latest advertisement seen from a normalized address."""
+        return self._index.get(address) or async_last_service_info(self.hass, address)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -75,36 +135,21 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             # If manual input, validate MAC address format
             if address not in self._discovered_devices:
-                address = address.strip().upper()
-
-                # Validate MAC address format
-                import re
-                if not re.match(r'^([0-9A-F]{2}[:-]){5}([0-9A-F]{2})$', address):
+                address = normalize_address(address)
+                if address is None:
                     errors["device"] = "invalid_mac"
-                else:
-                    # Normalize MAC address format
-                    address = address.replace("-", ":")
 
             if not errors:
                 await self.async_set_unique_id(address, raise_on_progress=False)
                 self._abort_if_unique_id_configured()
 
-                # Try to get device info from discovered devices
-                if address in self._discovered_devices:
-                    self._discovery_info = self._discovered_devices[address]
-                    title = self._discovery_info.name or address
+                if discovery := self._async_last_service_info(address):
+                    self._discovery_info = discovery
+                    title = discovery.name or address
                 else:
-                    # Try to find in all discovered devices
-                    discovered = async_discovered_service_info(self.hass)
-                    for discovery in discovered:
-                        if discovery.address.upper() == address:
-                            self._discovery_info = discovery
-                            title = discovery.name or address
-                            break
-                    else:
-                        # Device not found, create entry anyway
-                        title = f"Xiaomi Car Purifier ({address})"
-                        _LOGGER.info("Creating entry for device not currently discovered: %s", address)
+                    # Device not found, create entry anyway
+                    title = f"Xiaomi Car Purifier ({address})"
+                    _LOGGER.info("Creating entry for device not currently discovered: %s", address)
 
                 return self.async_create_entry(
                     title=title,
@@ -112,55 +157,19 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     options={CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL},
                 )
 
-        # Rebuild discovered devices list every time to get fresh data
-        self._discovered_devices = {}
-        current_addresses = self._async_current_ids()
-
-        # Get ALL discovered Bluetooth devices (not just those matching our manifest)
-        # This allows users to manually select devices even if the name doesn't match our patterns
-        discovered = async_discovered_service_info(self.hass)
-
-        discovered_list = list(discovered)
-        _LOGGER.info(
-            "Scanning for devices: found %d total bluetooth devices",
-            len(discovered_list)
-        )
-
-        # Log first 30 discovered devices for debugging
-        for i, discovery in enumerate(discovered_list[:30], 1):
-            _LOGGER.info(
-                "  Device #%d: name='%s', address=%s",
-                i, discovery.name or "(no name)", discovery.address
-            )
-
-        # Filter and collect matching devices
-        for discovery in discovered_list:
-            # Skip already configured devices
-            if discovery.address in current_addresses:
-                _LOGGER.debug(
-                    "Skipping already configured device: %s (%s)",
-                    discovery.name or "(no name)", discovery.address
-                )
-                continue
-
-            # Include ALL devices with a name for manual selection
-            # This allows users to select even if the name pattern doesn't match exactly
-            if discovery.name:
-                _LOGGER.info(
-                    "Adding device to list: '%s' (%s)",
-                    discovery.name,
-                    discovery.address
-                )
-                self._discovered_devices[discovery.address] = discovery
-            else:
-                _LOGGER.debug(
-                    "Skipping device without name: %s",
-                    discovery.address
-                )
-
-        _LOGGER.info(
-            "Collected %d matching Xiaomi Car Air Purifier device(s)",
-            len(self._discovered_devices)
+        if self._unsub_discovery is None:
+            self._async_start_index()
+
+        # Best ranked devices first: purifier names, then the FFD0 service,
+        # then signal strength. Already configured devices are skipped.
+        self._discovered_devices = {
+            discovery.address: discovery
+            for discovery in self._index.candidates(exclude=self._async_current_ids())
+        }
+        _LOGGER.debug(
+            "Offering %d of %d indexed bluetooth devices",
+            len(self._discovered_devices),
+            len(self._index),
         )
 
         # Build data schema based on discovered devices
@@ -170,7 +179,6 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 address: f"{discovery.name} ({address})"
                 for address, discovery in self._discovered_devices.items()
             }
-            _LOGGER.debug("Device options for dropdown: %s", device_options)
             data_schema = vol.Schema({
                 vol.Required("device"): vol.In(device_options)
             })
@@ -180,9 +188,7 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 "No Xiaomi Car Air Purifier devices found automatically. "
                 "Showing manual entry form. Check that device is powered on and in range."
             )
-            data_schema = vol.Schema({
-                vol.Required("device", description={"suggested_value": ""}): str
-            })
+            data_schema = USER_MANUAL_SCHEMA
 
         return self.async_show_form(
             step_id="user",
@@ -200,28 +206,20 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
-            address = user_input["address"].strip().upper()
+            address = normalize_address(user_input["address"])
 
-            # Validate MAC address format
-            import re
-            if not re.match(r'^([0-9A-F]{2}[:-]){5}([0-9A-F]{2})$', address):
+            if address is None:
                 errors["address"] = "invalid_mac"
             else:
-                # Normalize MAC address format
-                address = address.replace("-", ":")
-
                 await self.async_set_unique_id(address, raise_on_progress=False)
                 self._abort_if_unique_id_configured()
 
-                # Try to find the device in discovered devices
-                discovered = async_discovered_service_info(self.hass)
-                for discovery in discovered:
-                    if discovery.address.upper() == address:
-                        self._discovery_info = discovery
-                        return self.async_create_entry(
-                            title=discovery.name or address,
-                            data={},
-                        )
+                if discovery := self._async_last_service_info(address):
+                    self._discovery_info = discovery
+                    return self.async_create_entry(
+                        title=discovery.name or address,
+                        data={},
+                    )
 
                 # Device not found in discovery, but create entry anyway
                 # It may be powered off now but will connect later
@@ -233,11 +231,7 @@ class XiaomiCarAirPurifierConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         return self.async_show_form(
             step_id="manual",
-            data_schema=vol.Schema(
-                {
-                    vol.Required("address"): str,
-                }
-            ),
+            data_schema=MANUAL_SCHEMA,
             errors=errors,
         )
 
@@ -268,7 +262,25 @@ class XiaomiCarAirPurifierOptionsFlow(config_entries.OptionsFlow):
                     vol.Optional(
                         CONF_SCAN_INTERVAL,
                         default=current_scan_interval,
-                    ): vol.All(vol.Coerce(int), vol.Range(min=10, max=600))
+                    ): SCAN_INTERVAL_VALIDATOR,
+                    vol.Optional(
+                        CONF_RECORD_GATT,
+                        default=self.config_entry.options.get(CONF_RECORD_GATT, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_CONNECT_WINDOW,
+                        default=self.config_entry.options.get(
+                            CONF_CONNECT_WINDOW, DEFAULT_CONNECT_WINDOW
+                        ),
+                    ): CONNECT_WINDOW_VALIDATOR,
+                    vol.Optional(
+                        CONF_STRUCTURED_LOG,
+                        default=self.config_entry.options.get(CONF_STRUCTURED_LOG, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_WORKER,
+                        default=self.config_entry.options.get(CONF_WORKER, False),
+                    ): bool,
                 }
             ),
         )
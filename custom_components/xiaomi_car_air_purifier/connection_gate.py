@@ -0,0 +1,143 @@
+"""Connection pacing shared by every purifier of the integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import heapq
+import itertools
+import random
+
+from .const import CONNECT_BURST, CONNECT_RATE
+
+# Signal strengths mapped onto the jitter window, strongest first
+_RSSI_STRONG = -40
+_RSSI_WEAK = -90
+
+# Refills are floating point; a token due now may come out a hair short
+_TOKEN_TOLERANCE = 1e-9
+
+
+def signal_weakness(rssi: int | None) -> float:
+    """Return 0.0 for a strong signal up to 1.0 for a weak or unknown one."""
+    if rssi is None:
+        return 1.0
+    return min(1.0, max(0.0, (_RSSI_STRONG - rssi) / (_RSSI_STRONG - _RSSI_WEAK)))
+
+
+class ConnectionGate:
+    """Token bucket pacing connection attempts across all purifiers.
+
+    When Home Assistant or a Bluetooth adapter restarts, every purifier
+    connects at once and the adapter rejects most of the attempts. The gate
+    lets ``burst`` attempts through at once and then ``rate`` per second,
+    handing free tokens to the strongest waiting signal first. During a
+    storm, which starts at first use and again whenever attempts have to
+    queue, each purifier also waits a random delay within its connect
+    window, with weaker purifiers drawn later in the window. Fleets no
+    larger than one burst connect straight away.
+    """
+
+    def __init__(
+        self,
+        rate: float = CONNECT_RATE,
+        burst: int = CONNECT_BURST,
+        *,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.burst = burst
+        self._rng = rng or random.Random()
+        self._tokens = float(burst)
+        self._updated: float | None = None
+        self._storm_started: float | None = None
+        self._devices = 0
+        # (-rssi, arrival, future) of attempts waiting for a token
+        self._waiters: list[tuple[float, int, asyncio.Future[None]]] = []
+        self._arrivals = itertools.count()
+        self._release_handle: asyncio.TimerHandle | None = None
+
+    def add_device(self) -> Callable[[], None]:
+        """Count a purifier that connects through the gate; return its removal."""
+        self._devices += 1
+
+        def _remove() -> None:
+            self._devices -= 1
+
+        return _remove
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accrued since the last update."""
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def jitter(self, rssi: int | None, window: float, now: float) -> float:
+        """Return how long a purifier waits before queueing for a token."""
+        if (
+            self._devices <= self.burst
+            or self._storm_started is None
+            or now - self._storm_started >= window
+        ):
+            return 0.0
+        # Strong signals land in the first half of the window, weak ones in the second
+        offset = window * (signal_weakness(rssi) + self._rng.random()) / 2
+        return max(0.0, self._storm_started + offset - now)
+
+    async def async_acquire(self, rssi: int | None, window: float) -> float:
+        """Wait until a purifier may start connecting; return the seconds waited."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        if self._storm_started is None:
+            # Everything set up together at startup
+            self._storm_started = start
+        if (delay := self.jitter(rssi, window, start)) > 0:
+            await asyncio.sleep(delay)
+
+        now = loop.time()
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1 - _TOKEN_TOLERANCE:
+            self._tokens -= 1
+            return now - start
+
+        if now - self._storm_started >= window:
+            # Attempts are queueing again, e.g. after an adapter reset
+            self._storm_started = now
+        future: asyncio.Future[None] = loop.create_future()
+        heapq.heappush(
+            self._waiters,
+            (-rssi if rssi is not None else float("inf"), next(self._arrivals), future),
+        )
+        self._schedule_release(loop)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Cancelled after being handed a token: pass it on
+                self._tokens += 1
+                if self._waiters:
+                    if self._release_handle is not None:
+                        self._release_handle.cancel()
+                        self._release_handle = None
+                    self._schedule_release(loop)
+            raise
+        return loop.time() - start
+
+    def _schedule_release(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Wake the queue when the next token is due."""
+        if self._release_handle is None:
+            self._release_handle = loop.call_later(
+                max(0.0, (1 - self._tokens) / self.rate), self._release, loop
+            )
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Hand the available tokens to the strongest waiters."""
+        self._release_handle = None
+        self._refill(loop.time())
+        while self._waiters and self._tokens >= 1 - _TOKEN_TOLERANCE:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+        if self._waiters:
+            self._schedule_release(loop)
@@ -38,8 +38,69 @@ DEFAULT_SCAN_INTERVAL = 30  # seconds
 
 # Connection stability settings
 MAX_RETRIES = 3  # Number of retries for operations
+RETRY_DELAY = 1  # Seconds to wait before retrying an operation
 CONSECUTIVE_FAILURES_THRESHOLD = 5  # Number of consecutive failures before marking unavailable
 
+# Connection pacing across all purifiers, e.g. after a restart
+CONNECT_RATE = 2.0  # connection attempts per second, sustained
+CONNECT_BURST = 3  # connection attempts let through at once
+DEFAULT_CONNECT_WINDOW = 10  # seconds to spread a connection storm over
+DATA_CONNECTION_GATE = f"{DOMAIN}_connection_gate"  # hass.data key
+
+# Polling: every purifier's polls run from one shared timer
+POLL_TICK = 1.0  # seconds; polls are due on whole ticks
+DATA_POLL_SCHEDULER = f"{DOMAIN}_poll_scheduler"  # hass.data key
+
+# Optional BLE worker process, which runs every purifier's Bluetooth I/O
+WORKER_DELTA_INTERVAL = 0.1  # seconds; status changes sent back in one batch
+WORKER_REQUEST_TIMEOUT = 120  # seconds to wait for a read or write
+WORKER_RESTART_DELAY = 1  # seconds before restarting a worker that exited
+WORKER_RESTART_MAX_DELAY = 60  # seconds; the delay doubles up to this
+WORKER_STABLE_AFTER = 60  # seconds; a worker up this long restarts quickly again
+WORKER_STOP_TIMEOUT = 10  # seconds to exit cleanly before it is killed
+DATA_WORKER = f"{DOMAIN}_worker"  # hass.data key
+
+# Usage tracking
+USAGE_HISTORY_SIZE = 512  # transitions kept in the ring buffer
+USAGE_HISTORY_MIN_INTERVAL = 60  # seconds; closer transitions are merged
+USAGE_MAX_GAP = 600  # seconds; longer gaps between polls are not counted
+USAGE_SAVE_DELAY = 300  # seconds between writes of the usage store
+USAGE_STORAGE_VERSION = 1
+
+# Filter wear estimate: rated hours in Standard mode, and wear per mode
+# relative to Standard
+FILTER_LIFE_HOURS = 720
+FILTER_WEAR_FACTORS = {
+    "Auto": 1.0,
+    "Silent": 0.5,
+    "Standard": 1.0,
+    "Strong": 2.0,
+}
+
+# Bulk set_state service
+SERVICE_SET_STATE = "set_state"
+SERVICE_RESET_FILTER = "reset_filter"
+ATTR_POWER = "power"
+ATTR_MODE = "mode"
+ATTR_MAX_PARALLEL = "max_parallel"
+DEFAULT_ADAPTER_PARALLELISM = 3  # concurrent purifier writes per Bluetooth adapter
+MAX_ADAPTER_PARALLELISM = 10
+
+# Config flow device picker
+MAX_DISCOVERY_CANDIDATES = 25  # devices offered, best ranked first
+
+# Logging: per purifier, repeated warnings are summarized and rate limited
+LOG_REPEAT_INTERVAL = 300  # seconds a repeated warning stays collapsed
+LOG_RATE_WINDOW = 60  # seconds
+LOG_RATE_BURST = 10  # warnings and errors per purifier per window
+
+# GATT traffic recording (diagnostics)
+GATT_LOG_FLUSH_INTERVAL = 10  # seconds between appends to the log file
+
 # Configuration
 CONF_MAC_ADDRESS = "mac_address"
 CONF_SCAN_INTERVAL = "scan_interval"
+CONF_RECORD_GATT = "record_gatt"
+CONF_CONNECT_WINDOW = "connect_window"
+CONF_STRUCTURED_LOG = "structured_log"
+CONF_WORKER = "worker_process"
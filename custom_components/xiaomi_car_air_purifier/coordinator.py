@@ -2,26 +2,96 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import timedelta
+from datetime import datetime, timedelta
 import logging
+import time
 
 from homeassistant.components import bluetooth
+from homeassistant.components.bluetooth import (
+    BluetoothCallbackMatcher,
+    BluetoothChange,
+    BluetoothScanningMode,
+    BluetoothServiceInfoBleak,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .ble_client import XiaomiCarAirPurifierBLEClient
 from .const import (
     DOMAIN,
     UPDATE_INTERVAL,
+    CONF_CONNECT_WINDOW,
+    CONF_RECORD_GATT,
     CONF_SCAN_INTERVAL,
+    CONF_STRUCTURED_LOG,
+    CONF_WORKER,
+    DATA_CONNECTION_GATE,
+    DATA_POLL_SCHEDULER,
+    DATA_WORKER,
+    DEFAULT_CONNECT_WINDOW,
     DEFAULT_SCAN_INTERVAL,
+    GATT_LOG_FLUSH_INTERVAL,
     MAX_RETRIES,
     CONSECUTIVE_FAILURES_THRESHOLD,
+    MODE_CHAR_UUID,
+    MODE_VALUES,
+    POWER_CHAR_UUID,
+    POWER_OFF,
+    POWER_ON,
+    USAGE_SAVE_DELAY,
+    USAGE_STORAGE_VERSION,
 )
+from .connection_gate import ConnectionGate
+from .gatt_log import GattRecorder
+from .poll_scheduler import PollScheduler
+from .retry import run_with_retries
+from .usage import UsageTracker
+from .worker_supervisor import WorkerSupervisor
 
 _LOGGER = logging.getLogger(__name__)
 
+# Fields of a complete status, as returned by the client's get_status
+STATUS_KEYS = frozenset({"power", "mode", "mode_byte"})
+
+
+def usage_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Return the store holding a purifier's usage counters."""
+    address = entry.unique_id.replace(":", "").lower()
+    return Store(hass, USAGE_STORAGE_VERSION, f"{DOMAIN}.usage_{address}")
+
+
+@callback
+def async_connection_gate(hass: HomeAssistant) -> ConnectionGate:
+    """Return the connection gate shared by every purifier."""
+    if (gate := hass.data.get(DATA_CONNECTION_GATE)) is None:
+        gate = hass.data[DATA_CONNECTION_GATE] = ConnectionGate()
+    return gate
+
+
+@callback
+def async_poll_scheduler(hass: HomeAssistant) -> PollScheduler:
+    """Return the poll scheduler shared by every purifier."""
+    if (scheduler := hass.data.get(DATA_POLL_SCHEDULER)) is None:
+        scheduler = hass.data[DATA_POLL_SCHEDULER] = PollScheduler()
+    return scheduler
+
+
+@callback
+def async_worker(hass: HomeAssistant) -> WorkerSupervisor:
+    """Return the BLE worker shared by purifiers running out of process."""
+    if (worker := hass.data.get(DATA_WORKER)) is None:
+        worker = hass.data[DATA_WORKER] = WorkerSupervisor()
+
+        async def _async_stop(_event: Event) -> None:
+            await worker.async_stop()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
+    return worker
+
 
 class XiaomiCarAirPurifierCoordinator(DataUpdateCoordinator):
     """Coordinator for Xiaomi Car Air Purifier data updates."""
@@ -30,188 +100,319 @@ class XiaomiCarAirPurifierCoordinator(DataUpdateCoordinator):
         """Initialize the coordinator."""
         # Get scan interval from options or use default
         scan_interval = entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+        # In a worker process, the worker polls and sends back what changed
+        in_worker = entry.options.get(CONF_WORKER, False)
 
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(seconds=scan_interval),
+            update_interval=None if in_worker else timedelta(seconds=scan_interval),
         )
         self.entry = entry
         self._ble_device = bluetooth.async_ble_device_from_address(
             hass, entry.unique_id
         )
         self._client = XiaomiCarAirPurifierBLEClient(self._ble_device)
+        self._log = self._client.log.child(_LOGGER)
+        self._log.structured = entry.options.get(CONF_STRUCTURED_LOG, False)
         self._consecutive_failures = 0
         self._last_successful_data: dict | None = None
         self._operation_lock = asyncio.Lock()  # Prevent concurrent BLE operations
+        self._connection_gate = async_connection_gate(hass)
+        entry.async_on_unload(self._connection_gate.add_device())
+        self._poll_scheduler = async_poll_scheduler(hass)
+        entry.async_on_unload(lambda: self._poll_scheduler.remove(entry.entry_id))
+        self._rssi: int | None = None
+        entry.async_on_unload(
+            bluetooth.async_register_callback(
+                hass,
+                self._async_handle_advertisement,
+                BluetoothCallbackMatcher(address=entry.unique_id, connectable=True),
+                BluetoothScanningMode.PASSIVE,
+            )
+        )
+        self._worker: WorkerSupervisor | None = None
+        if in_worker:
+            self._worker = async_worker(hass)
+            entry.async_on_unload(
+                self._worker.add_device(
+                    entry.entry_id,
+                    entry.unique_id,
+                    self._async_handle_worker_delta,
+                    **self._worker_settings(),
+                )
+            )
+        self._unsub_recording_flush: CALLBACK_TYPE | None = None
+        self._async_configure_recording()
+        self.usage = UsageTracker()
+        self._usage_store: Store | None = None
+        self._usage_save_pending = False
         entry.async_on_unload(entry.add_update_listener(self._async_update_listener))
 
     async def _async_update_listener(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
         """Handle options update."""
-        # Update scan interval when options change
-        scan_interval = entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
-        self.update_interval = timedelta(seconds=scan_interval)
+        if entry.options.get(CONF_WORKER, False) != (self._worker is not None):
+            # Moving the Bluetooth I/O in or out of process needs a new coordinator
+            hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+            return
+        self._log.structured = entry.options.get(CONF_STRUCTURED_LOG, False)
+        if self._worker is not None:
+            self._worker.update_device(entry.entry_id, **self._worker_settings())
+        else:
+            # Update scan interval when options change
+            scan_interval = entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+            self.update_interval = timedelta(seconds=scan_interval)
+            if self._unsub_refresh is not None:
+                # Move the pending poll onto the new interval's slot
+                self._schedule_refresh()
+        self._async_configure_recording()
+
+    def _worker_settings(self) -> dict:
+        """Return the settings the BLE worker polls this purifier with."""
+        options = self.entry.options
+        return {
+            "interval": options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+            "window": options.get(CONF_CONNECT_WINDOW, DEFAULT_CONNECT_WINDOW),
+            "rssi": self._rssi,
+            "structured": options.get(CONF_STRUCTURED_LOG, False),
+        }
+
+    @callback
+    def _async_handle_worker_delta(self, delta: dict | None) -> None:
+        """Apply a poll the BLE worker ran: changed fields, or None if it failed."""
+        if delta is None:
+            try:
+                self._async_handle_failure()
+            except UpdateFailed as err:
+                self.async_set_update_error(err)
+            return
+        status = {**(self._last_successful_data or {}), **delta}
+        if STATUS_KEYS <= status.keys():
+            self._async_handle_status(status)
+            self.async_set_updated_data(status)
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        """Queue the next poll with the shared scheduler instead of a timer of its own."""
+        if self.update_interval is None or self.entry.pref_disable_polling:
+            return
+        self._unsub_refresh = self._poll_scheduler.schedule(
+            self.entry.entry_id,
+            self.update_interval.total_seconds(),
+            self._async_handle_poll_due,
+        )
+
+    @callback
+    def _async_handle_poll_due(self) -> None:
+        """Start a scheduled poll, cancelled if the entry unloads while it runs."""
+        self.entry.async_create_background_task(
+            self.hass,
+            self._handle_refresh_interval(),
+            name=f"{self.name} - {self.entry.title} - refresh",
+            eager_start=True,
+        )
+
+    @callback
+    def _async_handle_advertisement(
+        self, service_info: BluetoothServiceInfoBleak, change: BluetoothChange
+    ) -> None:
+        """Track the signal strength, which decides who reconnects first."""
+        self._rssi = service_info.rssi
+
+    async def _async_wait_to_connect(self) -> None:
+        """Wait for this purifier's turn to connect."""
+        window = self.entry.options.get(CONF_CONNECT_WINDOW, DEFAULT_CONNECT_WINDOW)
+        if (waited := await self._connection_gate.async_acquire(self._rssi, window)) >= 1:
+            self._log.debug("Waited %.1f seconds for a connection slot", waited)
+
+    @callback
+    def _async_configure_recording(self) -> None:
+        """Start or stop recording GATT traffic to match the options."""
+        enabled = self.entry.options.get(CONF_RECORD_GATT, False)
+        if enabled and self._client.recorder is None:
+            address = self.entry.unique_id.replace(":", "").lower()
+            path = self.hass.config.path(f"{DOMAIN}_{address}.gattlog")
+            _LOGGER.info("Recording GATT traffic to %s", path)
+            self._client.recorder = GattRecorder(path)
+            self._unsub_recording_flush = async_track_time_interval(
+                self.hass,
+                self._async_flush_recording,
+                timedelta(seconds=GATT_LOG_FLUSH_INTERVAL),
+            )
+        elif not enabled and self._client.recorder is not None:
+            self._async_stop_recording()
+
+    @callback
+    def _async_flush_recording(self, _now: datetime | None = None) -> asyncio.Future | None:
+        """Append buffered GATT records to the log file in the executor."""
+        recorder = self._client.recorder
+        if recorder is not None and (data := recorder.take_pending()):
+            return self.hass.async_add_executor_job(recorder.write, data)
+        return None
+
+    @callback
+    def _async_stop_recording(self) -> asyncio.Future | None:
+        """Stop recording and write out what is buffered."""
+        if self._unsub_recording_flush is not None:
+            self._unsub_recording_flush()
+            self._unsub_recording_flush = None
+        flushed = self._async_flush_recording()
+        self._client.recorder = None
+        return flushed
+
+    async def async_load_usage(self) -> None:
+        """Restore usage counters and start persisting them."""
+        self._usage_store = usage_store(self.hass, self.entry)
+        if (data := await self._usage_store.async_load()) is not None:
+            try:
+                self.usage = UsageTracker.from_dict(data)
+            except (KeyError, TypeError, ValueError) as err:
+                _LOGGER.warning("Discarding unreadable usage data: %s", err)
+
+    @callback
+    def _async_save_usage(self) -> None:
+        """Schedule a write of the usage counters, unless one is pending."""
+        # Each async_delay_save call pushes the write back, so with polls
+        # more frequent than the delay it would never happen
+        if self._usage_store is not None and not self._usage_save_pending:
+            self._usage_save_pending = True
+            self._usage_store.async_delay_save(self._usage_data, USAGE_SAVE_DELAY)
+
+    def _usage_data(self) -> dict:
+        """Return the usage counters for the store."""
+        self._usage_save_pending = False
+        return self.usage.as_dict()
+
+    @callback
+    def async_reset_filter(self) -> None:
+        """Record that the filter was replaced."""
+        self.usage.reset_filter()
+        self._async_save_usage()
+        self.async_update_listeners()
 
     async def _async_update_data(self) -> dict:
         """Fetch data from the device with retry logic and state persistence."""
-        async with self._operation_lock:
-            status = None
-
-            # Try to get status with retries
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Ensure connection
-                    if not self._client.is_connected:
-                        _LOGGER.debug("Not connected, attempting to connect (attempt %d/%d)", attempt + 1, MAX_RETRIES)
-                        if not await self._client.connect():
-                            if attempt < MAX_RETRIES - 1:
-                                _LOGGER.warning("Connection failed, retrying in 1 second...")
-                                await asyncio.sleep(1)
-                                continue
-                            else:
-                                _LOGGER.error("Failed to connect after %d attempts", MAX_RETRIES)
-                                break
-
-                    # Try to read status
-                    _LOGGER.debug("Reading status (attempt %d/%d)", attempt + 1, MAX_RETRIES)
-                    status = await self._client.get_status()
-
-                    if status is not None:
-                        # Success! Reset failure counter and cache the data
-                        self._consecutive_failures = 0
-                        self._last_successful_data = status
-                        _LOGGER.debug("Successfully read status")
-                        return status
-                    else:
-                        _LOGGER.warning("Failed to read status (attempt %d/%d)", attempt + 1, MAX_RETRIES)
-                        if attempt < MAX_RETRIES - 1:
-                            await asyncio.sleep(1)
-                            # Try to reconnect for next attempt
-                            await self._client.disconnect()
-
-                except Exception as err:
-                    _LOGGER.warning("Error reading status (attempt %d/%d): %s", attempt + 1, MAX_RETRIES, err)
-                    if attempt < MAX_RETRIES - 1:
-                        await asyncio.sleep(1)
-                        # Try to reconnect for next attempt
-                        try:
-                            await self._client.disconnect()
-                        except Exception:
-                            pass
-
-            # All retries failed
-            self._consecutive_failures += 1
-            _LOGGER.warning(
-                "Failed to update after %d retries (consecutive failures: %d/%d)",
-                MAX_RETRIES,
+        if self._worker is not None:
+            status = await self._worker.async_refresh(self.entry.entry_id)
+        else:
+            async with self._operation_lock:
+                status = await run_with_retries(
+                    self._client,
+                    "read status",
+                    self._client.get_status,
+                    before_connect=self._async_wait_to_connect,
+                    log=self._log,
+                )
+        if status is not None:
+            # Success! Reset failure counter and cache the data
+            self._async_handle_status(status)
+            self._log.debug("Successfully read status")
+            return status
+        return self._async_handle_failure()
+
+    @callback
+    def _async_handle_failure(self) -> dict:
+        """Count a failed read; return the cached status or raise UpdateFailed."""
+        # All retries failed
+        self._consecutive_failures += 1
+        self._log.warning(
+            "Failed to update after %d retries (consecutive failures: %d/%d)",
+            MAX_RETRIES,
+            self._consecutive_failures,
+            CONSECUTIVE_FAILURES_THRESHOLD,
+        )
+
+        # Only mark as unavailable after multiple consecutive failures
+        if self._consecutive_failures >= CONSECUTIVE_FAILURES_THRESHOLD:
+            self._log.error(
+                "Device marked as unavailable after %d consecutive failures",
                 self._consecutive_failures,
-                CONSECUTIVE_FAILURES_THRESHOLD,
+            )
+            raise UpdateFailed(
+                f"Failed to update device after {self._consecutive_failures} consecutive attempts"
             )
 
-            # Only mark as unavailable after multiple consecutive failures
-            if self._consecutive_failures >= CONSECUTIVE_FAILURES_THRESHOLD:
-                _LOGGER.error(
-                    "Device marked as unavailable after %d consecutive failures",
-                    self._consecutive_failures,
-                )
-                raise UpdateFailed(
-                    f"Failed to update device after {self._consecutive_failures} consecutive attempts"
-                )
-
-            # Return last successful data to maintain state
-            if self._last_successful_data is not None:
-                _LOGGER.info(
-                    "Returning cached data to maintain device state (failures: %d/%d)",
-                    self._consecutive_failures,
-                    CONSECUTIVE_FAILURES_THRESHOLD,
-                )
-                return self._last_successful_data
+        # Return last successful data to maintain state
+        if self._last_successful_data is not None:
+            self._log.debug(
+                "Returning cached data to maintain device state (failures: %d/%d)",
+                self._consecutive_failures,
+                CONSECUTIVE_FAILURES_THRESHOLD,
+            )
+            return self._last_successful_data
 
-            # No cached data and failures haven't reached threshold
-            raise UpdateFailed("No data available yet")
+        # No cached data and failures haven't reached threshold
+        raise UpdateFailed("No data available yet")
 
     async def async_shutdown(self) -> None:
-        """Shutdown the coordinator."""
+        """Stop polling, disconnect and save the usage counters, once.
+
+        Registered to run when the entry unloads and when Home Assistant
+        stops, so it may be called more than once.
+        """
+        if self._shutdown_requested:
+            return
+        await super().async_shutdown()
         await self._client.disconnect()
+        if self._client.recorder is not None and (
+            flushed := self._async_stop_recording()
+        ) is not None:
+            await flushed
+        if self._usage_store is not None:
+            await self._usage_store.async_save(self.usage.as_dict())
 
-    async def async_set_power(self, power: bool) -> None:
-        """Set device power state with retry logic."""
-        async with self._operation_lock:
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Ensure connection
-                    if not self._client.is_connected:
-                        _LOGGER.debug("Not connected, attempting to connect before setting power")
-                        if not await self._client.connect():
-                            if attempt < MAX_RETRIES - 1:
-                                _LOGGER.warning("Connection failed, retrying in 1 second...")
-                                await asyncio.sleep(1)
-                                continue
-                            else:
-                                _LOGGER.error("Failed to connect to set power after %d attempts", MAX_RETRIES)
-                                return
-
-                    # Try to set power
-                    if await self._client.set_power(power):
-                        _LOGGER.info("Successfully set power to %s", "ON" if power else "OFF")
-                        await self.async_request_refresh()
-                        return
-                    else:
-                        _LOGGER.warning("Failed to set power (attempt %d/%d)", attempt + 1, MAX_RETRIES)
-                        if attempt < MAX_RETRIES - 1:
-                            await asyncio.sleep(1)
-                            # Try to reconnect for next attempt
-                            await self._client.disconnect()
-
-                except Exception as err:
-                    _LOGGER.warning("Error setting power (attempt %d/%d): %s", attempt + 1, MAX_RETRIES, err)
-                    if attempt < MAX_RETRIES - 1:
-                        await asyncio.sleep(1)
-                        try:
-                            await self._client.disconnect()
-                        except Exception:
-                            pass
-
-            _LOGGER.error("Failed to set power after %d attempts", MAX_RETRIES)
-
-    async def async_set_mode(self, mode: str) -> None:
-        """Set device mode by name (Auto, Silent, Standard, Strong) with retry logic."""
-        async with self._operation_lock:
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Ensure connection
-                    if not self._client.is_connected:
-                        _LOGGER.debug("Not connected, attempting to connect before setting mode")
-                        if not await self._client.connect():
-                            if attempt < MAX_RETRIES - 1:
-                                _LOGGER.warning("Connection failed, retrying in 1 second...")
-                                await asyncio.sleep(1)
-                                continue
-                            else:
-                                _LOGGER.error("Failed to connect to set mode after %d attempts", MAX_RETRIES)
-                                return
-
-                    # Try to set mode
-                    if await self._client.set_mode(mode):
-                        _LOGGER.info("Successfully set mode to %s", mode)
-                        await self.async_request_refresh()
-                        return
-                    else:
-                        _LOGGER.warning("Failed to set mode (attempt %d/%d)", attempt + 1, MAX_RETRIES)
-                        if attempt < MAX_RETRIES - 1:
-                            await asyncio.sleep(1)
-                            # Try to reconnect for next attempt
-                            await self._client.disconnect()
-
-                except Exception as err:
-                    _LOGGER.warning("Error setting mode (attempt %d/%d): %s", attempt + 1, MAX_RETRIES, err)
-                    if attempt < MAX_RETRIES - 1:
-                        await asyncio.sleep(1)
-                        try:
-                            await self._client.disconnect()
-                        except Exception:
-                            pass
-
-            _LOGGER.error("Failed to set mode after %d attempts", MAX_RETRIES)
+    @callback
+    def _async_handle_status(self, status: dict) -> None:
+        """Record a status read from the device."""
+        self._consecutive_failures = 0
+        self._last_successful_data = status
+        # Summarize warnings suppressed while the purifier was failing
+        self._log.flush()
+        self.usage.record(time.time(), status["power"], status["mode_byte"])
+        self._async_save_usage()
+
+    async def _async_write(self, description: str, char_uuid: str, data: bytes) -> bool:
+        """Write a characteristic with retry logic; return True if the device applied it.
+
+        Only the written characteristic is read back and merged into the
+        current data, instead of refreshing the whole status.
+        """
+        if self._worker is not None:
+            status = await self._worker.async_write(self.entry.entry_id, char_uuid, data)
+        else:
+            async with self._operation_lock:
+                status = await run_with_retries(
+                    self._client,
+                    description,
+                    lambda: self._client.write_and_verify(char_uuid, data, self.data),
+                    before_connect=self._async_wait_to_connect,
+                    log=self._log,
+                )
+        if status is None:
+            self._log.error("Failed to %s after %d attempts", description, MAX_RETRIES)
+            return False
+        self._log.debug("Write verified: %s", description)
+        if STATUS_KEYS <= status.keys():
+            self._async_handle_status(status)
+            self.async_set_updated_data(status)
+        else:
+            # Nothing read yet to merge into: refresh outside the lock, the
+            # refresh takes the lock itself
+            await self.async_request_refresh()
+        return True
+
+    async def async_set_power(self, power: bool) -> bool:
+        """Set device power state with retry logic; return True if it was written."""
+        return await self._async_write(
+            f"set power to {'ON' if power else 'OFF'}",
+            POWER_CHAR_UUID,
+            POWER_ON if power else POWER_OFF,
+        )
 
+    async def async_set_mode(self, mode: str) -> bool:
+        """Set device mode by name with retry logic; return True if it was written."""
+        if mode not in MODE_VALUES:
+            self._log.error("Invalid mode: %s", mode)
+            return False
+        return await self._async_write(f"set mode to {mode}", MODE_CHAR_UUID, MODE_VALUES[mode])
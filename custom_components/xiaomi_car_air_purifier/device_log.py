@@ -0,0 +1,235 @@
+"""Per-purifier logging for the BLE hot paths.
+
+Every poll and command logs through a DeviceLogger, which
+
+- checks the level before anything is formatted, and leaves formatting of
+  what is emitted to the logging handler (see LazyHex for byte values);
+- prefixes each message with the purifier's address;
+- collapses a warning or error repeated within ``repeat_interval`` into
+  one "repeated N times" summary, and lets at most ``burst`` warnings and
+  errors per ``rate_window`` through for each purifier;
+- in structured mode, emits each record as one JSON object carrying the
+  message template and its arguments, for machine-readable debug logs.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+import json
+import logging
+import time
+from typing import Any
+
+from .const import LOG_RATE_BURST, LOG_RATE_WINDOW, LOG_REPEAT_INTERVAL
+
+# Suffixes: a message logged again after repeats, and the summary of repeats
+_REPEATED = " (repeated %d more times in the last %.0f s)"
+_SUMMARY = " (repeated %d times in the last %.0f s)"
+_DROPPED = " (%d other messages suppressed)"
+
+
+class LazyHex:
+    """Bytes shown as hex, formatted only if the record is emitted."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes) -> None:
+        """Wrap ``data``; nothing is formatted yet."""
+        self.data = data
+
+    def __str__(self) -> str:
+        """Return the bytes as space separated hex pairs."""
+        return bytes(self.data).hex(" ")
+
+
+class _Structured:
+    """A record rendered as JSON when the handler formats it."""
+
+    __slots__ = ("address", "msg", "args")
+
+    def __init__(self, address: str, msg: str, args: tuple[Any, ...]) -> None:
+        self.address = address
+        self.msg = msg
+        self.args = args
+
+    def __str__(self) -> str:
+        return json.dumps(
+            {
+                "device": self.address,
+                "message": self.msg % self.args,
+                "template": self.msg,
+                "args": [
+                    arg if isinstance(arg, (bool, int, float, type(None))) else str(arg)
+                    for arg in self.args
+                ],
+            },
+            separators=(",", ":"),
+        )
+
+
+@dataclass
+class _Repeat:
+    """A deduplicated message: when it was last emitted, and what came since."""
+
+    emitted: float
+    suppressed: int = 0
+    level: int = logging.WARNING
+    args: tuple[Any, ...] = ()
+
+
+@dataclass
+class _DeviceState:
+    """Rate limit and deduplication state shared by one purifier's loggers."""
+
+    structured: bool = False
+    clock: Callable[[], float] = time.monotonic
+    window_start: float = float("-inf")
+    window_count: int = 0
+    dropped: int = 0
+    suppressed: int = 0  # repeats not yet summarized
+    repeats: dict[str, _Repeat] = field(default_factory=dict)
+
+
+class DeviceLogger:
+    """Logger for one purifier, with lazy, rate limited and deduplicated output."""
+
+    __slots__ = (
+        "_logger",
+        "address",
+        "_state",
+        "repeat_interval",
+        "rate_window",
+        "burst",
+    )
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        address: str,
+        *,
+        repeat_interval: float = LOG_REPEAT_INTERVAL,
+        rate_window: float = LOG_RATE_WINDOW,
+        burst: int = LOG_RATE_BURST,
+        clock: Callable[[], float] = time.monotonic,
+        _state: _DeviceState | None = None,
+    ) -> None:
+        """Initialize the logger for the purifier at ``address``."""
+        self._logger = logger
+        self.address = address
+        self.repeat_interval = repeat_interval
+        self.rate_window = rate_window
+        self.burst = burst
+        self._state = _state or _DeviceState(clock=clock)
+
+    def child(self, logger: logging.Logger) -> DeviceLogger:
+        """Return a logger for another module sharing this purifier's limits."""
+        return DeviceLogger(
+            logger,
+            self.address,
+            repeat_interval=self.repeat_interval,
+            rate_window=self.rate_window,
+            burst=self.burst,
+            _state=self._state,
+        )
+
+    @property
+    def structured(self) -> bool:
+        """Return whether records are emitted as JSON."""
+        return self._state.structured
+
+    @structured.setter
+    def structured(self, value: bool) -> None:
+        self._state.structured = value
+
+    @property
+    def clock(self) -> Callable[[], float]:
+        """Return the clock timing repeats and rate windows, shared with children."""
+        return self._state.clock
+
+    @clock.setter
+    def clock(self, value: Callable[[], float]) -> None:
+        self._state.clock = value
+
+    def debug(self, msg: str, *args: Any) -> None:
+        """Log a debug message; free when debug logging is off."""
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, msg, args)
+
+    def info(self, msg: str, *args: Any) -> None:
+        """Log an informational message."""
+        if self._logger.isEnabledFor(logging.INFO):
+            self._emit(logging.INFO, msg, args)
+
+    def warning(self, msg: str, *args: Any) -> None:
+        """Log a warning, deduplicated and rate limited."""
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._limited(logging.WARNING, msg, args)
+
+    def error(self, msg: str, *args: Any) -> None:
+        """Log an error, deduplicated and rate limited."""
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._limited(logging.ERROR, msg, args)
+
+    def flush(self) -> None:
+        """Emit summaries for messages suppressed since they were last logged.
+
+        Called once the purifier is healthy again, so a run of failures
+        ends with its count rather than waiting for the next failure. The
+        messages stay deduplicated until ``repeat_interval`` has passed.
+        """
+        state = self._state
+        if not state.suppressed and not state.dropped:
+            return
+        now = self._state.clock()
+        for msg, repeat in state.repeats.items():
+            if repeat.suppressed:
+                self._emit(
+                    repeat.level,
+                    msg + _SUMMARY,
+                    (*repeat.args, repeat.suppressed, now - repeat.emitted),
+                )
+                repeat.suppressed = 0
+        state.suppressed = 0
+        if state.dropped:
+            self._emit(logging.WARNING, "%d messages suppressed", (state.dropped,))
+            state.dropped = 0
+
+    def _limited(self, level: int, msg: str, args: tuple[Any, ...]) -> None:
+        """Emit a warning or error unless it repeats or exceeds the rate."""
+        state = self._state
+        now = self._state.clock()
+        repeat = state.repeats.get(msg)
+        if repeat is not None and now - repeat.emitted < self.repeat_interval:
+            repeat.suppressed += 1
+            state.suppressed += 1
+            repeat.level = max(repeat.level, level)
+            repeat.args = args
+            return
+
+        if now - state.window_start >= self.rate_window:
+            state.window_start = now
+            state.window_count = 0
+        if state.window_count >= self.burst:
+            state.dropped += 1
+            return
+        state.window_count += 1
+
+        if repeat is not None and repeat.suppressed:
+            msg_out = msg + _REPEATED
+            args = (*args, repeat.suppressed, now - repeat.emitted)
+            state.suppressed -= repeat.suppressed
+        else:
+            msg_out = msg
+        if state.dropped:
+            msg_out += _DROPPED
+            args = (*args, state.dropped)
+            state.dropped = 0
+        state.repeats[msg] = _Repeat(now, level=level)
+        self._emit(level, msg_out, args)
+
+    def _emit(self, level: int, msg: str, args: tuple[Any, ...]) -> None:
+        """Hand the record to the logger, formatted by its handler."""
+        if self._state.structured:
+            self._logger.log(level, "%s", _Structured(self.address, msg, args))
+        else:
+            self._logger.log(level, "%s: " + msg, self.address, *args)
@@ -0,0 +1,80 @@
+"""Index of discovered Bluetooth devices for the config flow."""
+from __future__ import annotations
+
+from collections.abc import Container
+import heapq
+import re
+from typing import TYPE_CHECKING
+
+from .const import MAX_DISCOVERY_CANDIDATES, SERVICE_UUID
+
+if TYPE_CHECKING:
+    from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+
+# Same names as the local_name matchers in manifest.json (MI-CAR*, MICAR*)
+LOCAL_NAME_PATTERN = re.compile(r"MI-CAR|MICAR")
+MAC_ADDRESS_PATTERN = re.compile(r"([0-9A-F]{2}[:-]){5}[0-9A-F]{2}")
+
+# Home Assistant reports service UUIDs in lower case
+_SERVICE_UUID = SERVICE_UUID.lower()
+
+
+def normalize_address(value: str) -> str | None:
+    """Return ``value`` as an upper-case, colon-separated MAC, or None."""
+    address = value.strip().upper()
+    if not MAC_ADDRESS_PATTERN.fullmatch(address):
+        return None
+    return address.replace("-", ":")
+
+
+def _rank(service_info: BluetoothServiceInfoBleak) -> tuple[bool, bool, int]:
+    """Rank by manifest name match, then FFD0 service, then signal strength."""
+    return (
+        LOCAL_NAME_PATTERN.match(service_info.name) is not None,
+        _SERVICE_UUID in service_info.service_uuids,
+        service_info.rssi,
+    )
+
+
+class DiscoveryIndex:
+    """Latest advertisement of every device that could be a purifier.
+
+    Devices are keyed by upper-case MAC address and kept current from
+    Bluetooth callbacks, so the device picker never has to walk all of Home
+    Assistant's discovered devices again. Devices without a name or the FFD0
+    service are not offered and are not kept.
+    """
+
+    def __init__(self, limit: int = MAX_DISCOVERY_CANDIDATES) -> None:
+        """Initialize an empty index."""
+        self.limit = limit
+        self._devices: dict[str, BluetoothServiceInfoBleak] = {}
+
+    def __len__(self) -> int:
+        """Return the number of indexed devices."""
+        return len(self._devices)
+
+    def get(self, address: str) -> BluetoothServiceInfoBleak | None:
+        """Return the latest advertisement for a normalized address."""
+        return self._devices.get(address)
+
+    def update(self, service_info: BluetoothServiceInfoBleak) -> None:
+        """Add or refresh a device from an advertisement."""
+        # Home Assistant uses the address as the name of unnamed devices
+        named = service_info.name and service_info.name != service_info.address
+        if named or _SERVICE_UUID in service_info.service_uuids:
+            self._devices[service_info.address.upper()] = service_info
+
+    def candidates(
+        self, exclude: Container[str] = ()
+    ) -> list[BluetoothServiceInfoBleak]:
+        """Return up to ``limit`` devices not in ``exclude``, best first."""
+        return heapq.nlargest(
+            self.limit,
+            (
+                service_info
+                for address, service_info in self._devices.items()
+                if address not in exclude
+            ),
+            key=_rank,
+        )
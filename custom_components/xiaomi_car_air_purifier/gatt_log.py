@@ -0,0 +1,157 @@
+"""Compact append-only log of GATT interactions for record and replay.
+
+A log file starts with ``MAGIC`` followed by fixed-size records, each
+optionally followed by a payload:
+
+    started   float64  wall-clock time the operation started (epoch seconds)
+    duration  float32  seconds the operation took
+    op        uint8    OP_CONNECT, OP_DISCONNECT, OP_READ or OP_WRITE
+    outcome   uint8    OUTCOME_OK, OUTCOME_ERROR or OUTCOME_TIMEOUT
+    char      uint16   16-bit characteristic UUID (0 for connect/disconnect)
+    length    uint16   payload length
+
+The payload is the value read or written, or the error message for failed
+operations. The recorder only buffers in memory; callers decide when the
+buffer is written to disk so the event loop never blocks on file I/O.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+import struct
+import time
+from typing import NamedTuple
+
+from .const import MODE_CHAR_UUID, MODE_NAMES, POWER_CHAR_UUID
+
+MAGIC = b"XCAPGATT\x01"
+
+OP_CONNECT = 1
+OP_DISCONNECT = 2
+OP_READ = 3
+OP_WRITE = 4
+
+OP_NAMES = {
+    OP_CONNECT: "connect",
+    OP_DISCONNECT: "disconnect",
+    OP_READ: "read",
+    OP_WRITE: "write",
+}
+
+OUTCOME_OK = 0
+OUTCOME_ERROR = 1
+OUTCOME_TIMEOUT = 2
+
+OUTCOME_NAMES = {
+    OUTCOME_OK: "ok",
+    OUTCOME_ERROR: "error",
+    OUTCOME_TIMEOUT: "timeout",
+}
+
+_RECORD = struct.Struct("<dfBBHH")
+_MAX_PAYLOAD = 0xFFFF
+_BLUETOOTH_BASE_UUID_SUFFIX = "-0000-1000-8000-00805F9B34FB"
+
+
+class GattRecord(NamedTuple):
+    """One recorded GATT interaction."""
+
+    started: float
+    duration: float
+    op: int
+    outcome: int
+    char: int
+    payload: bytes
+
+
+def short_uuid(uuid: str) -> int:
+    """Return the 16-bit form of a Bluetooth base UUID, or 0."""
+    uuid = uuid.upper()
+    if len(uuid) == 36 and uuid.endswith(_BLUETOOTH_BASE_UUID_SUFFIX) and uuid[:4] == "0000":
+        return int(uuid[4:8], 16)
+    return 0
+
+
+def full_uuid(char: int) -> str:
+    """Return the full Bluetooth base UUID for a 16-bit UUID."""
+    return f"0000{char:04X}{_BLUETOOTH_BASE_UUID_SUFFIX}"
+
+
+_POWER_CHAR = short_uuid(POWER_CHAR_UUID)
+_MODE_CHAR = short_uuid(MODE_CHAR_UUID)
+
+
+def describe_value(char: int, payload: bytes) -> str:
+    """Return a readable rendering of a power or mode value."""
+    if not payload:
+        return ""
+    raw = payload.hex(" ")
+    if char == _POWER_CHAR:
+        return f"{raw} ({'ON' if payload[0] else 'OFF'})"
+    if char == _MODE_CHAR:
+        return f"{raw} ({MODE_NAMES.get(payload[0], 'Unknown')})"
+    return raw
+
+
+class GattRecorder:
+    """Collects GATT records in memory and appends them to a log file."""
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize the recorder for ``path``."""
+        self.path = Path(path)
+        self._pending = bytearray()
+        self._wall_offset: float | None = None
+
+    def record(
+        self,
+        op: int,
+        outcome: int,
+        started: float,
+        duration: float,
+        char: int = 0,
+        payload: bytes = b"",
+    ) -> None:
+        """Buffer one record; ``started`` is event loop time."""
+        if self._wall_offset is None:
+            # Anchor loop time to the wall clock once so records stay ordered
+            self._wall_offset = time.time() - asyncio.get_running_loop().time()
+        payload = bytes(payload[:_MAX_PAYLOAD])
+        self._pending += _RECORD.pack(
+            started + self._wall_offset, duration, op, outcome, char, len(payload)
+        )
+        self._pending += payload
+
+    def take_pending(self) -> bytes:
+        """Return and clear the buffered records."""
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+    def write(self, data: bytes) -> None:
+        """Append ``data`` from ``take_pending`` to the log file (blocking)."""
+        if not data:
+            return
+        with self.path.open("ab") as file:
+            if file.tell() == 0:
+                file.write(MAGIC)
+            file.write(data)
+
+    def flush(self) -> None:
+        """Write all buffered records to the log file (blocking)."""
+        self.write(self.take_pending())
+
+
+def iter_records(path: str | Path) -> Iterator[GattRecord]:
+    """Yield the records of a log file in order."""
+    with Path(path).open("rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a GATT log")
+        while header := file.read(_RECORD.size):
+            if len(header) < _RECORD.size:
+                break  # truncated by a crash mid-write
+            started, duration, op, outcome, char, length = _RECORD.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length:
+                break
+            yield GattRecord(started, duration, op, outcome, char, payload)
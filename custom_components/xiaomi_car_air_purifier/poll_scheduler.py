@@ -0,0 +1,163 @@
+"""Polling schedule shared by every purifier of the integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import heapq
+import itertools
+import math
+
+from .const import POLL_TICK
+
+# Slots are tried in golden ratio order, so the first few land far apart
+_GOLDEN = (math.sqrt(5) - 1) / 2
+
+# Slot loads are sums of fractions
+_LOAD_TOLERANCE = 1e-9
+
+
+class _Poll:
+    """A poll waiting in the heap; cancelled ones are skipped when popped."""
+
+    __slots__ = ("key", "period", "action", "cancelled")
+
+    def __init__(self, key: str, period: int, action: Callable[[], None]) -> None:
+        self.key = key
+        self.period = period
+        self.action = action
+        self.cancelled = False
+
+
+class PollScheduler:
+    """Timer heap holding the next poll of every purifier.
+
+    Each purifier's polls fall on a fixed slot of its interval, counted in
+    ticks of the event loop clock. Slots are handed out least loaded first,
+    so a fleet set up together polls evenly spread over the interval rather
+    than all at once, and polls that fall due on the same tick share one
+    timer. The loop wakes at most once per tick however many purifiers
+    there are, and not at all between polls. Polls are never closer than
+    the interval, and a poll that overruns its interval runs at the next
+    slot after it finishes.
+    """
+
+    def __init__(self, tick: float = POLL_TICK) -> None:
+        """Initialize an empty schedule."""
+        self.tick = tick
+        self.wakeups = 0
+        # key: (interval in ticks, slot within the interval)
+        self._slots: dict[str, tuple[int, int]] = {}
+        self._pending: dict[str, _Poll] = {}
+        # (due tick, order, poll)
+        self._heap: list[tuple[int, int, _Poll]] = []
+        self._order = itertools.count()
+        self._handle: asyncio.TimerHandle | None = None
+        self._handle_due: int | None = None
+
+    def schedule(
+        self, key: str, interval: float, action: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Run ``action`` at the purifier's next slot; return its cancellation.
+
+        The next slot is the first one at least a tick away. A poll already
+        pending for ``key`` on the same interval is kept, so a command does
+        not push the next poll back, and an interval change moves the
+        pending poll onto a slot of the new interval.
+        """
+        loop = asyncio.get_running_loop()
+        period = max(1, round(interval / self.tick))
+        pending = self._pending.get(key)
+        if pending is None or pending.period != period:
+            slot = self._assign_slot(key, period)
+            earliest = math.floor(loop.time() / self.tick) + 1
+            due = earliest + (slot - earliest) % period
+
+            self._cancel(key)
+            pending = self._pending[key] = _Poll(key, period, action)
+            heapq.heappush(self._heap, (due, next(self._order), pending))
+            self._arm(loop)
+        else:
+            pending.action = action
+        poll = pending
+
+        def _cancel() -> None:
+            if self._pending.get(key) is poll:
+                self._cancel(key)
+
+        return _cancel
+
+    def remove(self, key: str) -> None:
+        """Cancel a purifier's pending poll and give up its slot."""
+        self._cancel(key)
+        self._slots.pop(key, None)
+
+    def _cancel(self, key: str) -> None:
+        """Drop the pending poll of ``key``, if any."""
+        if (poll := self._pending.pop(key, None)) is not None:
+            poll.cancelled = True
+        if len(self._heap) > 2 * len(self._pending) + 16:
+            # Mostly cancelled polls, e.g. after many commands: rebuild
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+
+    def _assign_slot(self, key: str, period: int) -> int:
+        """Return the slot of ``key``, picking the least loaded for a new interval.
+
+        A purifier polling every ``p`` ticks in slot ``s`` shares a tick
+        with one in slot ``c`` of ``period`` only if ``c`` and ``s`` agree
+        modulo ``g = gcd(period, p)``, and then on ``g / p`` of its polls.
+        """
+        if (current := self._slots.get(key)) is not None and current[0] == period:
+            return current[1]
+        load = [0.0] * period
+        for other, (other_period, other_slot) in self._slots.items():
+            if other == key:
+                continue
+            common = math.gcd(period, other_period)
+            for slot in range(other_slot % common, period, common):
+                load[slot] += common / other_period
+        fewest = min(load) + _LOAD_TOLERANCE
+        slot = next(
+            (
+                candidate
+                for candidate in (int(k * _GOLDEN % 1 * period) for k in range(period))
+                if load[candidate] <= fewest
+            ),
+            None,
+        )
+        if slot is None:
+            slot = next(index for index, value in enumerate(load) if value <= fewest)
+        self._slots[key] = (period, slot)
+        return slot
+
+    def _arm(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Make sure the loop wakes for the earliest pending poll."""
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        due = self._heap[0][0] if self._heap else None
+        if self._handle is not None:
+            if due is not None and self._handle_due <= due:
+                return
+            self._handle.cancel()
+            self._handle = self._handle_due = None
+        if due is None:
+            return
+        self._handle_due = due
+        self._handle = loop.call_at(due * self.tick, self._run, loop, due)
+
+    def _run(self, loop: asyncio.AbstractEventLoop, due: int) -> None:
+        """Start every poll due by this tick."""
+        self._handle = self._handle_due = None
+        self.wakeups += 1
+        while self._heap and self._heap[0][0] <= due:
+            _, _, poll = heapq.heappop(self._heap)
+            if poll.cancelled:
+                continue
+            poll.cancelled = True
+            del self._pending[poll.key]
+            poll.action()
+        if self._handle is not None and self._handle_due <= due:
+            # Armed by an action for a poll this run already started
+            self._handle.cancel()
+            self._handle = self._handle_due = None
+        self._arm(loop)
@@ -0,0 +1,66 @@
+"""Retry loop shared by the coordinator's reads and writes."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import contextlib
+from typing import TYPE_CHECKING, TypeVar
+
+from .const import MAX_RETRIES, RETRY_DELAY
+
+if TYPE_CHECKING:
+    from .ble_client import XiaomiCarAirPurifierBLEClient
+    from .device_log import DeviceLogger
+
+_T = TypeVar("_T")
+
+
+async def run_with_retries(
+    client: XiaomiCarAirPurifierBLEClient,
+    description: str,
+    operation: Callable[[], Awaitable[_T | None]],
+    attempts: int = MAX_RETRIES,
+    before_connect: Callable[[], Awaitable[object]] | None = None,
+    log: DeviceLogger | None = None,
+) -> _T | None:
+    """Run ``operation`` on a connected client, reconnecting between attempts.
+
+    ``operation`` returns None on failure. Returns its first other result,
+    or None once every attempt has failed. Callers log the final failure.
+    ``before_connect`` is awaited before each connection attempt. Attempts
+    are logged to ``log``, by default the client's logger.
+    """
+    log = log or client.log
+    for attempt in range(1, attempts + 1):
+        last = attempt == attempts
+        try:
+            if not client.is_connected:
+                log.debug(
+                    "Not connected, attempting to connect (attempt %d/%d)", attempt, attempts
+                )
+                if before_connect is not None:
+                    await before_connect()
+                if not await client.connect():
+                    if last:
+                        return None
+                    log.warning("Connection failed, retrying in %s second(s)...", RETRY_DELAY)
+                    await asyncio.sleep(RETRY_DELAY)
+                    continue
+
+            if (result := await operation()) is not None:
+                return result
+            log.warning("Failed to %s (attempt %d/%d)", description, attempt, attempts)
+            if not last:
+                await asyncio.sleep(RETRY_DELAY)
+                # Reconnect for the next attempt
+                await client.disconnect()
+
+        except Exception as err:  # pylint: disable=broad-except
+            log.warning(
+                "Error trying to %s (attempt %d/%d): %s", description, attempt, attempts, err
+            )
+            if not last:
+                await asyncio.sleep(RETRY_DELAY)
+                with contextlib.suppress(Exception):
+                    await client.disconnect()
+    return None
@@ -4,6 +4,7 @@ from __future__ import annotations
 from collections.abc import Callable
 from dataclasses import dataclass
 import logging
+from typing import TYPE_CHECKING
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -16,14 +17,18 @@ from homeassistant.const import (
     CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
     PERCENTAGE,
     UnitOfTemperature,
+    UnitOfTime,
 )
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
-from .coordinator import XiaomiCarAirPurifierCoordinator
+from .const import DOMAIN, MODE_NAMES
+
+if TYPE_CHECKING:
+    from .coordinator import XiaomiCarAirPurifierCoordinator
+    from .usage import UsageTracker
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,6 +38,25 @@ class XiaomiSensorEntityDescription(SensorEntityDescription):
     """Describes Xiaomi sensor entity."""
 
     value_fn: Callable[[dict], any] | None = None
+    # Reads the coordinator's usage counters instead of the polled data
+    usage_fn: Callable[[UsageTracker], any] | None = None
+
+
+def _runtime_sensor(
+    key: str, name: str, usage_fn: Callable[[UsageTracker], float]
+) -> XiaomiSensorEntityDescription:
+    """Describe a runtime sensor in hours."""
+    return XiaomiSensorEntityDescription(
+        key=key,
+        name=name,
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.HOURS,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=1,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        usage_fn=usage_fn,
+    )
 
 
 SENSORS: tuple[XiaomiSensorEntityDescription, ...] = (
@@ -43,6 +67,24 @@ SENSORS: tuple[XiaomiSensorEntityDescription, ...] = (
         entity_category=EntityCategory.DIAGNOSTIC,
         value_fn=lambda data: data.get("mode", "Unknown"),
     ),
+    _runtime_sensor("runtime", "Runtime", lambda usage: usage.runtime_hours),
+    *(
+        _runtime_sensor(
+            f"runtime_{name.lower()}",
+            f"Runtime {name}",
+            lambda usage, mode_byte=mode_byte: usage.mode_hours(mode_byte),
+        )
+        for mode_byte, name in MODE_NAMES.items()
+    ),
+    XiaomiSensorEntityDescription(
+        key="filter_remaining",
+        name="Filter remaining",
+        icon="mdi:air-filter",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        usage_fn=lambda usage: usage.filter_remaining,
+    ),
 )
 
 
@@ -84,6 +126,8 @@ class XiaomiSensorEntity(CoordinatorEntity, SensorEntity):
     @property
     def native_value(self) -> any:
         """Return the state of the sensor."""
+        if self.entity_description.usage_fn:
+            return self.entity_description.usage_fn(self.coordinator.usage)
         if self.coordinator.data and self.entity_description.value_fn:
             return self.entity_description.value_fn(self.coordinator.data)
         return None
@@ -0,0 +1,187 @@
+"""Domain services for Xiaomi Car Air Purifier."""
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Iterable
+import logging
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components import bluetooth
+from homeassistant.const import ATTR_AREA_ID, ATTR_DEVICE_ID, ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.service import async_extract_config_entry_ids
+
+from .const import (
+    ATTR_MAX_PARALLEL,
+    ATTR_MODE,
+    ATTR_POWER,
+    DEFAULT_ADAPTER_PARALLELISM,
+    DOMAIN,
+    MAX_ADAPTER_PARALLELISM,
+    MODE_VALUES,
+    SERVICE_RESET_FILTER,
+    SERVICE_SET_STATE,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import XiaomiCarAirPurifierCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+SET_STATE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            **cv.ENTITY_SERVICE_FIELDS,
+            vol.Optional(ATTR_POWER): cv.boolean,
+            vol.Optional(ATTR_MODE): vol.In(list(MODE_VALUES)),
+            vol.Optional(
+                ATTR_MAX_PARALLEL, default=DEFAULT_ADAPTER_PARALLELISM
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_ADAPTER_PARALLELISM)),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_POWER, ATTR_MODE),
+)
+RESET_FILTER_SCHEMA = vol.All(
+    vol.Schema(cv.ENTITY_SERVICE_FIELDS),
+    cv.has_at_least_one_key(ATTR_ENTITY_ID, ATTR_DEVICE_ID, ATTR_AREA_ID),
+)
+
+
+async def async_set_state(
+    targets: Iterable[tuple[str, XiaomiCarAirPurifierCoordinator, str]],
+    *,
+    power: bool | None = None,
+    mode: str | None = None,
+    max_parallel: int = DEFAULT_ADAPTER_PARALLELISM,
+) -> dict[str, Any]:
+    """Push a state to many purifiers, at most ``max_parallel`` per adapter.
+
+    ``targets`` are (address, coordinator, adapter) tuples. Each purifier is
+    still written through its coordinator, so retries and the operation lock
+    behave exactly as for a single fan entity call.
+    """
+    loop = asyncio.get_running_loop()
+    slots: defaultdict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(max_parallel)
+    )
+    start = loop.time()
+
+    async def _set_one(
+        coordinator: XiaomiCarAirPurifierCoordinator, adapter: str
+    ) -> dict[str, Any]:
+        queued = loop.time()
+        async with slots[adapter]:
+            started = loop.time()
+            success = True
+            if power is not None:
+                success = await coordinator.async_set_power(power)
+            if success and mode is not None:
+                success = await coordinator.async_set_mode(mode)
+            return {
+                "success": success,
+                "adapter": adapter,
+                "queued_seconds": round(started - queued, 3),
+                "seconds": round(loop.time() - started, 3),
+            }
+
+    targets = list(targets)
+    results = await asyncio.gather(
+        *(_set_one(coordinator, adapter) for _, coordinator, adapter in targets)
+    )
+    devices = {address: result for (address, _, _), result in zip(targets, results)}
+    succeeded = sum(result["success"] for result in results)
+    return {
+        "seconds": round(loop.time() - start, 3),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "devices": devices,
+    }
+
+
+@callback
+def _async_adapter(hass: HomeAssistant, address: str) -> str:
+    """Return the adapter or proxy the purifier was last heard through."""
+    service_info = bluetooth.async_last_service_info(hass, address, connectable=True)
+    return service_info.source if service_info is not None else "unknown"
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the domain services."""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_STATE):
+        return
+
+    async def _async_targets(call: ServiceCall) -> list[XiaomiCarAirPurifierCoordinator]:
+        """Return the coordinators of the targeted purifiers, or of all."""
+        coordinators: dict[str, XiaomiCarAirPurifierCoordinator] = hass.data.get(DOMAIN, {})
+        if not any(key in call.data for key in (ATTR_ENTITY_ID, ATTR_DEVICE_ID, ATTR_AREA_ID)):
+            return list(coordinators.values())
+        entry_ids = await async_extract_config_entry_ids(hass, call)
+        if selected := [
+            coordinators[entry_id] for entry_id in entry_ids if entry_id in coordinators
+        ]:
+            return selected
+        raise ServiceValidationError("No Xiaomi Car Air Purifier matches the target")
+
+    async def _async_handle_set_state(call: ServiceCall) -> ServiceResponse:
+        """Handle the set_state service call."""
+        selected = await _async_targets(call)
+
+        _LOGGER.debug("Setting state of %d purifiers", len(selected))
+        result = await async_set_state(
+            (
+                (
+                    coordinator.entry.unique_id,
+                    coordinator,
+                    _async_adapter(hass, coordinator.entry.unique_id),
+                )
+                for coordinator in selected
+            ),
+            power=call.data.get(ATTR_POWER),
+            mode=call.data.get(ATTR_MODE),
+            max_parallel=call.data[ATTR_MAX_PARALLEL],
+        )
+        if result["failed"]:
+            _LOGGER.warning(
+                "set_state failed for %d of %d purifiers",
+                result["failed"],
+                len(selected),
+            )
+        return result if call.return_response else None
+
+    async def _async_handle_reset_filter(call: ServiceCall) -> None:
+        """Handle the reset_filter service call."""
+        for coordinator in await _async_targets(call):
+            coordinator.async_reset_filter()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_STATE,
+        _async_handle_set_state,
+        schema=SET_STATE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RESET_FILTER,
+        _async_handle_reset_filter,
+        schema=RESET_FILTER_SCHEMA,
+    )
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the domain services."""
+    hass.services.async_remove(DOMAIN, SERVICE_SET_STATE)
+    hass.services.async_remove(DOMAIN, SERVICE_RESET_FILTER)
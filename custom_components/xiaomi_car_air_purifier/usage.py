@@ -0,0 +1,166 @@
+"""Runtime per mode and filter wear, tracked from status polls.
+
+Every successful poll calls ``UsageTracker.record``, which adds the time
+since the previous poll to the counter of the state the purifier was in and
+appends a transition to a fixed-size ring buffer when the state changed.
+All reads are O(1), so the sensors never need recorder history.
+"""
+from __future__ import annotations
+
+from array import array
+import base64
+from collections.abc import Iterator
+import sys
+from typing import Any
+
+from .const import (
+    FILTER_LIFE_HOURS,
+    FILTER_WEAR_FACTORS,
+    MODE_NAMES,
+    USAGE_HISTORY_MIN_INTERVAL,
+    USAGE_HISTORY_SIZE,
+    USAGE_MAX_GAP,
+)
+
+STATE_OFF = 0xFF  # ring buffer state for "power off"; otherwise the mode byte
+# Counter slots: one per known mode byte, then one for unknown mode bytes
+_OTHER = len(MODE_NAMES)
+_FILTER_LIFE_SECONDS = FILTER_LIFE_HOURS * 3600
+_WEAR = [FILTER_WEAR_FACTORS.get(name, 1.0) for _, name in sorted(MODE_NAMES.items())] + [1.0]
+# History times are stored as 4 bytes; C int and long sizes vary by platform
+_TIME_TYPECODE = next((code for code in "IL" if array(code).itemsize == 4), None)
+assert _TIME_TYPECODE is not None, "no 4-byte unsigned array type"
+_TIME_SIZE = 4
+
+
+def _little_endian(values: array) -> bytes:
+    """Return the bytes of ``values`` in little-endian order."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    """Return an array decoded from little-endian ``data``."""
+    values = array(typecode, data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class UsageTracker:
+    """Time-in-mode counters and a down-sampled ring buffer of transitions."""
+
+    def __init__(
+        self,
+        size: int = USAGE_HISTORY_SIZE,
+        min_interval: float = USAGE_HISTORY_MIN_INTERVAL,
+        max_gap: float = USAGE_MAX_GAP,
+    ) -> None:
+        """Initialize empty counters and history."""
+        self.min_interval = min_interval
+        self.max_gap = max_gap
+        self.filter_wear = 0.0  # Standard-mode equivalent seconds since the last reset
+        self._seconds = array("d", [0.0] * (_OTHER + 1))
+        self._on_seconds = 0.0
+        self._last_time: float | None = None
+        self._last_state: int | None = None
+        # Ring buffer of transitions: epoch seconds and state, oldest at _head
+        self._times = array(_TIME_TYPECODE, [0] * size)
+        self._states = array("B", [0] * size)
+        self._head = 0
+        self._count = 0
+
+    def record(self, timestamp: float, power: bool, mode_byte: int) -> None:
+        """Account for the time since the last poll and note state changes."""
+        state = mode_byte if power else STATE_OFF
+        if self._last_time is not None and self._last_state != STATE_OFF:
+            elapsed = timestamp - self._last_time
+            # Longer gaps (restarts, outages) are not attributed to any mode
+            if 0 < elapsed <= self.max_gap:
+                slot = min(self._last_state, _OTHER)
+                self._seconds[slot] += elapsed
+                self._on_seconds += elapsed
+                self.filter_wear += elapsed * _WEAR[slot]
+        self._last_time = timestamp
+        if state != self._last_state:
+            self._last_state = state
+            self._append(int(timestamp), state)
+
+    def _append(self, timestamp: int, state: int) -> None:
+        """Add a transition, merging it into one less than min_interval old."""
+        size = len(self._times)
+        if self._count:
+            last = (self._head + self._count - 1) % size
+            if timestamp - self._times[last] < self.min_interval:
+                self._states[last] = state
+                return
+        if self._count < size:
+            index = (self._head + self._count) % size
+            self._count += 1
+        else:
+            index = self._head
+            self._head = (self._head + 1) % size
+        self._times[index] = timestamp
+        self._states[index] = state
+
+    def transitions(self) -> Iterator[tuple[int, bool, str | None]]:
+        """Yield (epoch seconds, power, mode name) transitions, oldest first."""
+        size = len(self._times)
+        for offset in range(self._count):
+            index = (self._head + offset) % size
+            state = self._states[index]
+            if state == STATE_OFF:
+                yield self._times[index], False, None
+            else:
+                yield self._times[index], True, MODE_NAMES.get(state, "Unknown")
+
+    @property
+    def runtime_hours(self) -> float:
+        """Return the total time powered on, in hours."""
+        return self._on_seconds / 3600
+
+    def mode_hours(self, mode_byte: int) -> float:
+        """Return the time spent in a mode, in hours."""
+        return self._seconds[min(mode_byte, _OTHER)] / 3600
+
+    @property
+    def filter_remaining(self) -> float:
+        """Return the estimated filter life left, in percent."""
+        return max(0.0, 100.0 * (1.0 - self.filter_wear / _FILTER_LIFE_SECONDS))
+
+    def reset_filter(self) -> None:
+        """Start a new filter."""
+        self.filter_wear = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a compact JSON-serializable snapshot."""
+        order = [(self._head + offset) % len(self._times) for offset in range(self._count)]
+        times = array(_TIME_TYPECODE, (self._times[index] for index in order))
+        states = bytes(self._states[index] for index in order)
+        return {
+            "seconds": list(self._seconds),
+            "filter_wear": self.filter_wear,
+            "last_time": self._last_time,
+            "last_state": self._last_state,
+            "history": base64.b64encode(_little_endian(times) + states).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> UsageTracker:
+        """Restore a tracker from ``as_dict`` output."""
+        tracker = cls()
+        seconds = data["seconds"]
+        for slot, value in enumerate(seconds[: len(tracker._seconds)]):
+            tracker._seconds[slot] = value
+        tracker._on_seconds = sum(tracker._seconds)
+        tracker.filter_wear = data["filter_wear"]
+        tracker._last_time = data["last_time"]
+        tracker._last_state = data["last_state"]
+        history = base64.b64decode(data["history"])
+        count = len(history) // (_TIME_SIZE + 1)  # time + 1-byte state per transition
+        times = _from_little_endian(_TIME_TYPECODE, history[: count * _TIME_SIZE])
+        for timestamp, state in zip(times, history[count * _TIME_SIZE :]):
+            tracker._append(timestamp, state)
+        return tracker
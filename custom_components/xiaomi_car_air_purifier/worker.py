@@ -0,0 +1,380 @@
+"""BLE worker: every purifier's Bluetooth I/O in a process of its own.
+
+With the "Run Bluetooth in a separate process" option, Home Assistant
+starts this module through WorkerSupervisor:
+
+    python -m custom_components.xiaomi_car_air_purifier.worker
+
+The worker connects, polls on its own PollScheduler and writes with the
+client, retry loop and connection pacing the coordinator uses in process,
+and sends status changes back in batches (see worker_ipc). Slow backends,
+hung operations and retry storms then stall this process, not Home
+Assistant's event loop.
+
+The worker talks to BlueZ directly through bleak, so purifiers must be in
+range of a local adapter; ESPHome Bluetooth proxies are only reachable in
+process. ``--transport module:callable`` replaces the connection: the
+callable takes an address and returns a connector, e.g.
+
+    python -m custom_components.xiaomi_car_air_purifier.worker \\
+        --transport tools.simulator:worker_transport
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+import contextlib
+from dataclasses import dataclass, field
+import importlib
+import logging
+import os
+import sys
+import time
+from typing import Any
+
+from bleak import BleakClient, BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+
+from .ble_client import Connector, XiaomiCarAirPurifierBLEClient, establish_bleak_connection
+from .connection_gate import ConnectionGate
+from .const import DEFAULT_CONNECT_WINDOW, DEFAULT_SCAN_INTERVAL, WORKER_DELTA_INTERVAL
+from .poll_scheduler import PollScheduler
+from .retry import run_with_retries
+from .worker_ipc import (
+    OP_ADD,
+    OP_DELTAS,
+    OP_READY,
+    OP_REFRESH,
+    OP_REMOVE,
+    OP_RESULT,
+    OP_STATS,
+    OP_STOP,
+    OP_WRITE,
+    FrameError,
+    encode_frame,
+    read_frame,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+RESOLVE_TIMEOUT = 10.0  # seconds to find a purifier by address
+
+# Takes a purifier's address, returns the connector its client uses
+Transport = Callable[[str], Connector]
+
+
+def bleak_transport(address: str) -> Connector:
+    """Return a connector finding the purifier through bleak on first use."""
+    device: BLEDevice | None = None
+
+    async def _connect(_device: BLEDevice) -> BleakClient:
+        nonlocal device
+        if device is None:
+            device = await BleakScanner.find_device_by_address(
+                address, timeout=RESOLVE_TIMEOUT
+            )
+            if device is None:
+                raise BleakError(f"{address}: device not found")
+        try:
+            return await establish_bleak_connection(device)
+        except BleakError:
+            # It may be reachable through another adapter next time
+            device = None
+            raise
+
+    return _connect
+
+
+def load_transport(spec: str) -> Transport:
+    """Import a transport given as ``module:callable``."""
+    module, _, name = spec.partition(":")
+    if not module or not name:
+        raise ValueError(f"Transport must be module:callable, not {spec!r}")
+    return getattr(importlib.import_module(module), name)
+
+
+@dataclass
+class _Device:
+    """A purifier the worker owns."""
+
+    key: str
+    client: XiaomiCarAirPurifierBLEClient
+    interval: float
+    window: float
+    rssi: int | None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Last status, and the last one Home Assistant was sent
+    status: dict[str, Any] | None = None
+    sent: dict[str, Any] = field(default_factory=dict)
+    cancel_poll: Callable[[], None] | None = None
+    leave_gate: Callable[[], None] | None = None
+
+
+class Worker:
+    """Owns the purifiers' connections and answers Home Assistant's requests."""
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        transport: Transport = bleak_transport,
+        *,
+        delta_interval: float = WORKER_DELTA_INTERVAL,
+    ) -> None:
+        """Initialize a worker writing its messages to ``writer``."""
+        self._writer = writer
+        self._transport = transport
+        self._delta_interval = delta_interval
+        self._devices: dict[str, _Device] = {}
+        self._scheduler = PollScheduler()
+        self._gate = ConnectionGate()
+        self._tasks: set[asyncio.Task] = set()
+        # Deltas waiting for the next batch, by purifier
+        self._outbox: dict[str, dict[str, Any] | None] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def serve(self, reader: asyncio.StreamReader) -> None:
+        """Handle messages until Home Assistant stops the worker or goes away."""
+        self._send({"op": OP_READY, "pid": os.getpid()})
+        while (message := await read_frame(reader)) is not None:
+            if message.get("op") == OP_STOP:
+                break
+            try:
+                self._handle(message)
+            except (KeyError, TypeError, ValueError) as err:
+                _LOGGER.error("Ignoring malformed message %s: %s", message, err)
+        await self.close()
+
+    def _handle(self, message: dict[str, Any]) -> None:
+        """Dispatch one message."""
+        op = message["op"]
+        if op == OP_ADD:
+            self._add(message)
+        elif op == OP_REMOVE:
+            self._remove(message["id"])
+        elif op in (OP_REFRESH, OP_WRITE) and message["id"] not in self._devices:
+            # Removed while the request was on its way: fail it at once
+            self._send({"op": OP_RESULT, "seq": message["seq"], "status": None})
+        elif op == OP_REFRESH:
+            device = self._devices[message["id"]]
+            self._spawn(self._respond(message["seq"], device, self._read(device)))
+        elif op == OP_WRITE:
+            device = self._devices[message["id"]]
+            data = bytes.fromhex(message["data"])
+            self._spawn(
+                self._respond(message["seq"], device, self._write(device, message["char"], data))
+            )
+        elif op == OP_STATS:
+            self._send(
+                {
+                    "op": OP_RESULT,
+                    "seq": message["seq"],
+                    "stats": {
+                        "pid": os.getpid(),
+                        "cpu_seconds": time.process_time(),
+                        "devices": len(self._devices),
+                        "connected": sum(
+                            device.client.is_connected for device in self._devices.values()
+                        ),
+                    },
+                }
+            )
+        else:
+            _LOGGER.error("Ignoring unknown message %s", op)
+
+    def _add(self, message: dict[str, Any]) -> None:
+        """Take over a purifier, or update its settings."""
+        key = message["id"]
+        interval = message.get("interval", DEFAULT_SCAN_INTERVAL)
+        if (device := self._devices.get(key)) is None:
+            address = message["address"]
+            device = self._devices[key] = _Device(
+                key,
+                XiaomiCarAirPurifierBLEClient(
+                    BLEDevice(address, None, None, rssi=0), self._transport(address)
+                ),
+                interval,
+                message.get("window", DEFAULT_CONNECT_WINDOW),
+                message.get("rssi"),
+            )
+            device.leave_gate = self._gate.add_device()
+            device.client.log.debug("Added to the BLE worker")
+        else:
+            device.window = message.get("window", device.window)
+            device.rssi = message.get("rssi", device.rssi)
+        device.client.log.structured = message.get("structured", False)
+        if interval != device.interval or device.cancel_poll is None:
+            device.interval = interval
+            self._schedule_poll(device)
+
+    def _remove(self, key: str) -> None:
+        """Give up a purifier and disconnect it."""
+        if (device := self._devices.pop(key, None)) is None:
+            return
+        self._scheduler.remove(key)
+        self._outbox.pop(key, None)
+        device.leave_gate()
+        self._spawn(self._disconnect(device))
+
+    async def _disconnect(self, device: _Device) -> None:
+        """Disconnect once the purifier's current operation is done."""
+        async with device.lock:
+            await device.client.disconnect()
+
+    def _spawn(self, coro: Any) -> None:
+        """Run ``coro`` in the background, keeping a reference until it ends."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule_poll(self, device: _Device) -> None:
+        """Queue the purifier's next poll."""
+        device.cancel_poll = self._scheduler.schedule(
+            device.key, device.interval, lambda: self._spawn(self._poll(device))
+        )
+
+    async def _poll(self, device: _Device) -> None:
+        """Poll on schedule and queue the change for the next batch."""
+        device.cancel_poll = None
+        status = await self._read(device)
+        if self._devices.get(device.key) is not device:
+            return
+        if status is None:
+            self._queue(device.key, None)
+        else:
+            changes = {
+                key: value for key, value in status.items() if device.sent.get(key) != value
+            }
+            device.sent = status
+            self._queue(device.key, changes)
+        if device.cancel_poll is None:
+            self._schedule_poll(device)
+
+    async def _wait_to_connect(self, device: _Device) -> None:
+        """Wait for the purifier's turn to connect."""
+        await self._gate.async_acquire(device.rssi, device.window)
+
+    async def _read(self, device: _Device) -> dict[str, Any] | None:
+        """Read the status, with the coordinator's retries."""
+        async with device.lock:
+            status = await run_with_retries(
+                device.client,
+                "read status",
+                device.client.get_status,
+                before_connect=lambda: self._wait_to_connect(device),
+            )
+        if status is not None:
+            device.status = status
+        return status
+
+    async def _write(
+        self, device: _Device, char_uuid: str, data: bytes
+    ) -> dict[str, Any] | None:
+        """Write and verify a characteristic, with the coordinator's retries."""
+        async with device.lock:
+            status = await run_with_retries(
+                device.client,
+                f"write {char_uuid}",
+                lambda: device.client.write_and_verify(char_uuid, data, device.status),
+                before_connect=lambda: self._wait_to_connect(device),
+            )
+        if status is not None:
+            device.status = status
+        return status
+
+    async def _respond(
+        self, seq: int, device: _Device, operation: Awaitable[dict[str, Any] | None]
+    ) -> None:
+        """Send the result of a read or write Home Assistant asked for."""
+        status = await operation
+        if status is not None:
+            # The result carries everything: drop what is queued for the purifier
+            device.sent = status
+            self._outbox.pop(device.key, None)
+        self._send({"op": OP_RESULT, "seq": seq, "status": status})
+
+    def _queue(self, key: str, delta: dict[str, Any] | None) -> None:
+        """Add a purifier's delta to the next batch."""
+        queued = self._outbox.get(key, {})
+        self._outbox[key] = None if delta is None or queued is None else {**queued, **delta}
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self._delta_interval, self._flush
+            )
+
+    def _flush(self) -> None:
+        """Send the batched deltas."""
+        self._flush_handle = None
+        if self._outbox:
+            self._send({"op": OP_DELTAS, "devices": self._outbox})
+            self._outbox = {}
+
+    def _send(self, message: dict[str, Any]) -> None:
+        """Write a message to Home Assistant."""
+        if not self._writer.is_closing():
+            self._writer.write(encode_frame(message))
+
+    async def close(self) -> None:
+        """Stop polling and disconnect every purifier."""
+        devices = list(self._devices.values())
+        for device in devices:
+            self._scheduler.remove(device.key)
+            device.leave_gate()
+        self._devices.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(
+            *(device.client.disconnect() for device in devices), return_exceptions=True
+        )
+        self._flush()
+
+
+async def _async_main(transport: Transport) -> None:
+    """Serve Home Assistant over stdin and stdout."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    # Frames only on stdout: anything else printed would corrupt the stream
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    sys.stdout = sys.stderr
+    write_transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, stdout
+    )
+    writer = asyncio.StreamWriter(write_transport, protocol, None, loop)
+    worker = Worker(writer, transport)
+    try:
+        await worker.serve(reader)
+    finally:
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+        writer.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--transport", help="connection factory as module:callable (default: bleak)"
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    # The supervisor parses "LEVEL:logger:message" lines from stderr
+    logging.basicConfig(
+        level=args.log_level, stream=sys.stderr, format="%(levelname)s:%(name)s:%(message)s"
+    )
+    transport = load_transport(args.transport) if args.transport else bleak_transport
+    try:
+        asyncio.run(_async_main(transport))
+    except FrameError as err:
+        _LOGGER.error("Stopping on a malformed frame: %s", err)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Messages between Home Assistant and the BLE worker process.
+
+Each message is a JSON object, without whitespace, sent as one frame: a
+4-byte big-endian length followed by the UTF-8 encoded object. Home
+Assistant writes to the worker's stdin and reads its stdout; the worker
+logs to stderr.
+
+To the worker:
+
+    {"op": "add", "id": ..., "address": ..., "interval": 30, "window": 10,
+     "rssi": -60, "structured": false}     start, or update, a purifier
+    {"op": "remove", "id": ...}
+    {"op": "refresh", "seq": 1, "id": ...}  read the status now
+    {"op": "write", "seq": 2, "id": ..., "char": <uuid>, "data": <hex>}
+    {"op": "stats", "seq": 3}
+    {"op": "stop"}
+
+From the worker:
+
+    {"op": "ready", "pid": 1234}
+    {"op": "result", "seq": 1, "status": {...} or null}
+    {"op": "deltas", "devices": {<id>: {...changed fields} or null}}
+
+A delta lists the status fields that changed since the last status sent
+for that purifier; ``{}`` is a poll that changed nothing and ``null`` a poll
+that failed. Deltas are batched: every poll finishing within
+WORKER_DELTA_INTERVAL goes back in one frame.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+from typing import Any
+
+OP_ADD = "add"
+OP_REMOVE = "remove"
+OP_REFRESH = "refresh"
+OP_WRITE = "write"
+OP_STATS = "stats"
+OP_STOP = "stop"
+OP_READY = "ready"
+OP_RESULT = "result"
+OP_DELTAS = "deltas"
+
+MAX_FRAME = 1 << 20  # bytes
+
+_HEADER = struct.Struct(">I")
+
+
+class FrameError(ValueError):
+    """A frame was too large or not a JSON object."""
+
+
+def encode_frame(message: dict[str, Any]) -> bytes:
+    """Return ``message`` as one length-prefixed frame."""
+    body = json.dumps(message, separators=(",", ":")).encode()
+    if len(body) > MAX_FRAME:
+        raise FrameError(f"Frame of {len(body)} bytes exceeds {MAX_FRAME}")
+    return _HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict[str, Any] | None:
+    """Read the next message; return None at end of stream."""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as err:
+        if err.partial:
+            raise FrameError("Stream ended inside a frame header") from err
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise FrameError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+    try:
+        message = json.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError as err:
+        raise FrameError("Stream ended inside a frame") from err
+    except ValueError as err:
+        raise FrameError(f"Frame is not valid JSON: {err}") from err
+    if not isinstance(message, dict):
+        raise FrameError("Frame is not a JSON object")
+    return message
@@ -0,0 +1,283 @@
+"""Supervision of the BLE worker process, from Home Assistant's side."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import itertools
+import logging
+from pathlib import Path
+import sys
+from typing import Any
+
+from .const import (
+    WORKER_REQUEST_TIMEOUT,
+    WORKER_RESTART_DELAY,
+    WORKER_RESTART_MAX_DELAY,
+    WORKER_STABLE_AFTER,
+    WORKER_STOP_TIMEOUT,
+)
+from .worker_ipc import (
+    OP_ADD,
+    OP_DELTAS,
+    OP_READY,
+    OP_REFRESH,
+    OP_REMOVE,
+    OP_RESULT,
+    OP_STATS,
+    OP_STOP,
+    OP_WRITE,
+    FrameError,
+    encode_frame,
+    read_frame,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Directory holding custom_components, from which the worker module is run
+_ROOT = Path(__file__).resolve().parents[2]
+
+# Called with a purifier's delta: changed fields, {} if none, None if the poll failed
+DeltaHandler = Callable[[dict[str, Any] | None], None]
+
+
+class WorkerSupervisor:
+    """Runs the BLE worker process and restarts it when it exits.
+
+    The worker starts with the first purifier added and stops after the
+    last one is removed. When it exits, requests in flight fail and it is
+    started again after a delay that doubles with every exit in a row, up
+    to ``max_restart_delay``; one that ran for ``stable_after`` seconds is
+    restarted after the shortest delay again. Every purifier is added to
+    the new worker, which polls it on its own schedule from then on.
+    """
+
+    def __init__(
+        self,
+        *,
+        transport: str | None = None,
+        restart_delay: float = WORKER_RESTART_DELAY,
+        max_restart_delay: float = WORKER_RESTART_MAX_DELAY,
+        stable_after: float = WORKER_STABLE_AFTER,
+        request_timeout: float = WORKER_REQUEST_TIMEOUT,
+    ) -> None:
+        """Initialize the supervisor; ``transport`` is passed to the worker."""
+        self.transport = transport
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after
+        self.request_timeout = request_timeout
+        self.restarts = 0
+        self.pid: int | None = None
+        # key: (add message, delta handler)
+        self._devices: dict[str, tuple[dict[str, Any], DeltaHandler]] = {}
+        self._pending: dict[int, asyncio.Future[dict[str, Any]]] = {}
+        self._seq = itertools.count(1)
+        self._process: asyncio.subprocess.Process | None = None
+        # Resolved when the worker is ready, failed if it exits first
+        self._ready: asyncio.Future[None] | None = None
+        self._task: asyncio.Task | None = None
+        self._stop_sent = False
+
+    def add_device(
+        self, key: str, address: str, handler: DeltaHandler, **settings: Any
+    ) -> Callable[[], None]:
+        """Hand a purifier to the worker; return its removal.
+
+        ``settings`` are the purifier's interval, window, rssi and
+        structured flag, as in the add message.
+        """
+        message = {"op": OP_ADD, "id": key, "address": address, **settings}
+        self._devices[key] = (message, handler)
+        self._send(message)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(
+                self._supervise(), name="xiaomi_car_air_purifier BLE worker"
+            )
+
+        def _remove() -> None:
+            if self._devices.pop(key, None) is None:
+                return
+            self._send({"op": OP_REMOVE, "id": key})
+            if not self._devices:
+                self._request_stop()
+
+        return _remove
+
+    def update_device(self, key: str, **settings: Any) -> None:
+        """Change a purifier's settings in the worker."""
+        message, _ = self._devices[key]
+        message.update(settings)
+        self._send(message)
+
+    async def async_refresh(self, key: str) -> dict[str, Any] | None:
+        """Read a purifier's status now; return None if that failed."""
+        result = await self._async_request({"op": OP_REFRESH, "id": key})
+        return result and result.get("status")
+
+    async def async_write(
+        self, key: str, char_uuid: str, data: bytes
+    ) -> dict[str, Any] | None:
+        """Write and verify a characteristic; return the status, or None."""
+        result = await self._async_request(
+            {"op": OP_WRITE, "id": key, "char": char_uuid, "data": data.hex()}
+        )
+        return result and result.get("status")
+
+    async def async_stats(self) -> dict[str, Any] | None:
+        """Return the worker's process statistics, or None if it is not running."""
+        result = await self._async_request({"op": OP_STATS})
+        return result and result.get("stats")
+
+    async def async_stop(self) -> None:
+        """Stop the worker, whatever purifiers it still has."""
+        self._devices.clear()
+        self._request_stop()
+        if self._task is not None:
+            await self._task
+
+    async def _async_request(self, message: dict[str, Any]) -> dict[str, Any] | None:
+        """Send a request; return the result, or None if the worker did not answer."""
+        try:
+            return await asyncio.wait_for(self._request(message), self.request_timeout)
+        except (asyncio.TimeoutError, ConnectionError) as err:
+            _LOGGER.debug("BLE worker did not answer %s: %r", message["op"], err)
+            return None
+
+    async def _request(self, message: dict[str, Any]) -> dict[str, Any]:
+        """Wait for the worker, send a request and wait for its result."""
+        if self._ready is None:
+            self._ready = asyncio.get_running_loop().create_future()
+        await asyncio.shield(self._ready)
+        seq = next(self._seq)
+        future: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+        self._pending[seq] = future
+        try:
+            self._send({**message, "seq": seq})
+            return await future
+        finally:
+            self._pending.pop(seq, None)
+
+    def _send(self, message: dict[str, Any]) -> None:
+        """Write a message to the worker, if it is running."""
+        process = self._process
+        if process is None or process.stdin is None or process.stdin.is_closing():
+            return
+        process.stdin.write(encode_frame(message))
+
+    def _request_stop(self) -> None:
+        """Ask the worker to exit; it is not restarted without purifiers."""
+        self._send({"op": OP_STOP})
+        self._stop_sent = True
+
+    def _command(self) -> list[str]:
+        """Return the worker's command line."""
+        level = logging.getLogger(__package__).getEffectiveLevel()
+        command = [
+            sys.executable,
+            "-m",
+            f"{__package__}.worker",
+            "--log-level",
+            logging.getLevelName(level),
+        ]
+        if self.transport:
+            command += ["--transport", self.transport]
+        return command
+
+    async def _supervise(self) -> None:
+        """Run the worker, restarting it with backoff while there are purifiers."""
+        loop = asyncio.get_running_loop()
+        delay = self.restart_delay
+        while self._devices:
+            started = loop.time()
+            self._stop_sent = False
+            try:
+                returncode = await self._run_worker()
+            except (OSError, FrameError) as err:
+                _LOGGER.error("BLE worker failed: %s", err)
+                returncode = None
+            ready, self._ready = self._ready, None
+            for future in (ready, *self._pending.values()):
+                if future is not None and not future.done():
+                    future.set_exception(ConnectionError("BLE worker exited"))
+                    future.exception()  # retrieved: waiters get it, if any
+            if not self._devices:
+                break
+            if self._stop_sent:
+                # Purifiers were added while it was stopping
+                continue
+            if loop.time() - started >= self.stable_after:
+                delay = self.restart_delay
+            _LOGGER.warning(
+                "BLE worker exited with code %s, restarting in %g s", returncode, delay
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+            self.restarts += 1
+        self._task = None
+
+    async def _run_worker(self) -> int | None:
+        """Start the worker and handle its messages until it exits."""
+        process = self._process = await asyncio.create_subprocess_exec(
+            *self._command(),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=_ROOT,
+        )
+        self.pid = process.pid
+        logs = asyncio.get_running_loop().create_task(self._forward_logs(process.stderr))
+        try:
+            for message, _ in list(self._devices.values()):
+                self._send(message)
+            if not self._devices:
+                # All removed while it was starting
+                self._request_stop()
+            while (message := await read_frame(process.stdout)) is not None:
+                self._dispatch(message)
+        finally:
+            self._process = None
+            if process.stdin is not None:
+                process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), WORKER_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                _LOGGER.warning("BLE worker did not exit, killing it")
+                process.kill()
+                await process.wait()
+            await logs
+        return process.returncode
+
+    def _dispatch(self, message: dict[str, Any]) -> None:
+        """Handle a message from the worker."""
+        op = message.get("op")
+        if op == OP_DELTAS:
+            for key, delta in message["devices"].items():
+                if (device := self._devices.get(key)) is not None:
+                    try:
+                        device[1](delta)
+                    except Exception:  # pylint: disable=broad-except
+                        _LOGGER.exception("Error handling BLE worker update for %s", key)
+        elif op == OP_RESULT:
+            future = self._pending.get(message.get("seq"))
+            if future is not None and not future.done():
+                future.set_result(message)
+        elif op == OP_READY:
+            _LOGGER.debug("BLE worker %s ready", message.get("pid"))
+            if self._ready is None:
+                self._ready = asyncio.get_running_loop().create_future()
+            if not self._ready.done():
+                self._ready.set_result(None)
+
+    @staticmethod
+    async def _forward_logs(stream: asyncio.StreamReader) -> None:
+        """Log the worker's "LEVEL:logger:message" lines through the same loggers."""
+        while line := await stream.readline():
+            text = line.decode(errors="replace").rstrip()
+            level, _, rest = text.partition(":")
+            name, _, message = rest.partition(":")
+            levelno = logging.getLevelName(level)
+            if isinstance(levelno, int) and name:
+                logging.getLogger(name).log(levelno, "%s", message)
+            elif text:
+                # Tracebacks and anything printed outside logging
+                _LOGGER.warning("BLE worker: %s", text)
@@ -0,0 +1,138 @@
+"""Tests for decoding purifier traffic from btsnoop captures."""
+from __future__ import annotations
+
+from pathlib import Path
+import struct
+
+import pytest
+
+from tools.btsnoop import (
+    _EPOCH_OFFSET_US,
+    _FILE_HEADER,
+    _RECORD,
+    ATT_ERROR_RSP,
+    ATT_READ_BY_GROUP_TYPE_REQ,
+    ATT_READ_BY_GROUP_TYPE_RSP,
+    ATT_READ_BY_TYPE_REQ,
+    ATT_READ_BY_TYPE_RSP,
+    ATT_READ_REQ,
+    ATT_READ_RSP,
+    ATT_WRITE_CMD,
+    ATT_WRITE_REQ,
+    DATALINK_H4,
+    HCI_ACL,
+    HCI_EVENT,
+    MAGIC,
+    AttDecoder,
+    AttEvent,
+    iter_hci,
+)
+
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+CONNECTION = 0x0040
+START_US = _EPOCH_OFFSET_US + 1_760_000_000 * 1_000_000
+
+
+def _connected() -> bytes:
+    """Return an LE Connection Complete event for ADDRESS."""
+    peer = bytes.fromhex(ADDRESS.replace(":", ""))[::-1]
+    body = bytes([0x01, 0x00]) + struct.pack("<H", CONNECTION) + bytes([0x00, 0x00]) + peer
+    body += bytes(7)
+    return bytes([HCI_EVENT, 0x3E, len(body)]) + body
+
+
+def _acl(pdu: bytes, split: int | None = None) -> list[bytes]:
+    """Return ATT ``pdu`` as H4 ACL packets, fragmented after ``split`` bytes."""
+    frame = struct.pack("<HH", len(pdu), 0x0004) + pdu
+    parts = [frame] if split is None else [frame[:split], frame[split:]]
+    packets = []
+    for index, part in enumerate(parts):
+        flags = 0x2000 if index == 0 else 0x1000
+        packets.append(
+            bytes([HCI_ACL]) + struct.pack("<HH", CONNECTION | flags, len(part)) + part
+        )
+    return packets
+
+
+def _capture(path: Path, packets: list[tuple[bool, bytes]]) -> None:
+    """Write H4 packets, each (received, data), 10 ms apart."""
+    data = bytearray(_FILE_HEADER.pack(MAGIC, 1, DATALINK_H4))
+    for index, (received, packet) in enumerate(packets):
+        data += _RECORD.pack(len(packet), len(packet), int(received), 0, START_US + index * 10_000)
+        data += packet
+    path.write_bytes(bytes(data))
+
+
+def _session() -> list[tuple[bool, bytes]]:
+    """Discover the FFD0 service and its characteristics, then read and write."""
+    sent, received = False, True
+    packets = [(received, _connected())]
+    # Primary services: FFD0 at handles 0x0010-0x0020
+    request = bytes([ATT_READ_BY_GROUP_TYPE_REQ]) + struct.pack("<HHH", 1, 0xFFFF, 0x2800)
+    response = bytes([ATT_READ_BY_GROUP_TYPE_RSP, 6]) + struct.pack("<HHH", 0x10, 0x20, 0xFFD0)
+    packets += [(sent, p) for p in _acl(request)] + [(received, p) for p in _acl(response)]
+    # Characteristics: FFD1 value at 0x0012, FFD3 value at 0x0014
+    request = bytes([ATT_READ_BY_TYPE_REQ]) + struct.pack("<HHH", 0x10, 0x20, 0x2803)
+    response = bytes([ATT_READ_BY_TYPE_RSP, 7]) + struct.pack(
+        "<HBHHHBHH", 0x11, 0x0A, 0x12, 0xFFD1, 0x13, 0x0A, 0x14, 0xFFD3
+    )
+    packets += [(sent, p) for p in _acl(request)] + [(received, p) for p in _acl(response)]
+    # A mode read whose response is split over two ACL packets
+    packets += [(sent, p) for p in _acl(bytes([ATT_READ_REQ, 0x14, 0x00]))]
+    packets += [(received, p) for p in _acl(bytes([ATT_READ_RSP]) + bytes.fromhex("02000f18"), 6)]
+    # A power write that is refused
+    packets += [(sent, p) for p in _acl(bytes([ATT_WRITE_REQ, 0x12, 0x00, 0x00]))]
+    refused = bytes([ATT_ERROR_RSP, ATT_WRITE_REQ, 0x12, 0x00, 0x03])  # write not permitted
+    packets += [(received, p) for p in _acl(refused)]
+    return packets
+
+
+def _decode(path: Path) -> list[AttEvent]:
+    """Return the purifier operations in a capture."""
+    decoder = AttDecoder()
+    return [event for packet in iter_hci(path) for event in decoder.feed(packet)]
+
+
+def test_reassembles_att_operations(tmp_path: Path) -> None:
+    """HCI ACL fragments become whole ATT operations on learned handles."""
+    path = tmp_path / "btsnoop_hci.log"
+    _capture(path, _session())
+    events = _decode(path)
+    assert [(e.device, e.op, e.handle, e.char, e.value) for e in events] == [
+        (ADDRESS, "read", 0x14, 0xFFD3, bytes.fromhex("02000f18")),
+        (ADDRESS, "write", 0x12, 0xFFD1, b"\x00"),
+        (ADDRESS, "error", 0x12, 0xFFD1, b"\x03"),
+    ]
+    assert events[0].time == pytest.approx(1_760_000_000 + 0.07)
+
+
+def test_fragments_are_not_mixed_across_directions(tmp_path: Path) -> None:
+    """A command sent while a response is half received does not corrupt it."""
+    packets = _session()
+    command = (False, _acl(bytes([ATT_WRITE_CMD, 0x14, 0x00, 0x03]))[0])
+    # Packets 6 and 7 are the two fragments of the mode read response
+    path = tmp_path / "btsnoop_hci.log"
+    _capture(path, [*packets[:7], command, *packets[7:]])
+    assert [(e.op, e.handle, e.value) for e in _decode(path)][:2] == [
+        ("write-cmd", 0x14, b"\x03"),
+        ("read", 0x14, bytes.fromhex("02000f18")),
+    ]
+
+
+def test_truncated_capture_stops_cleanly(tmp_path: Path) -> None:
+    """A capture pulled mid-write yields the packets before the cut."""
+    path = tmp_path / "btsnoop_hci.log"
+    _capture(path, _session())
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [e.op for e in _decode(path)] == ["read", "write"]
+
+
+def test_not_a_btsnoop_file(tmp_path: Path) -> None:
+    """Empty and foreign files are refused with ValueError."""
+    path = tmp_path / "capture.log"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError, match="empty"):
+        list(iter_hci(path))
+    path.write_bytes(b"XCAPGATT\x01" + bytes(16))
+    with pytest.raises(ValueError, match="not a btsnoop file"):
+        list(iter_hci(path))
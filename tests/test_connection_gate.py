@@ -0,0 +1,114 @@
+"""Tests for the connection gate pacing reconnects."""
+from __future__ import annotations
+
+import asyncio
+import random
+
+from custom_components.xiaomi_car_air_purifier.connection_gate import ConnectionGate
+from tools.simulator import run
+
+
+async def _acquire_at(
+    gate: ConnectionGate, rssi: int | None, order: list[int | None]
+) -> float:
+    """Acquire with no jitter window and record when the token came."""
+    await gate.async_acquire(rssi, 0)
+    order.append(rssi)
+    return asyncio.get_running_loop().time()
+
+
+def test_rate_limited_once_the_bucket_is_empty() -> None:
+    """A burst goes through at once, then attempts are paced at the rate."""
+
+    async def _main() -> list[float]:
+        gate = ConnectionGate(rate=2.0, burst=3)
+        order: list[int | None] = []
+        return await asyncio.gather(*(_acquire_at(gate, -60, order) for _ in range(7)))
+
+    times = sorted(run(_main()))
+    assert times[:3] == [0.0, 0.0, 0.0]
+    assert times[3:] == [0.5, 1.0, 1.5, 2.0]
+
+
+def test_bucket_refills_while_idle() -> None:
+    """Tokens accrue again between bursts, up to the burst size."""
+
+    async def _main() -> list[float]:
+        gate = ConnectionGate(rate=1.0, burst=2)
+        order: list[int | None] = []
+        await asyncio.gather(*(_acquire_at(gate, -60, order) for _ in range(2)))
+        await asyncio.sleep(10)
+        start = asyncio.get_running_loop().time()
+        times = await asyncio.gather(*(_acquire_at(gate, -60, order) for _ in range(3)))
+        return [time - start for time in times]
+
+    assert sorted(run(_main())) == [0.0, 0.0, 1.0]
+
+
+def test_strongest_waiter_first_unknown_last() -> None:
+    """Queued attempts get tokens by signal strength, unknown signal last."""
+
+    async def _main() -> list[int | None]:
+        gate = ConnectionGate(rate=1.0, burst=1)
+        order: list[int | None] = []
+        await _acquire_at(gate, -50, order)
+        order.clear()
+        await asyncio.gather(
+            *(_acquire_at(gate, rssi, order) for rssi in (-80, None, -40, -60, -40))
+        )
+        return order
+
+    assert run(_main()) == [-40, -40, -60, -80, None]
+
+
+def test_leave_callable_ends_storm_jitter() -> None:
+    """Only fleets larger than a burst are jittered; leaving shrinks the fleet."""
+
+    async def _main() -> tuple[float, float]:
+        gate = ConnectionGate(rate=2.0, burst=3, rng=random.Random(1))
+        leaves = [gate.add_device() for _ in range(4)]
+        # The first attempt starts the storm
+        await gate.async_acquire(-40, 10)
+        now = asyncio.get_running_loop().time()
+        during_storm = gate.jitter(-90, 10, now)
+        leaves.pop()()
+        return during_storm, gate.jitter(-90, 10, now)
+
+    during_storm, after_leaving = run(_main())
+    # A weak signal is drawn in the second half of the window
+    assert 5 <= during_storm <= 10
+    assert after_leaving == 0.0
+
+
+def test_cancelled_waiter_does_not_consume_a_token() -> None:
+    """A waiter cancelled while queued leaves the token to the next one."""
+
+    async def _main() -> float:
+        gate = ConnectionGate(rate=1.0, burst=1)
+        order: list[int | None] = []
+        await _acquire_at(gate, -50, order)
+        cancelled = asyncio.create_task(_acquire_at(gate, -40, order))
+        waiting = asyncio.create_task(_acquire_at(gate, -70, order))
+        await asyncio.sleep(0.5)
+        cancelled.cancel()
+        return await waiting
+
+    assert run(_main()) == 1.0
+
+
+def test_token_handed_to_a_cancelled_waiter_is_passed_on() -> None:
+    """A waiter cancelled just after getting a token hands it to the next one."""
+
+    async def _main() -> float:
+        loop = asyncio.get_running_loop()
+        gate = ConnectionGate(rate=1.0, burst=1)
+        order: list[int | None] = []
+        await _acquire_at(gate, -50, order)
+        cancelled = asyncio.create_task(_acquire_at(gate, -40, order))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_acquire_at(gate, -70, order))
+        # Runs right after the release that hands the token out at 1.0
+        loop.call_at(1.0, cancelled.cancel)
+        return await waiting
+
+    assert run(_main()) == 1.0
@@ -0,0 +1,63 @@
+"""Tests for the purifier daemon's HTTP API."""
+from __future__ import annotations
+
+from typing import Any
+
+from custom_components.xiaomi_car_air_purifier.ble_client import XiaomiCarAirPurifierBLEClient
+from tools.daemon import ApiServer, Metrics, Purifier, PurifierPool
+from tools.simulator import SimulatedPurifier, run, simulated_address
+
+
+def _server(devices: int) -> tuple[ApiServer, list[SimulatedPurifier]]:
+    """Return an API over a pool of simulated purifiers, all switched on."""
+    simulated = [
+        SimulatedPurifier(simulated_address(index), seed=index) for index in range(devices)
+    ]
+    metrics = Metrics()
+    pool = PurifierPool(
+        (
+            Purifier(
+                purifier.address,
+                purifier.name,
+                XiaomiCarAirPurifierBLEClient(purifier.ble_device, connector=purifier.connect),
+            )
+            for purifier in simulated
+        ),
+        metrics,
+    )
+    return ApiServer(pool, metrics), simulated
+
+
+def _batch(devices: int, data: dict[str, Any]) -> tuple[dict[str, Any], list[bool]]:
+    """Run one batch request and return the response and each purifier's power."""
+
+    async def _main() -> tuple[dict[str, Any], list[bool]]:
+        server, simulated = _server(devices)
+        try:
+            response = await server._batch(data)
+        finally:
+            await server.pool.close()
+        return response, [purifier.state["power"] for purifier in simulated]
+
+    return run(_main())
+
+
+def test_batch_without_devices_targets_every_purifier() -> None:
+    """Leaving out ``devices`` pushes the state to the whole pool."""
+    response, powers = _batch(3, {"power": False})
+    assert response["succeeded"] == 3
+    assert powers == [False, False, False]
+
+
+def test_batch_with_empty_devices_targets_none() -> None:
+    """An empty selection must not fall back to the whole pool."""
+    response, powers = _batch(3, {"devices": [], "power": False})
+    assert (response["succeeded"], response["failed"], response["devices"]) == (0, 0, {})
+    assert powers == [True, True, True]
+
+
+def test_batch_with_devices_targets_only_those() -> None:
+    """Listed purifiers get the state and the others are left alone."""
+    response, powers = _batch(3, {"devices": [simulated_address(1)], "power": False})
+    assert list(response["devices"]) == [simulated_address(1)]
+    assert powers == [True, False, True]
@@ -0,0 +1,86 @@
+"""Tests for the GATT record and replay log."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from custom_components.xiaomi_car_air_purifier.const import MODE_CHAR_UUID, POWER_CHAR_UUID
+from custom_components.xiaomi_car_air_purifier.gatt_log import (
+    MAGIC,
+    OP_CONNECT,
+    OP_READ,
+    OP_WRITE,
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    GattRecorder,
+    describe_value,
+    full_uuid,
+    iter_records,
+    short_uuid,
+)
+from tools.simulator import run
+
+POWER = short_uuid(POWER_CHAR_UUID)
+MODE = short_uuid(MODE_CHAR_UUID)
+
+
+def _record(path: Path) -> None:
+    """Write a connect, two reads and a failed write, in two flushes."""
+
+    async def _main() -> None:
+        recorder = GattRecorder(path)
+        recorder.record(OP_CONNECT, OUTCOME_OK, 10.0, 0.5)
+        recorder.record(OP_READ, OUTCOME_OK, 11.0, 0.05, POWER, b"\x01")
+        recorder.flush()
+        recorder.record(OP_READ, OUTCOME_OK, 11.1, 0.05, MODE, bytes.fromhex("03000f18"))
+        recorder.record(OP_WRITE, OUTCOME_ERROR, 12.0, 0.25, POWER, b"Not connected")
+        recorder.flush()
+
+    run(_main())
+
+
+def test_records_round_trip(tmp_path: Path) -> None:
+    """Records read back in order with their payloads and relative timing."""
+    path = tmp_path / "purifier.gattlog"
+    _record(path)
+    assert path.read_bytes().startswith(MAGIC)
+    assert path.read_bytes().count(MAGIC) == 1
+    records = list(iter_records(path))
+    assert [(r.op, r.outcome, r.char, r.payload) for r in records] == [
+        (OP_CONNECT, OUTCOME_OK, 0, b""),
+        (OP_READ, OUTCOME_OK, POWER, b"\x01"),
+        (OP_READ, OUTCOME_OK, MODE, bytes.fromhex("03000f18")),
+        (OP_WRITE, OUTCOME_ERROR, POWER, b"Not connected"),
+    ]
+    offsets = [round(r.started - records[0].started, 3) for r in records]
+    assert offsets == [0.0, 1.0, 1.1, 2.0]
+    assert records[-1].duration == 0.25
+
+
+def test_truncated_tail_is_dropped(tmp_path: Path) -> None:
+    """A record cut short by a crash mid-write ends the log quietly."""
+    path = tmp_path / "purifier.gattlog"
+    _record(path)
+    data = path.read_bytes()
+    for cut in (3, len(b"Not connected") + 1):
+        path.write_bytes(data[:-cut])
+        assert len(list(iter_records(path))) == 3
+
+
+def test_not_a_gatt_log(tmp_path: Path) -> None:
+    """A file without the magic is refused."""
+    path = tmp_path / "capture.log"
+    path.write_bytes(b"btsnoop\0" + bytes(32))
+    with pytest.raises(ValueError, match="not a GATT log"):
+        list(iter_records(path))
+
+
+def test_uuid_and_value_helpers() -> None:
+    """16-bit UUIDs round trip and power and mode values are spelled out."""
+    assert POWER == 0xFFD1
+    assert full_uuid(POWER) == POWER_CHAR_UUID
+    assert short_uuid("12345678-0000-1000-8000-00805F9B34FB") == 0
+    assert describe_value(POWER, b"\x00") == "00 (OFF)"
+    assert describe_value(MODE, bytes.fromhex("01000f18")) == "01 00 0f 18 (Silent)"
+    assert describe_value(0x2A19, b"\x64") == "64"
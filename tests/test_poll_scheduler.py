@@ -0,0 +1,155 @@
+"""Tests for the shared poll scheduler."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from collections.abc import Callable
+
+from custom_components.xiaomi_car_air_purifier.poll_scheduler import PollScheduler
+from tools.simulator import run
+
+
+def _repeating(
+    scheduler: PollScheduler, key: str, interval: float, runs: list[tuple[str, float]]
+) -> Callable[[], None]:
+    """Schedule ``key`` every ``interval`` seconds, recording each run."""
+
+    def _action() -> None:
+        runs.append((key, asyncio.get_running_loop().time()))
+        scheduler.schedule(key, interval, _action)
+
+    return scheduler.schedule(key, interval, _action)
+
+
+def test_mixed_intervals_spread_over_ticks() -> None:
+    """Purifiers on different intervals are spread so no two poll together."""
+
+    async def _main() -> list[tuple[str, float]]:
+        scheduler = PollScheduler(tick=1.0)
+        runs: list[tuple[str, float]] = []
+        for index in range(5):
+            _repeating(scheduler, f"fast{index}", 10, runs)
+        for index in range(6):
+            _repeating(scheduler, f"slow{index}", 30, runs)
+        await asyncio.sleep(120)
+        return runs
+
+    runs = run(_main())
+    per_tick = Counter(when for _, when in runs)
+    assert max(per_tick.values()) == 1
+    per_key = Counter(key for key, _ in runs)
+    assert all(per_key[f"fast{index}"] == 12 for index in range(5))
+    assert all(per_key[f"slow{index}"] == 4 for index in range(6))
+    # Each purifier keeps to its interval
+    for key in per_key:
+        times = [when for other, when in runs if other == key]
+        assert {later - earlier for earlier, later in zip(times, times[1:])} == {
+            10 if key.startswith("fast") else 30
+        }
+
+
+def test_polls_on_one_tick_share_a_wakeup() -> None:
+    """More purifiers than slots poll together from one timer."""
+
+    async def _main() -> tuple[int, int]:
+        scheduler = PollScheduler(tick=1.0)
+        runs: list[tuple[str, float]] = []
+        for index in range(8):
+            _repeating(scheduler, f"p{index}", 2, runs)
+        await asyncio.sleep(20.5)
+        return len(runs), scheduler.wakeups
+
+    polls, wakeups = run(_main())
+    assert polls == 80
+    assert wakeups == 20
+
+
+def test_interval_change_moves_pending_poll() -> None:
+    """Rescheduling on a new interval replaces the pending poll."""
+
+    async def _main() -> list[str]:
+        loop = asyncio.get_running_loop()
+        scheduler = PollScheduler(tick=1.0)
+        ran: list[str] = []
+        scheduler.schedule("a", 60, lambda: ran.append(f"old@{loop.time():.0f}"))
+        await asyncio.sleep(0.5)
+        scheduler.schedule("a", 5, lambda: ran.append(f"new@{loop.time():.0f}"))
+        await asyncio.sleep(70)
+        return ran
+
+    ran = run(_main())
+    assert len(ran) == 1
+    assert ran[0].startswith("new@")
+    assert int(ran[0].partition("@")[2]) <= 6
+
+
+def test_same_interval_keeps_pending_poll() -> None:
+    """Rescheduling on the same interval, e.g. after a command, keeps the due time."""
+
+    async def _main() -> list[float]:
+        loop = asyncio.get_running_loop()
+        scheduler = PollScheduler(tick=1.0)
+        ran: list[float] = []
+        scheduler.schedule("a", 30, lambda: ran.append(-1.0))
+        due = scheduler._heap[0][0]
+        await asyncio.sleep(0.5)
+        scheduler.schedule("a", 30, lambda: ran.append(loop.time()))
+        assert scheduler._heap[0][0] == due
+        await asyncio.sleep(40)
+        return ran
+
+    ran = run(_main())
+    # Only the latest action runs, at the original slot
+    assert len(ran) == 1 and ran[0] > 0
+
+
+def test_cancel_callable() -> None:
+    """The returned callable cancels the poll, and a stale one is harmless."""
+
+    async def _main() -> list[str]:
+        scheduler = PollScheduler(tick=1.0)
+        ran: list[str] = []
+        cancel = scheduler.schedule("a", 10, lambda: ran.append("a"))
+        cancel()
+        stale = scheduler.schedule("b", 10, lambda: ran.append("b-old"))
+        scheduler.schedule("b", 20, lambda: ran.append("b-new"))
+        stale()  # belongs to the replaced poll
+        await asyncio.sleep(30)
+        return ran
+
+    assert run(_main()) == ["b-new"]
+
+
+def test_remove_frees_the_slot() -> None:
+    """A removed purifier's slot goes to the next one added."""
+
+    async def _main() -> tuple[int, int]:
+        scheduler = PollScheduler(tick=1.0)
+        scheduler.schedule("a", 10, lambda: None)
+        slot = scheduler._slots["a"][1]
+        scheduler.remove("a")
+        assert "a" not in scheduler._slots and "a" not in scheduler._pending
+        scheduler.schedule("b", 10, lambda: None)
+        return slot, scheduler._slots["b"][1]
+
+    first, second = run(_main())
+    assert first == second
+
+
+def test_heap_is_compacted() -> None:
+    """Cancelled polls do not pile up in the heap."""
+
+    async def _main() -> tuple[int, int]:
+        scheduler = PollScheduler(tick=1.0)
+        for index in range(4):
+            scheduler.schedule(f"steady{index}", 30, lambda: None)
+        largest = 0
+        for round_ in range(500):
+            # Alternate intervals so every call replaces the pending poll
+            scheduler.schedule("busy", 10 + round_ % 2, lambda: None)
+            largest = max(largest, len(scheduler._heap))
+        return largest, len(scheduler._pending)
+
+    largest, pending = run(_main())
+    assert pending == 5
+    assert largest <= 2 * pending + 16 + 1
@@ -0,0 +1,35 @@
+"""Tests for replaying recorded GATT traffic."""
+from __future__ import annotations
+
+from custom_components.xiaomi_car_air_purifier.gatt_log import (
+    OP_CONNECT,
+    OP_READ,
+    OUTCOME_OK,
+    GattRecord,
+)
+from tools.replay import _MODE, _POWER, ReplayTransport, run_replay
+from tools.simulator import run
+
+
+def _recording(hours: int = 1, interval: float = 30.0) -> list[GattRecord]:
+    """Return a healthy recording polled every ``interval`` seconds."""
+    records = [GattRecord(0.0, 0.05, OP_CONNECT, OUTCOME_OK, 0, b"")]
+    for poll in range(int(hours * 3600 / interval) + 1):
+        started = poll * interval + 0.1
+        records.append(GattRecord(started, 0.02, OP_READ, OUTCOME_OK, _POWER, b"\x01"))
+        records.append(
+            GattRecord(started + 0.02, 0.02, OP_READ, OUTCOME_OK, _MODE, bytes.fromhex("00000f18"))
+        )
+    return records
+
+
+def test_speed_keeps_the_recorded_poll_interval() -> None:
+    """Compressed replays poll every 30 recorded seconds, as at full length."""
+    records = _recording()
+    full = run(run_replay(ReplayTransport(records), scan_interval=30, seed=1))
+    assert full["updates"] == {"ok": 121, "failed": 0}
+    for speed in (20, 60):
+        fast = run(run_replay(ReplayTransport(records, speed=speed), scan_interval=30, seed=1))
+        assert fast["updates"] == full["updates"]
+        assert fast["operations"] == full["operations"]
+        assert abs(fast["data_age"]["max"] - full["data_age"]["max"]) < 0.01
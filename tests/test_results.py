@@ -0,0 +1,63 @@
+"""Tests for comparing tool results against a baseline."""
+from __future__ import annotations
+
+import io
+from typing import Any
+
+from tools import fault_injection
+from tools.results import compare, report_comparison
+
+
+def _document(results: dict[str, Any]) -> dict[str, Any]:
+    return {"meta": {}, "results": results}
+
+
+def _regressions(current: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    comparisons = compare(
+        _document(current), _document(baseline), min_delta=fault_injection.MIN_DELTA
+    )
+    return [item.key for item in comparisons if item.is_regression(0.05)]
+
+
+def test_count_from_zero_to_one_is_flagged() -> None:
+    """One lost or hung command, or one extra read, is a regression."""
+    baseline = {"commands": {"lost": 0, "hung": 0}, "gatt_reads_per_snapshot": 2}
+    current = {"commands": {"lost": 1, "hung": 1}, "gatt_reads_per_snapshot": 3}
+    assert _regressions(current, baseline) == [
+        "commands.hung",
+        "commands.lost",
+        "gatt_reads_per_snapshot",
+    ]
+    comparisons = compare(_document(current), _document(baseline))
+    stream = io.StringIO()
+    assert not report_comparison(comparisons, stream=stream)
+    assert "REGRESSIONS FOUND" in stream.getvalue()
+
+
+def test_failure_counts_ignore_the_tolerance() -> None:
+    """Failure counts regress on any increase, however large the baseline."""
+    baseline = {"unrecovered_incidents": 100, "undetected_incidents": 100, "connect": 100}
+    current = {"unrecovered_incidents": 101, "undetected_incidents": 101, "connect": 101}
+    assert _regressions(current, baseline) == [
+        "undetected_incidents",
+        "unrecovered_incidents",
+    ]
+
+
+def test_timing_noise_below_the_floor_is_not_flagged() -> None:
+    """Time metrics only regress once they move by more than their floor."""
+    baseline = {"unavailable_seconds": 0.0, "latency": {"mean": 0.1, "max": 0.5}}
+    noise = {"unavailable_seconds": 0.9, "latency": {"mean": 0.2, "max": 1.4}}
+    assert _regressions(noise, baseline) == []
+    outage = {"unavailable_seconds": 30.0, "latency": {"mean": 0.1, "max": 0.5}}
+    assert _regressions(outage, baseline) == ["unavailable_seconds"]
+
+
+def test_higher_is_better() -> None:
+    """A drop in a higher-is-better metric is the regression, not a rise."""
+    comparisons = compare(
+        _document({"updates": {"ok": 90, "failed": 0}}),
+        _document({"updates": {"ok": 100, "failed": 0}}),
+        higher_is_better=("ok",),
+    )
+    assert [item.key for item in comparisons if item.is_regression(0.05)] == ["updates.ok"]
@@ -0,0 +1,77 @@
+"""Tests for the runtime and filter wear tracker."""
+from __future__ import annotations
+
+import base64
+import struct
+
+from custom_components.xiaomi_car_air_purifier.usage import STATE_OFF, UsageTracker
+
+START = 1_760_000_000  # epoch seconds
+
+
+def _tracker() -> UsageTracker:
+    """Return a tracker that went Auto, Strong, off and Silent over a day."""
+    tracker = UsageTracker()
+    plan = [(0, True, 0x00), (3600, True, 0x03), (7200, False, 0x03), (9000, True, 0x01)]
+    for start, power, mode in plan:
+        for offset in range(0, 1800, 30):
+            tracker.record(START + start + offset, power, mode)
+    return tracker
+
+
+def test_round_trip_keeps_counters_and_history() -> None:
+    """A saved tracker restores the same counters, wear and transitions."""
+    tracker = _tracker()
+    restored = UsageTracker.from_dict(tracker.as_dict())
+    assert list(restored.transitions()) == list(tracker.transitions())
+    assert restored.runtime_hours == tracker.runtime_hours
+    assert restored.filter_wear == tracker.filter_wear
+    assert [restored.mode_hours(mode) for mode in range(5)] == [
+        tracker.mode_hours(mode) for mode in range(5)
+    ]
+    restored.record(START + 9000 + 1800, True, 0x01)
+    assert restored.runtime_hours > tracker.runtime_hours
+
+
+def test_history_is_four_byte_little_endian_times() -> None:
+    """Saved history is 4-byte times then 1-byte states, whatever the platform."""
+    data = _tracker().as_dict()
+    history = base64.b64decode(data["history"])
+    assert len(history) == 4 * 5
+    times = struct.unpack("<4I", history[:16])
+    assert times == (START, START + 3600, START + 7200, START + 9000)
+    assert history[16:] == bytes([0x00, 0x03, STATE_OFF, 0x01])
+
+
+def _hour(tracker: UsageTracker, start: int, power: bool, mode: int) -> None:
+    """Record an hour of polls every 30 seconds."""
+    for offset in range(0, 3600, 30):
+        tracker.record(start + offset, power, mode)
+
+
+def test_filter_wear_follows_the_mode() -> None:
+    """Silent wears the filter at half the Standard rate and Strong at double."""
+    tracker = UsageTracker()
+    _hour(tracker, START, True, 0x02)
+    _hour(tracker, START + 3600, True, 0x01)
+    _hour(tracker, START + 7200, True, 0x03)
+    _hour(tracker, START + 10800, False, 0x03)
+    # The last Strong poll's interval runs until the first poll while off
+    assert tracker.mode_hours(0x02) == tracker.mode_hours(0x01) == 1.0
+    assert tracker.mode_hours(0x03) == 1.0
+    assert tracker.runtime_hours == 3.0
+    assert tracker.filter_wear == 3600 * (1.0 + 0.5 + 2.0)
+    assert tracker.filter_remaining == 100.0 * (1 - 3.5 / 720)
+    tracker.reset_filter()
+    assert tracker.filter_remaining == 100.0
+    assert tracker.runtime_hours == 3.0
+
+
+def test_gaps_between_polls_are_not_counted() -> None:
+    """Time across a restart or outage longer than max_gap is not attributed."""
+    tracker = UsageTracker(max_gap=600)
+    tracker.record(START, True, 0x02)
+    tracker.record(START + 300, True, 0x02)
+    tracker.record(START + 300 + 3600, True, 0x02)
+    assert tracker.runtime_hours == 300 / 3600
+    assert tracker.filter_wear == 300
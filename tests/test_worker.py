@@ -0,0 +1,71 @@
+"""Tests for the BLE worker process."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from custom_components.xiaomi_car_air_purifier.worker import Worker
+from custom_components.xiaomi_car_air_purifier.worker_ipc import (
+    OP_READY,
+    OP_REFRESH,
+    OP_RESULT,
+    OP_STOP,
+    OP_WRITE,
+    encode_frame,
+    read_frame,
+)
+from tools.simulator import run
+
+
+class _Writer:
+    """Collects what the worker writes, as a StreamWriter would send it."""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    def is_closing(self) -> bool:
+        return False
+
+
+async def _serve(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Feed ``messages`` to a worker and return everything it answered."""
+    reader = asyncio.StreamReader()
+    for message in messages:
+        reader.feed_data(encode_frame(message))
+    reader.feed_eof()
+    writer = _Writer()
+    await Worker(writer).serve(reader)  # type: ignore[arg-type]
+    replies = asyncio.StreamReader()
+    replies.feed_data(bytes(writer.data))
+    replies.feed_eof()
+    sent = []
+    while (message := await read_frame(replies)) is not None:
+        sent.append(message)
+    return sent
+
+
+def test_request_for_unknown_purifier_is_answered_at_once() -> None:
+    """A refresh or write racing a removal fails now, not at the request timeout."""
+
+    async def _main() -> tuple[list[dict[str, Any]], float]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sent = await _serve(
+            [
+                {"op": OP_REFRESH, "id": "gone", "seq": 1},
+                {"op": OP_WRITE, "id": "gone", "seq": 2, "char": "ffd1", "data": "00"},
+                {"op": OP_STOP},
+            ]
+        )
+        return sent, loop.time() - start
+
+    sent, elapsed = run(_main())
+    assert [message["op"] for message in sent] == [OP_READY, OP_RESULT, OP_RESULT]
+    assert [(message["seq"], message["status"]) for message in sent[1:]] == [
+        (1, None),
+        (2, None),
+    ]
+    assert elapsed == 0.0
@@ -0,0 +1,76 @@
+"""Tests for the frames exchanged with the BLE worker."""
+from __future__ import annotations
+
+import asyncio
+import struct
+from typing import Any
+
+import pytest
+
+from custom_components.xiaomi_car_air_purifier.worker_ipc import (
+    MAX_FRAME,
+    OP_DELTAS,
+    OP_REFRESH,
+    FrameError,
+    encode_frame,
+    read_frame,
+)
+from tools.simulator import run
+
+
+def _read_all(data: bytes) -> list[dict[str, Any]]:
+    """Return every frame in ``data``, raising FrameError as read_frame does."""
+
+    async def _main() -> list[dict[str, Any]]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        messages = []
+        while (message := await read_frame(reader)) is not None:
+            messages.append(message)
+        return messages
+
+    return run(_main())
+
+
+def test_frames_round_trip() -> None:
+    """Messages come back whole and in order, however the stream is split."""
+    messages = [
+        {"op": OP_REFRESH, "id": "entry", "seq": 1},
+        {"op": OP_DELTAS, "devices": {"a": {"power": True}, "b": None}},
+        {"op": "note", "text": "ünïcode"},
+    ]
+    data = b"".join(encode_frame(message) for message in messages)
+    assert _read_all(data) == messages
+    assert _read_all(b"") == []
+
+
+def test_frame_is_length_prefixed() -> None:
+    """A frame is a 4-byte big-endian length, then compact JSON."""
+    frame = encode_frame({"op": OP_REFRESH, "seq": 7})
+    (length,) = struct.unpack(">I", frame[:4])
+    assert frame[4:] == b'{"op":"refresh","seq":7}'
+    assert length == len(frame) - 4
+
+
+def test_oversized_frames_are_refused() -> None:
+    """Neither side sends or accepts a frame over MAX_FRAME."""
+    with pytest.raises(FrameError):
+        encode_frame({"data": "x" * MAX_FRAME})
+    with pytest.raises(FrameError, match="exceeds"):
+        _read_all(struct.pack(">I", MAX_FRAME + 1))
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        (b"\x00\x00", "inside a frame header"),
+        (encode_frame({"op": OP_REFRESH})[:-1], "inside a frame"),
+        (struct.pack(">I", 3) + b"{no", "not valid JSON"),
+        (struct.pack(">I", 3) + b"[1]", "not a JSON object"),
+    ],
+)
+def test_malformed_frames_raise(data: bytes, message: str) -> None:
+    """A cut or garbled stream raises FrameError rather than passing bad data on."""
+    with pytest.raises(FrameError, match=message):
+        _read_all(data)
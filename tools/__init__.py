@@ -0,0 +1,4 @@
+"""Offline development tools for the Xiaomi Car Air Purifier integration.
+
+Run them from the repository root, e.g. ``python -m tools.fault_injection``.
+"""
@@ -0,0 +1,564 @@
+"""Benchmarks for coordinator polling and command latency.
+
+Two sections, both driving the real integration code over the simulated
+transport:
+
+overhead
+    Wall-clock cost of the Python code path per operation, measured on a
+    normal event loop against a zero-latency purifier, and of the
+    per-purifier logging layer against plain logger calls.
+modelled
+    End-to-end latency with realistic GATT round-trip times on a virtual
+    clock: status snapshots, entity call -> state written, lock contention
+    between polls and commands, pushing a state to a fleet with the
+    set_state service, and a fleet connecting at once after a restart or
+    adapter reset, with and without connection pacing. Deterministic for
+    a given seed.
+
+    python -m tools.bench --output baseline.json
+    python -m tools.bench --compare baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable
+import itertools
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any
+
+from custom_components.xiaomi_car_air_purifier.ble_client import (
+    XiaomiCarAirPurifierBLEClient,
+)
+from custom_components.xiaomi_car_air_purifier.connection_gate import ConnectionGate
+from custom_components.xiaomi_car_air_purifier.const import (
+    CONF_CONNECT_WINDOW,
+    DATA_CONNECTION_GATE,
+    MODE_VALUES,
+)
+from custom_components.xiaomi_car_air_purifier.device_log import DeviceLogger, LazyHex
+
+from . import results as results_io
+from .simulator import (
+    SimulatedAdapter,
+    SimulatedConfigEntry,
+    SimulatedPurifier,
+    async_create_hass,
+    create_coordinator,
+    run,
+    simulated_address,
+)
+
+ADDRESS = "F0:0D:00:00:00:01"
+MODES = tuple(MODE_VALUES)
+
+# Home Assistant's retry delays for a config entry whose setup failed
+SETUP_RETRY_DELAYS = (5, 10, 20, 40, 80)
+
+# Modelled numbers are deterministic; wall-clock overhead is noisy
+DEFAULT_TOLERANCE = 0.05
+DEFAULT_OVERHEAD_TOLERANCE = 0.25
+# Timing changes this small are not regressions; counts have no floor
+MIN_DELTA = {"_us": 1.0, "ops_per_s": 1.0, "_ms": 1.0, "seconds": 1.0}
+
+
+class InstrumentedLock(asyncio.Lock):
+    """asyncio.Lock that records how long each acquisition waited."""
+
+    def __init__(self, is_command: Callable[[], bool]) -> None:
+        """Initialize the lock; ``is_command`` classifies the current caller."""
+        super().__init__()
+        self._is_command = is_command
+        self.waits: dict[str, list[float]] = {"command": [], "poll": []}
+
+    async def acquire(self) -> bool:
+        """Acquire the lock, recording the wait."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await super().acquire()
+        self.waits["command" if self._is_command() else "poll"].append(loop.time() - start)
+        return result
+
+
+def _stats(samples: list[float], scale: float, unit: str) -> dict[str, float]:
+    """Summarize ``samples`` (seconds) in ``unit`` after multiplying by ``scale``."""
+    ordered = sorted(s * scale for s in samples)
+    if not ordered:
+        return {}
+    return {
+        f"mean_{unit}": statistics.fmean(ordered),
+        f"p50_{unit}": ordered[len(ordered) // 2],
+        f"p95_{unit}": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        f"max_{unit}": ordered[-1],
+    }
+
+
+async def _time_calls(
+    func: Callable[[int], Awaitable[Any]], iterations: int, rounds: int
+) -> dict[str, float]:
+    """Time ``func(i)`` and return per-call stats from the fastest round."""
+    best: list[float] | None = None
+    for _ in range(rounds):
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            await func(i)
+            samples.append(time.perf_counter() - start)
+        if best is None or sum(samples) < sum(best):
+            best = samples
+    assert best is not None
+    return _summarize_calls(best)
+
+
+def _time_sync_calls(
+    func: Callable[[int], Any], iterations: int, rounds: int
+) -> dict[str, float]:
+    """Time a plain function like _time_calls, in batches of 100 calls."""
+    best: list[float] | None = None
+    for _ in range(rounds):
+        samples = []
+        for batch in range(0, iterations, 100):
+            calls = range(batch, min(batch + 100, iterations))
+            start = time.perf_counter()
+            for i in calls:
+                func(i)
+            samples.extend([(time.perf_counter() - start) / len(calls)] * len(calls))
+        if best is None or sum(samples) < sum(best):
+            best = samples
+    assert best is not None
+    return _summarize_calls(best)
+
+
+def _summarize_calls(best: list[float]) -> dict[str, float]:
+    """Return per-call stats for the samples of the fastest round."""
+    # Single-call maxima are scheduler noise, so they are left out here
+    result = _stats(best, 1e6, "us")
+    del result["max_us"]
+    result["ops_per_s"] = len(best) / sum(best)
+    return result
+
+
+def _fast_purifier() -> SimulatedPurifier:
+    """Return a purifier with no simulated latency."""
+    return SimulatedPurifier(ADDRESS, latency=0.0, jitter=0.0, connect_latency=0.0)
+
+
+async def bench_overhead(iterations: int, rounds: int) -> dict[str, Any]:
+    """Measure the Python-side cost per operation."""
+    from custom_components.xiaomi_car_air_purifier.fan import XiaomiCarAirPurifierFan
+
+    results: dict[str, Any] = {}
+
+    purifier = _fast_purifier()
+    client = XiaomiCarAirPurifierBLEClient(purifier.ble_device, connector=purifier.connect)
+    await client.connect()
+    results["client_get_status"] = await _time_calls(
+        lambda i: client.get_status(), iterations, rounds
+    )
+    results["client_set_mode"] = await _time_calls(
+        lambda i: client.set_mode(MODES[i % len(MODES)]), iterations, rounds
+    )
+    await client.disconnect()
+
+    hass = await async_create_hass()
+    coordinator = create_coordinator(hass, _fast_purifier())
+    unsub = coordinator.async_add_listener(lambda: None)
+    await coordinator.async_refresh()
+    results["coordinator_poll"] = await _time_calls(
+        lambda i: coordinator.async_refresh(), iterations, rounds
+    )
+    # Commands trigger a debounced refresh; measure the call itself
+    fan = XiaomiCarAirPurifierFan(coordinator, SimulatedConfigEntry(ADDRESS))
+    results["entity_set_preset_mode"] = await _time_calls(
+        lambda i: fan.async_set_preset_mode(MODES[i % len(MODES)]), iterations, rounds
+    )
+    unsub()
+    await coordinator.async_shutdown()
+    results["logging"] = _bench_logging(iterations, rounds)
+    return results
+
+
+def _bench_logging(iterations: int, rounds: int) -> dict[str, Any]:
+    """Measure log calls from the BLE hot paths, plain and through DeviceLogger."""
+    logger = logging.getLogger(f"{__name__}.logging")
+    logger.propagate = False
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        log = DeviceLogger(logger, ADDRESS)
+        mode = MODE_VALUES["Strong"]
+        results: dict[str, Any] = {}
+        try:
+            # Debug off, as in a default Home Assistant install
+            logger.setLevel(logging.WARNING)
+            results["debug_off_eager_hex"] = _time_sync_calls(
+                lambda i: logger.debug(
+                    "Setting mode: %s (%s)", "Strong", " ".join(f"0x{b:02x}" for b in mode)
+                ),
+                iterations,
+                rounds,
+            )
+            results["debug_off_device_lazy_hex"] = _time_sync_calls(
+                lambda i: log.debug("Setting mode: %s (%s)", "Strong", LazyHex(mode)),
+                iterations,
+                rounds,
+            )
+            # A purifier failing the same way on every attempt
+            results["warning_repeated_plain"] = _time_sync_calls(
+                lambda i: logger.warning("Failed to connect: %s", "timed out"),
+                iterations,
+                rounds,
+            )
+            results["warning_repeated_device"] = _time_sync_calls(
+                lambda i: log.warning("Failed to connect: %s", "timed out"),
+                iterations,
+                rounds,
+            )
+            # Debug on, plain text and structured
+            logger.setLevel(logging.DEBUG)
+            results["debug_on_device_lazy_hex"] = _time_sync_calls(
+                lambda i: log.debug("Setting mode: %s (%s)", "Strong", LazyHex(mode)),
+                iterations,
+                rounds,
+            )
+            log.structured = True
+            results["debug_on_device_structured"] = _time_sync_calls(
+                lambda i: log.debug("Setting mode: %s (%s)", "Strong", LazyHex(mode)),
+                iterations,
+                rounds,
+            )
+        finally:
+            logger.removeHandler(handler)
+    return results
+
+
+async def _modelled_get_status(samples: int) -> dict[str, Any]:
+    """Measure status snapshot latency over a realistic link."""
+    loop = asyncio.get_running_loop()
+    purifier = SimulatedPurifier(ADDRESS)
+    client = XiaomiCarAirPurifierBLEClient(purifier.ble_device, connector=purifier.connect)
+    client.log.clock = loop.time
+    await client.connect()
+    reads_before = purifier.stats["read"]
+    latencies = []
+    for _ in range(samples):
+        start = loop.time()
+        await client.get_status()
+        latencies.append(loop.time() - start)
+    await client.disconnect()
+    return {
+        **_stats(latencies, 1e3, "ms"),
+        "gatt_reads_per_snapshot": (purifier.stats["read"] - reads_before) / samples,
+    }
+
+
+async def _modelled_command_e2e(samples: int, spacing: float) -> dict[str, Any]:
+    """Measure entity call -> state written with commands ``spacing`` apart."""
+    from custom_components.xiaomi_car_air_purifier.fan import XiaomiCarAirPurifierFan
+
+    loop = asyncio.get_running_loop()
+    hass = await async_create_hass()
+    purifier = SimulatedPurifier(ADDRESS)
+    coordinator = create_coordinator(hass, purifier)
+    fan = XiaomiCarAirPurifierFan(coordinator, SimulatedConfigEntry(ADDRESS))
+
+    target: str | None = None
+    written = asyncio.Event()
+
+    def _on_update() -> None:
+        if coordinator.data and coordinator.data.get("mode") == target:
+            written.set()
+
+    unsub = coordinator.async_add_listener(_on_update)
+    await coordinator.async_refresh()
+    ops_before = purifier.stats["read"] + purifier.stats["write"]
+
+    latencies = []
+    for i in range(samples):
+        await asyncio.sleep(spacing)
+        target = MODES[(i + 1) % len(MODES)]
+        written.clear()
+        start = loop.time()
+        await fan.async_set_preset_mode(target)
+        await written.wait()
+        latencies.append(loop.time() - start)
+
+    unsub()
+    await coordinator.async_shutdown()
+    return {
+        **_stats(latencies, 1e3, "ms"),
+        "gatt_ops_per_command": (
+            purifier.stats["read"] + purifier.stats["write"] - ops_before
+        )
+        / samples,
+    }
+
+
+async def _modelled_lock_contention(duration: float, seed: int) -> dict[str, Any]:
+    """Measure lock waits with polls and randomly timed commands interleaved."""
+    from custom_components.xiaomi_car_air_purifier.fan import XiaomiCarAirPurifierFan
+
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    hass = await async_create_hass()
+    purifier = SimulatedPurifier(ADDRESS, seed=seed)
+    coordinator = create_coordinator(hass, purifier)
+    fan = XiaomiCarAirPurifierFan(coordinator, SimulatedConfigEntry(ADDRESS))
+    command_tasks: set[asyncio.Task] = set()
+    lock = InstrumentedLock(lambda: asyncio.current_task() in command_tasks)
+    coordinator._operation_lock = lock
+
+    unsub = coordinator.async_add_listener(lambda: None)
+    await coordinator.async_refresh()
+    start = loop.time()
+    while loop.time() - start < duration:
+        await asyncio.sleep(rng.expovariate(1 / 20))
+        task = asyncio.create_task(fan.async_set_preset_mode(rng.choice(MODES)))
+        command_tasks.add(task)
+    await asyncio.gather(*command_tasks)
+    unsub()
+    await coordinator.async_shutdown()
+
+    results: dict[str, Any] = {}
+    for kind, waits in lock.waits.items():
+        contended = [w for w in waits if w > 0]
+        results[kind] = {
+            "acquisitions": len(waits),
+            "contended": len(contended),
+            **_stats(contended or [0.0], 1e3, "wait_ms"),
+        }
+    return results
+
+
+async def _modelled_bulk_set_state(devices: int, seed: int) -> dict[str, Any]:
+    """Time pushing power on + Strong to a fleet, one by one and in bulk."""
+    from custom_components.xiaomi_car_air_purifier.services import async_set_state
+
+    loop = asyncio.get_running_loop()
+    hass = await async_create_hass()
+    fleet = []
+    for index in range(devices):
+        purifier = SimulatedPurifier(simulated_address(index), seed=seed + index)
+        fleet.append((purifier.address, create_coordinator(hass, purifier), "hci0"))
+    await asyncio.gather(*(coordinator.async_refresh() for _, coordinator, _ in fleet))
+
+    # One entity call after another, as a script looping over fan.turn_on does
+    start = loop.time()
+    for _, coordinator, _ in fleet:
+        await coordinator.async_set_power(True)
+        await coordinator.async_set_mode("Strong")
+    one_by_one = loop.time() - start
+    await asyncio.sleep(60)  # let the refresh debouncers settle
+
+    bulk = await async_set_state(fleet, power=True, mode="Auto")
+    await asyncio.gather(*(coordinator.async_shutdown() for _, coordinator, _ in fleet))
+    return {
+        "one_by_one_seconds": one_by_one,
+        "bulk_seconds": bulk["seconds"],
+        "bulk_failed": bulk["failed"],
+        "bulk_device_max_seconds": max(
+            result["queued_seconds"] + result["seconds"] for result in bulk["devices"].values()
+        ),
+    }
+
+
+async def _modelled_reconnect_storm(devices: int, seed: int, *, paced: bool) -> dict[str, Any]:
+    """Time a fleet on one adapter connecting at startup and after an adapter reset."""
+    loop = asyncio.get_running_loop()
+    hass = await async_create_hass()
+    adapter = SimulatedAdapter()
+    options = {}
+    if not paced:
+        # No jitter and a bucket that never runs dry: every purifier for itself
+        hass.data[DATA_CONNECTION_GATE] = ConnectionGate(rate=1e9, burst=10**9)
+        options[CONF_CONNECT_WINDOW] = 0
+    else:
+        hass.data[DATA_CONNECTION_GATE] = ConnectionGate(rng=random.Random(seed))
+    fleet = []
+    for index in range(devices):
+        purifier = SimulatedPurifier(
+            simulated_address(index), rssi=-45 - (index * 7) % 50, seed=seed + index
+        )
+        purifier.adapter = adapter
+        fleet.append((purifier, create_coordinator(hass, purifier, options=options)))
+
+    async def _set_up(coordinator: Any) -> float:
+        # First refresh, retried with Home Assistant's ConfigEntryNotReady backoff
+        for delay in itertools.chain(SETUP_RETRY_DELAYS, itertools.repeat(SETUP_RETRY_DELAYS[-1])):
+            await coordinator.async_refresh()
+            if coordinator.last_update_success:
+                return loop.time()
+            await asyncio.sleep(delay)
+
+    start = loop.time()
+    connected = await asyncio.gather(*(_set_up(coordinator) for _, coordinator in fleet))
+    startup = max(connected) - start
+    startup_connects = adapter.stats["connect"]
+    startup_rejected = adapter.stats["rejected"]
+
+    # Polls only run with listeners; then the adapter resets and every link drops
+    unsubs = [coordinator.async_add_listener(lambda: None) for _, coordinator in fleet]
+    await asyncio.sleep(120)
+    reset = loop.time()
+    for purifier, _ in fleet:
+        purifier.drop_link()
+    while any(
+        (purifier.last_status_read or 0) < reset for purifier, _ in fleet
+    ):
+        await asyncio.sleep(1)
+    recovery = loop.time() - reset
+
+    for unsub in unsubs:
+        unsub()
+    await asyncio.gather(*(coordinator.async_shutdown() for _, coordinator in fleet))
+    return {
+        "startup_all_connected_seconds": startup,
+        "startup_connect_attempts": startup_connects,
+        "startup_rejected_connects": startup_rejected,
+        "recovery_all_connected_seconds": recovery,
+        "recovery_connect_attempts": adapter.stats["connect"] - startup_connects,
+        "recovery_rejected_connects": adapter.stats["rejected"] - startup_rejected,
+    }
+
+
+async def _modelled_fleet_polling(
+    devices: int, seed: int, duration: float = 3600.0
+) -> dict[str, Any]:
+    """Measure when a fleet's scheduled polls run, and how many overlap."""
+    loop = asyncio.get_running_loop()
+    hass = await async_create_hass()
+    fleet = [
+        create_coordinator(
+            hass, SimulatedPurifier(simulated_address(index), latency=0.08, seed=seed + index)
+        )
+        for index in range(devices)
+    ]
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in fleet))
+
+    starts: list[float] = []
+    in_flight = 0
+    max_in_flight = 0
+
+    def _instrument(coordinator: Any) -> None:
+        update = coordinator._async_update_data
+
+        async def _update() -> Any:
+            nonlocal in_flight, max_in_flight
+            starts.append(loop.time())
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            try:
+                return await update()
+            finally:
+                in_flight -= 1
+
+        coordinator._async_update_data = _update
+
+    for coordinator in fleet:
+        _instrument(coordinator)
+    unsubs = [coordinator.async_add_listener(lambda: None) for coordinator in fleet]
+    start = loop.time()
+    await asyncio.sleep(duration)
+    for unsub in unsubs:
+        unsub()
+    await asyncio.gather(*(coordinator.async_shutdown() for coordinator in fleet))
+
+    minutes = (loop.time() - start) / 60
+    per_second = Counter(int(t) for t in starts)
+    return {
+        "polls_per_device_minute": len(starts) / devices / minutes,
+        # Polls due at the same instant share one timer wakeup
+        "poll_wakeups_per_minute": len(set(starts)) / minutes,
+        "max_polls_started_per_second": max(per_second.values(), default=0),
+        "max_concurrent_polls": max_in_flight,
+    }
+
+
+async def bench_modelled(samples: int, seed: int) -> dict[str, Any]:
+    """Measure latency over a realistic simulated link on a virtual clock."""
+    random.seed(seed)
+    return {
+        "get_status": await _modelled_get_status(samples),
+        "command_e2e_spaced_2s": await _modelled_command_e2e(samples, 2.0),
+        "command_e2e_spaced_15s": await _modelled_command_e2e(samples, 15.0),
+        "lock_contention": await _modelled_lock_contention(3600.0, seed),
+        "bulk_set_state_20": await _modelled_bulk_set_state(20, seed),
+        "fleet_polling_25": await _modelled_fleet_polling(25, seed),
+        "fleet_polling_100": await _modelled_fleet_polling(100, seed),
+        "reconnect_storm_50": {
+            "paced": await _modelled_reconnect_storm(50, seed, paced=True),
+            "unpaced": await _modelled_reconnect_storm(50, seed, paced=False),
+        },
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--section",
+        action="append",
+        choices=("overhead", "modelled"),
+        help="section to run (repeatable, default: both)",
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument(
+        "--overhead-tolerance", type=float, default=DEFAULT_OVERHEAD_TOLERANCE
+    )
+    args = parser.parse_args(argv)
+
+    # Home Assistant logs at WARNING by default; benchmark that configuration
+    logging.basicConfig(level=logging.WARNING)
+    sections = args.section or ["overhead", "modelled"]
+
+    results: dict[str, Any] = {}
+    if "overhead" in sections:
+        results["overhead"] = run(
+            bench_overhead(args.iterations, args.rounds), virtual_time=False
+        )
+    if "modelled" in sections:
+        results["modelled"] = run(bench_modelled(args.samples, args.seed))
+
+    document = results_io.build_document(
+        "bench",
+        results,
+        iterations=args.iterations,
+        rounds=args.rounds,
+        samples=args.samples,
+        seed=args.seed,
+    )
+    results_io.write_document(document, args.output)
+
+    if args.compare:
+        baseline = results_io.load_document(args.compare)
+        comparisons = results_io.compare(
+            document, baseline, higher_is_better=("ops_per_s",), min_delta=MIN_DELTA
+        )
+        ok = True
+        for section, tolerance in (
+            ("overhead.", args.overhead_tolerance),
+            ("modelled.", args.tolerance),
+        ):
+            ok &= results_io.report_comparison(
+                [c for c in comparisons if c.key.startswith(section)],
+                tolerance=tolerance,
+            )
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
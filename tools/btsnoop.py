@@ -0,0 +1,540 @@
+"""Decode purifier GATT traffic from a btsnoop HCI capture.
+
+Reads the ``btsnoop_hci.log`` written by Android's "Bluetooth HCI snoop log"
+developer option (or by ``btmon -w`` on Linux), follows HCI ACL -> L2CAP ->
+ATT and prints every read, write and notification on the purifier's FFD0
+service as a timeline, with power and mode values decoded:
+
+    python -m tools.btsnoop btsnoop_hci.log
+    python -m tools.btsnoop btsnoop_hci.log --summary
+    python -m tools.btsnoop btsnoop_hci.log --handle 0x002a=FFD3 --json
+
+The file is memory-mapped and walked record by record, with the pages behind
+the cursor released as it goes, so a capture of several hundred MB from a
+long drive is decoded in constant memory. The FFD0 handles are learned from
+the service and characteristic discovery in the capture; when the phone had
+them cached and never rediscovered, give them with ``--handle``.
+"""
+from __future__ import annotations
+
+import argparse
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from datetime import datetime
+import json
+import mmap
+from pathlib import Path
+import struct
+import sys
+import time
+from typing import Any, NamedTuple
+
+from custom_components.xiaomi_car_air_purifier.gatt_log import describe_value
+
+MAGIC = b"btsnoop\0"
+
+# Datalink types of the file header
+DATALINK_HCI = 1001  # un-encapsulated; packet type comes from the record flags
+DATALINK_H4 = 1002  # UART (H4); packet type is the first byte (Android)
+DATALINK_MONITOR = 2001  # BlueZ monitor (btmon); opcode in the record flags
+
+# H4 packet types
+HCI_COMMAND = 0x01
+HCI_ACL = 0x02
+HCI_EVENT = 0x04
+
+# Monitor opcodes: (packet type, received)
+_MONITOR_OPCODES = {
+    2: (HCI_COMMAND, False),
+    3: (HCI_EVENT, True),
+    4: (HCI_ACL, False),
+    5: (HCI_ACL, True),
+}
+
+_FILE_HEADER = struct.Struct(">8sII")
+_RECORD = struct.Struct(">IIIIq")
+# Record timestamps are microseconds since 0000-01-01 00:00
+_EPOCH_OFFSET_US = 0x00DCDDB30F2F8000
+# Mapped pages behind the cursor are released every this many bytes
+_RELEASE_CHUNK = 16 << 20
+
+_EVENT_DISCONNECTION_COMPLETE = 0x05
+_EVENT_LE_META = 0x3E
+_LE_CONNECTION_COMPLETE = (0x01, 0x0A)  # legacy and enhanced
+_CID_ATT = 0x0004
+
+# ATT opcodes
+ATT_ERROR_RSP = 0x01
+ATT_FIND_INFO_REQ = 0x04
+ATT_FIND_INFO_RSP = 0x05
+ATT_READ_BY_TYPE_REQ = 0x08
+ATT_READ_BY_TYPE_RSP = 0x09
+ATT_READ_REQ = 0x0A
+ATT_READ_RSP = 0x0B
+ATT_READ_BLOB_REQ = 0x0C
+ATT_READ_BLOB_RSP = 0x0D
+ATT_READ_BY_GROUP_TYPE_REQ = 0x10
+ATT_READ_BY_GROUP_TYPE_RSP = 0x11
+ATT_WRITE_REQ = 0x12
+ATT_NOTIFY = 0x1B
+ATT_INDICATE = 0x1D
+ATT_WRITE_CMD = 0x52
+
+ATT_ERRORS = {
+    0x01: "invalid handle",
+    0x02: "read not permitted",
+    0x03: "write not permitted",
+    0x05: "insufficient authentication",
+    0x06: "request not supported",
+    0x07: "invalid offset",
+    0x0A: "attribute not found",
+    0x0D: "invalid attribute value length",
+    0x0E: "unlikely error",
+    0x0F: "insufficient encryption",
+}
+
+_UNSOLICITED = {ATT_WRITE_CMD: "write-cmd", ATT_NOTIFY: "notify", ATT_INDICATE: "indicate"}
+_RESPONSES = frozenset(
+    (
+        ATT_ERROR_RSP,
+        ATT_READ_RSP,
+        ATT_READ_BLOB_RSP,
+        ATT_READ_BY_TYPE_RSP,
+        ATT_READ_BY_GROUP_TYPE_RSP,
+        ATT_FIND_INFO_RSP,
+    )
+)
+
+UUID_PRIMARY_SERVICE = 0x2800
+UUID_CHARACTERISTIC = 0x2803
+UUID_CCCD = 0x2902
+PURIFIER_SERVICE = 0xFFD0
+
+# Bytes 0-11 of the Bluetooth base UUID, little-endian as sent over the air
+_BASE_UUID_LE = bytes.fromhex("fb349b5f8000008000100000")
+# Distinct values kept per characteristic in the summary
+_MAX_DISTINCT_VALUES = 32
+
+
+class HciPacket(NamedTuple):
+    """An ACL data or event packet from the capture."""
+
+    time: float  # epoch seconds
+    kind: int  # HCI_ACL or HCI_EVENT
+    received: bool  # controller to host
+    adapter: int
+    data: bytes
+
+
+class AttEvent(NamedTuple):
+    """One ATT operation on a characteristic."""
+
+    time: float
+    device: str
+    op: str  # read, write, write-cmd, notify, indicate or error
+    handle: int
+    char: int  # 16-bit UUID, 0 if not learned
+    value: bytes  # for errors, the ATT error code
+
+
+def iter_hci(path: str | Path) -> Iterator[HciPacket]:
+    """Yield the ACL and event packets of a btsnoop file in order."""
+    with Path(path).open("rb") as file:
+        if not file.seek(0, 2):
+            raise ValueError(f"{path} is empty")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            size = len(view)
+            if size < _FILE_HEADER.size:
+                raise ValueError(f"{path} is not a btsnoop file")
+            magic, version, datalink = _FILE_HEADER.unpack_from(view, 0)
+            if magic != MAGIC or version != 1:
+                raise ValueError(f"{path} is not a btsnoop file")
+            if datalink not in (DATALINK_HCI, DATALINK_H4, DATALINK_MONITOR):
+                raise ValueError(f"{path}: unsupported datalink type {datalink}")
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                view.madvise(mmap.MADV_SEQUENTIAL)
+            can_release = hasattr(mmap, "MADV_DONTNEED")
+            released = 0
+            offset = _FILE_HEADER.size
+            unpack_record = _RECORD.unpack_from
+            while offset + _RECORD.size <= size:
+                _, length, flags, _, stamp = unpack_record(view, offset)
+                start = offset + _RECORD.size
+                offset = start + length
+                if offset > size or not length:
+                    break  # truncated by the capture being pulled mid-write
+                adapter = 0
+                if datalink == DATALINK_H4:
+                    kind = view[start]
+                    start += 1
+                    received = bool(flags & 1)
+                elif datalink == DATALINK_HCI:
+                    received = bool(flags & 1)
+                    if flags & 2:
+                        kind = HCI_EVENT if received else HCI_COMMAND
+                    else:
+                        kind = HCI_ACL
+                else:
+                    kind, received = _MONITOR_OPCODES.get(flags & 0xFFFF, (0, False))
+                    adapter = flags >> 16
+                if kind == HCI_ACL or kind == HCI_EVENT:
+                    yield HciPacket(
+                        (stamp - _EPOCH_OFFSET_US) / 1e6,
+                        kind,
+                        received,
+                        adapter,
+                        view[start:offset],
+                    )
+                if can_release and offset - released >= _RELEASE_CHUNK:
+                    # Whole pages only; the mapping is read-only, so this just
+                    # drops them from our resident set
+                    end = offset - offset % mmap.PAGESIZE
+                    view.madvise(mmap.MADV_DONTNEED, released, end - released)
+                    released = end
+
+
+def uuid16(data: bytes) -> int:
+    """Return the 16-bit form of a little-endian 2- or 16-byte UUID, or 0."""
+    if len(data) == 2:
+        return data[0] | data[1] << 8
+    if len(data) == 16 and data[:12] == _BASE_UUID_LE and data[14:] == b"\0\0":
+        return data[12] | data[13] << 8
+    return 0
+
+
+class _GattTable:
+    """Attribute handles learned for one device."""
+
+    def __init__(self, handles: dict[int, int]) -> None:
+        self.chars = dict(handles)  # handle -> 16-bit UUID
+        self.services: list[tuple[int, int]] = []  # FFD0 handle ranges
+
+    def is_purifier(self, handle: int) -> bool:
+        """Return True if the handle belongs to the FFD0 service."""
+        if self.chars.get(handle, 0) & 0xFFF0 == PURIFIER_SERVICE:
+            return True
+        return any(start <= handle <= end for start, end in self.services)
+
+
+class AttDecoder:
+    """Turns HCI packets into ATT operations on the purifier's characteristics.
+
+    Keeps only per-connection state (peer address, one pending request and
+    one partial L2CAP frame per direction) and the handle table per device,
+    so memory does not grow with the length of the capture.
+    """
+
+    def __init__(
+        self,
+        handles: dict[int, int] | None = None,
+        *,
+        all_handles: bool = False,
+        addresses: set[str] | None = None,
+    ) -> None:
+        """Initialize the decoder.
+
+        ``handles`` maps attribute handles to 16-bit UUIDs for every device,
+        ``all_handles`` reports ATT operations outside the FFD0 service too
+        and ``addresses`` restricts the output to those peers.
+        """
+        self.all_handles = all_handles
+        self.addresses = addresses
+        self.att_pdus = 0
+        self._handles = handles or {}
+        self._peers: dict[tuple[int, int], str] = {}
+        # Keyed by (adapter, connection handle, received)
+        self._fragments: dict[tuple[int, int, bool], bytearray] = {}
+        self._pending: dict[tuple[int, int, bool], tuple[int, int, int]] = {}
+        self._routes: dict[tuple[int, int, bool], tuple[str, _GattTable | None]] = {}
+        self._tables: dict[str, _GattTable] = {}
+
+    @property
+    def learned(self) -> bool:
+        """Return True if any FFD0 handle is known."""
+        tables = [_GattTable(self._handles), *self._tables.values()]
+        return any(
+            table.services or any(table.is_purifier(handle) for handle in table.chars)
+            for table in tables
+        )
+
+    def feed(self, packet: HciPacket) -> list[AttEvent]:
+        """Decode one packet; return the ATT operations it completes."""
+        if packet.kind == HCI_EVENT:
+            self._event(packet)
+            return []
+        data = packet.data
+        if len(data) < 4:
+            return []
+        header = data[0] | data[1] << 8
+        key = (packet.adapter, header & 0x0FFF, packet.received)
+        if header & 0x3000 == 0x1000:  # continuation fragment
+            frame = self._fragments.get(key)
+            if frame is None:
+                return []
+            frame += data[4:]
+            length = frame[0] | frame[1] << 8
+            if len(frame) < 4 + length:
+                return []
+            del self._fragments[key]
+            pdu = bytes(frame[4 : 4 + length])
+        else:
+            if self._fragments:
+                self._fragments.pop(key, None)
+            # Most ACL traffic in a long capture is audio; drop it before copying
+            if len(data) < 8 or data[6] != _CID_ATT or data[7]:
+                return []
+            length = data[4] | data[5] << 8
+            if len(data) < 8 + length:
+                self._fragments[key] = bytearray(data[4:])
+                return []
+            pdu = data[8 : 8 + length]
+        return self._att(packet.time, key, pdu)
+
+    def _event(self, packet: HciPacket) -> None:
+        """Track which peer each connection handle belongs to."""
+        data = packet.data
+        code = data[0]
+        if code == _EVENT_LE_META and len(data) >= 14 and data[2] in _LE_CONNECTION_COMPLETE:
+            if data[3] == 0:  # success
+                link = (packet.adapter, (data[4] | data[5] << 8) & 0x0FFF)
+                self._forget(link)
+                self._peers[link] = ":".join(f"{byte:02X}" for byte in reversed(data[8:14]))
+        elif code == _EVENT_DISCONNECTION_COMPLETE and len(data) >= 5 and data[2] == 0:
+            link = (packet.adapter, (data[3] | data[4] << 8) & 0x0FFF)
+            self._forget(link)
+            self._peers.pop(link, None)
+
+    def _forget(self, link: tuple[int, int]) -> None:
+        """Drop the state of a connection whose handle is being reused."""
+        for received in (False, True):
+            key = (*link, received)
+            self._fragments.pop(key, None)
+            self._pending.pop(key, None)
+            self._routes.pop(key, None)
+
+    def _route(self, key: tuple[int, int, bool]) -> tuple[str, _GattTable | None]:
+        """Return the device name and handle table for a connection."""
+        device = self._peers.get(key[:2]) or f"hci{key[0]}/0x{key[1]:03X}"
+        if self.addresses is not None and device not in self.addresses:
+            return device, None
+        table = self._tables.get(device)
+        if table is None:
+            table = self._tables[device] = _GattTable(self._handles)
+        return device, table
+
+    def _att(
+        self, timestamp: float, key: tuple[int, int, bool], pdu: bytes
+    ) -> list[AttEvent]:
+        """Decode one ATT PDU."""
+        if not pdu:
+            return []
+        self.att_pdus += 1
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = self._route(key)
+        device, table = route
+        if table is None:
+            return []
+        opcode = pdu[0]
+        found: list[tuple[str, int, bytes]] = []
+
+        if opcode in (ATT_READ_REQ, ATT_READ_BLOB_REQ, ATT_WRITE_REQ) and len(pdu) >= 3:
+            handle = pdu[1] | pdu[2] << 8
+            self._pending[key] = (opcode, handle, 0)
+            if opcode == ATT_WRITE_REQ:
+                found.append(("write", handle, pdu[3:]))
+        elif opcode in (ATT_READ_BY_TYPE_REQ, ATT_READ_BY_GROUP_TYPE_REQ) and len(pdu) >= 7:
+            self._pending[key] = (opcode, pdu[1] | pdu[2] << 8, uuid16(pdu[5:]))
+        elif opcode == ATT_FIND_INFO_REQ:
+            self._pending[key] = (opcode, 0, 0)
+        elif opcode in (ATT_WRITE_CMD, ATT_NOTIFY, ATT_INDICATE) and len(pdu) >= 3:
+            found.append((_UNSOLICITED[opcode], pdu[1] | pdu[2] << 8, pdu[3:]))
+        elif opcode in _RESPONSES:
+            # Responses answer the request sent the other way
+            request = self._pending.pop((key[0], key[1], not key[2]), None)
+            if request is not None:
+                found.extend(self._response(table, opcode, pdu, request))
+
+        if not found:
+            return found
+        return [
+            AttEvent(timestamp, device, op, handle, table.chars.get(handle, 0), value)
+            for op, handle, value in found
+            if self.all_handles or table.is_purifier(handle)
+        ]
+
+    def _response(
+        self, table: _GattTable, opcode: int, pdu: bytes, request: tuple[int, int, int]
+    ) -> Iterator[tuple[str, int, bytes]]:
+        """Decode a response; learn handles from discovery responses."""
+        request_op, handle, uuid = request
+        if opcode == ATT_ERROR_RSP:
+            if len(pdu) >= 5 and request_op in (ATT_READ_REQ, ATT_READ_BLOB_REQ, ATT_WRITE_REQ):
+                yield "error", handle, pdu[4:5]
+        elif opcode in (ATT_READ_RSP, ATT_READ_BLOB_RSP):
+            yield "read", handle, pdu[1:]
+        elif opcode == ATT_FIND_INFO_RSP and len(pdu) >= 2:
+            size = 4 if pdu[1] == 1 else 18
+            for start in range(2, len(pdu) - size + 1, size):
+                table.chars[pdu[start] | pdu[start + 1] << 8] = uuid16(pdu[start + 2 : start + size])
+        elif len(pdu) >= 2 and pdu[1]:
+            size = pdu[1]
+            for start in range(2, len(pdu) - size + 1, size):
+                entry = pdu[start : start + size]
+                first = entry[0] | entry[1] << 8
+                if opcode == ATT_READ_BY_GROUP_TYPE_RSP:
+                    if uuid == UUID_PRIMARY_SERVICE and uuid16(entry[4:]) == PURIFIER_SERVICE:
+                        table.services.append((first, entry[2] | entry[3] << 8))
+                elif uuid == UUID_CHARACTERISTIC:
+                    if size >= 7:
+                        table.chars[first] = UUID_CHARACTERISTIC
+                        table.chars[entry[3] | entry[4] << 8] = uuid16(entry[5:])
+                else:  # Read Using Characteristic UUID
+                    if uuid:
+                        table.chars.setdefault(first, uuid)
+                    yield "read", first, entry[2:]
+
+
+def describe(event: AttEvent) -> str:
+    """Return a readable rendering of an operation's value."""
+    if event.op == "error":
+        code = event.value[0]
+        return f"0x{code:02X} ({ATT_ERRORS.get(code, 'unknown error')})"
+    if event.char == UUID_CCCD and len(event.value) >= 2:
+        flags = event.value[0]
+        state = "notify" if flags & 1 else "indicate" if flags & 2 else "off"
+        return f"{event.value.hex(' ')} (CCCD {state})"
+    return describe_value(event.char, event.value)
+
+
+class Summary:
+    """Operation counts and distinct values per characteristic."""
+
+    def __init__(self) -> None:
+        self.ops: defaultdict[tuple[str, int], Counter[str]] = defaultdict(Counter)
+        self.values: defaultdict[tuple[str, int], Counter[bytes]] = defaultdict(Counter)
+        self.chars: dict[tuple[str, int], int] = {}
+        self.other: Counter[tuple[str, int]] = Counter()
+
+    def add(self, event: AttEvent) -> None:
+        key = (event.device, event.handle)
+        self.ops[key][event.op] += 1
+        self.chars[key] = event.char
+        if event.op == "error":
+            return
+        values = self.values[key]
+        if event.value in values or len(values) < _MAX_DISTINCT_VALUES:
+            values[event.value] += 1
+        else:
+            self.other[key] += 1
+
+    def print(self) -> None:
+        for key in sorted(self.ops):
+            device, handle = key
+            char = self.chars[key]
+            ops = ", ".join(f"{op} {count}" for op, count in sorted(self.ops[key].items()))
+            print(f"{device} {f'{char:04X}' if char else '----'} 0x{handle:04X}: {ops}")
+            for value, count in self.values[key].most_common():
+                event = AttEvent(0.0, device, "read", handle, char, value)
+                print(f"    {count:8d}x  {describe(event) or '(empty)'}")
+            if self.other[key]:
+                print(f"    {self.other[key]:8d}x  (other values)")
+
+
+def _handle_option(value: str) -> tuple[int, int]:
+    """Parse ``HANDLE=UUID``, e.g. ``0x002a=FFD3``."""
+    try:
+        handle, uuid = value.split("=")
+        return int(handle, 0), int(uuid, 16)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HANDLE=UUID, got {value!r}") from None
+
+
+def _json_line(event: AttEvent) -> str:
+    record: dict[str, Any] = {
+        "time": round(event.time, 6),
+        "device": event.device,
+        "op": event.op,
+        "handle": event.handle,
+        "char": f"{event.char:04X}" if event.char else None,
+        "value": event.value.hex(),
+        "detail": describe(event),
+    }
+    return json.dumps(record, separators=(",", ":"))
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("capture", help="btsnoop_hci.log")
+    parser.add_argument(
+        "--handle",
+        action="append",
+        type=_handle_option,
+        default=[],
+        metavar="HANDLE=UUID",
+        help="known attribute handle, e.g. 0x002a=FFD3 (repeatable)",
+    )
+    parser.add_argument("--address", action="append", help="only this peer (repeatable)")
+    parser.add_argument("--all", action="store_true", help="include handles outside FFD0")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--json", action="store_true", help="one JSON object per operation")
+    output.add_argument(
+        "--summary", action="store_true", help="counts and distinct values instead of a timeline"
+    )
+    args = parser.parse_args(argv)
+
+    decoder = AttDecoder(
+        dict(args.handle),
+        all_handles=args.all,
+        addresses={address.upper() for address in args.address} if args.address else None,
+    )
+    summary = Summary()
+    packets = events = 0
+    origin: float | None = None
+    started = time.perf_counter()
+    try:
+        for packet in iter_hci(args.capture):
+            packets += 1
+            for event in decoder.feed(packet):
+                events += 1
+                if args.summary:
+                    summary.add(event)
+                    continue
+                if args.json:
+                    print(_json_line(event))
+                    continue
+                if origin is None:
+                    origin = event.time
+                    print(f"# first operation {datetime.fromtimestamp(origin).isoformat()}")
+                char = f"{event.char:04X}" if event.char else "----"
+                print(
+                    f"{event.time - origin:+11.3f}s {event.device} {event.op:<9} "
+                    f"{char} 0x{event.handle:04X}  {describe(event)}"
+                )
+    except BrokenPipeError:
+        return 0
+    except (OSError, ValueError) as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+    if args.summary:
+        summary.print()
+
+    elapsed = time.perf_counter() - started
+    size = Path(args.capture).stat().st_size
+    print(
+        f"# {packets} packets, {decoder.att_pdus} ATT PDUs, {events} operations; "
+        f"{size / 1e6:.1f} MB in {elapsed:.2f} s",
+        file=sys.stderr,
+    )
+    if decoder.att_pdus and not events and not args.all and not decoder.learned:
+        print(
+            "# no FFD0 handles were discovered in this capture; "
+            "pass them with --handle or use --all",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""Run a scripted command sequence against one or more purifiers.
+
+Every device gets its own XiaomiCarAirPurifierBLEClient, the client the
+integration uses, and all devices run the script concurrently. Each
+operation is printed to stdout as one JSON line with its timing, so runs can
+be piped into ``jq`` or saved and compared. Home Assistant is not needed.
+
+Devices are looked up through tools.discovery: addresses the Bluetooth stack
+already knows are used without scanning, and a scan stops as soon as every
+requested address was seen. Without MACs, purifiers are found by their
+advertised name; ``--known`` targets every purifier seen in earlier runs.
+
+A script is a list of commands separated by ``;`` or newlines, ``#`` starts a
+comment:
+
+    status                  read power and mode
+    power on | power off    write the power characteristic
+    mode <name>             Auto, Silent, Standard or Strong
+    wait <seconds>          pause this device's script
+    repeat <n> { ... }      run the enclosed commands n times
+
+    python -m tools.cli AA:BB:CC:DD:EE:FF --script "status; power on; mode Strong"
+    python -m tools.cli MAC1 MAC2 --script "repeat 20 { mode Silent; status; wait 2 }"
+    python -m tools.cli --expect 4 --script "status"
+    python -m tools.cli --known --script-file soak.txt --output soak.json
+    python -m tools.cli --simulate 10 --script-file soak.txt
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+import json
+import logging
+from pathlib import Path
+import re
+import statistics
+import sys
+from typing import Any
+
+from bleak.exc import BleakError
+
+from custom_components.xiaomi_car_air_purifier.ble_client import (
+    XiaomiCarAirPurifierBLEClient,
+)
+from custom_components.xiaomi_car_air_purifier.const import MODE_VALUES
+from custom_components.xiaomi_car_air_purifier.gatt_log import GattRecorder
+
+from . import discovery, results as results_io
+
+DEFAULT_SCAN_TIMEOUT = 10.0  # seconds
+DEFAULT_OPERATION_TIMEOUT = 30.0  # seconds
+
+_TOKEN = re.compile(r"[{};\n]|[^{};\n]+")
+_COMMENT = re.compile(r"#[^\n]*")
+_MODES = {name.lower(): name for name in MODE_VALUES}
+
+
+class ScriptError(ValueError):
+    """The command script could not be parsed."""
+
+
+@dataclass(frozen=True)
+class Command:
+    """One device operation, or a pause."""
+
+    text: str
+    action: str  # "status", "power", "mode" or "wait"
+    argument: Any = None
+
+
+@dataclass(frozen=True)
+class Repeat:
+    """A block of steps run ``count`` times."""
+
+    count: int
+    body: list[Command | Repeat] = field(default_factory=list)
+
+
+Step = Command | Repeat
+
+
+def _parse_command(text: str) -> Command:
+    """Parse one command statement."""
+    words = text.split()
+    action = words[0].lower()
+    if action == "status" and len(words) == 1:
+        return Command(text, "status")
+    if action == "power" and len(words) == 2 and words[1].lower() in ("on", "off"):
+        return Command(text, "power", words[1].lower() == "on")
+    if action == "mode" and len(words) == 2:
+        if (mode := _MODES.get(words[1].lower())) is None:
+            raise ScriptError(f"Unknown mode {words[1]!r}, expected one of {list(MODE_VALUES)}")
+        return Command(f"mode {mode}", "mode", mode)
+    if action == "wait" and len(words) == 2:
+        try:
+            return Command(text, "wait", float(words[1]))
+        except ValueError:
+            pass
+    raise ScriptError(f"Cannot parse {text!r}")
+
+
+def parse_script(text: str) -> list[Step]:
+    """Parse a command script into steps."""
+    tokens = [token.strip() for token in _TOKEN.findall(_COMMENT.sub("", text))]
+    tokens = [token for token in tokens if token and token not in (";", "\n")]
+    position = 0
+
+    def _block(closing: bool) -> list[Step]:
+        nonlocal position
+        steps: list[Step] = []
+        while position < len(tokens):
+            token = tokens[position]
+            position += 1
+            if token == "}":
+                if not closing:
+                    raise ScriptError("Unexpected '}'")
+                return steps
+            if token == "{":
+                raise ScriptError("'{' must follow 'repeat <n>'")
+            words = token.split()
+            if words[0].lower() in ("repeat", "loop"):
+                if len(words) != 2 or not words[1].isdigit():
+                    raise ScriptError(f"Cannot parse {token!r}, expected 'repeat <n> {{ ... }}'")
+                if position == len(tokens) or tokens[position] != "{":
+                    raise ScriptError(f"'{token}' must be followed by '{{'")
+                position += 1
+                steps.append(Repeat(int(words[1]), _block(closing=True)))
+            else:
+                steps.append(_parse_command(token))
+        if closing:
+            raise ScriptError("Missing '}'")
+        return steps
+
+    steps = _block(closing=False)
+    if not steps:
+        raise ScriptError("The script is empty")
+    return steps
+
+
+def iter_commands(steps: list[Step]) -> Iterator[Command]:
+    """Yield the script's commands with repeats unrolled."""
+    for step in steps:
+        if isinstance(step, Repeat):
+            for _ in range(step.count):
+                yield from iter_commands(step.body)
+        else:
+            yield step
+
+
+async def _execute(client: XiaomiCarAirPurifierBLEClient, command: Command) -> tuple[bool, Any]:
+    """Run one command on a connected client and return (ok, result)."""
+    if command.action == "status":
+        status = await client.get_status()
+        return status is not None, status
+    if command.action == "power":
+        return await client.set_power(command.argument), None
+    return await client.set_mode(command.argument), None
+
+
+async def run_device(
+    client: XiaomiCarAirPurifierBLEClient,
+    address: str,
+    steps: list[Step],
+    emit: Callable[[dict[str, Any]], None],
+    *,
+    timeout: float,
+    origin: float,
+) -> None:
+    """Run the script on one device, emitting a record per operation."""
+    loop = asyncio.get_running_loop()
+    sequence = 0
+
+    async def _timed(text: str, operation: Callable[[], Any]) -> bool:
+        nonlocal sequence
+        start = loop.time()
+        record: dict[str, Any] = {"device": address, "seq": sequence, "command": text}
+        sequence += 1
+        try:
+            ok, result = await asyncio.wait_for(operation(), timeout)
+        except TimeoutError:
+            ok, result = False, None
+            record["error"] = f"timed out after {timeout}s"
+        duration = loop.time() - start
+        record.update(
+            ok=ok,
+            start=round(start - origin, 6),
+            ms=round(duration * 1e3, 3),
+        )
+        if result is not None:
+            record["result"] = result
+        emit(record)
+        return ok
+
+    async def _connect() -> tuple[bool, None]:
+        return await client.connect(), None
+
+    try:
+        for command in iter_commands(steps):
+            if command.action == "wait":
+                await asyncio.sleep(command.argument)
+                continue
+            if not client.is_connected and not await _timed("connect", _connect):
+                continue
+            await _timed(command.text, lambda command=command: _execute(client, command))
+    finally:
+        await client.disconnect()
+
+
+def summarize(records: list[dict[str, Any]]) -> dict[str, Any]:
+    """Return per-command latency statistics over all devices."""
+    by_command: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        by_command[record["command"].split()[0]].append(record)
+    summary = {}
+    for command, entries in sorted(by_command.items()):
+        times = sorted(entry["ms"] for entry in entries if entry["ok"])
+        summary[command] = {
+            "count": len(entries),
+            "failed": sum(not entry["ok"] for entry in entries),
+            "ms": {
+                "mean": statistics.fmean(times) if times else 0.0,
+                "p50": times[len(times) // 2] if times else 0.0,
+                "p95": times[min(len(times) - 1, int(len(times) * 0.95))] if times else 0.0,
+                "max": times[-1] if times else 0.0,
+            },
+        }
+    return summary
+
+
+async def _async_main(args: argparse.Namespace, steps: list[Step]) -> list[dict[str, Any]]:
+    """Resolve the devices and run the script on all of them at once."""
+    loop = asyncio.get_running_loop()
+    records: list[dict[str, Any]] = []
+
+    def _emit(record: dict[str, Any]) -> None:
+        records.append(record)
+        print(json.dumps(record, separators=(",", ":")), flush=True)
+
+    clients: dict[str, XiaomiCarAirPurifierBLEClient] = {}
+    recorders: list[GattRecorder] = []
+    if args.simulate:
+        from .simulator import SimulatedPurifier, simulated_address
+
+        addresses = args.addresses or [simulated_address(i) for i in range(args.simulate)]
+        for index, address in enumerate(addresses):
+            purifier = SimulatedPurifier(address, name=f"MI-CAR-{index:04d}", seed=index)
+            clients[address] = XiaomiCarAirPurifierBLEClient(
+                purifier.ble_device, connector=purifier.connect
+            )
+    else:
+        if args.addresses:
+            found = await discovery.resolve(
+                args.addresses, timeout=args.scan_timeout, use_cache=not args.no_cache
+            )
+        else:
+            found = await discovery.scan(timeout=args.scan_timeout, expect=args.expect)
+        for address in args.addresses or sorted(found):
+            record: dict[str, Any] = {"device": address, "command": "resolve"}
+            if (resolved := found.get(address)) is None:
+                record.update(ok=False, error=f"not found within {args.scan_timeout}s")
+            else:
+                record.update(
+                    ok=True,
+                    start=0.0,
+                    ms=round(resolved.seconds * 1e3, 3),
+                    source=resolved.source,
+                    name=resolved.device.name,
+                )
+                clients[address] = XiaomiCarAirPurifierBLEClient(resolved.device)
+            _emit(record)
+        if not args.no_cache:
+            args.known_devices.update(found)
+
+    if args.record:
+        Path(args.record).mkdir(parents=True, exist_ok=True)
+        for address, client in clients.items():
+            client.recorder = GattRecorder(
+                Path(args.record, f"{address.replace(':', '').lower()}.gattlog")
+            )
+            recorders.append(client.recorder)
+
+    origin = loop.time()
+    await asyncio.gather(
+        *(
+            run_device(client, address, steps, _emit, timeout=args.timeout, origin=origin)
+            for address, client in clients.items()
+        )
+    )
+    for recorder in recorders:
+        recorder.flush()
+    return records
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        epilog="Each operation is printed to stdout as a JSON line.",
+    )
+    parser.add_argument("addresses", nargs="*", metavar="MAC", help="purifier addresses")
+    script = parser.add_mutually_exclusive_group(required=True)
+    script.add_argument("--script", help="commands, separated by ';'")
+    script.add_argument("--script-file", type=argparse.FileType(), help="read commands from a file")
+    parser.add_argument(
+        "--scan-timeout", type=float, default=DEFAULT_SCAN_TIMEOUT, help="seconds to look for devices"
+    )
+    parser.add_argument(
+        "--expect",
+        type=int,
+        metavar="N",
+        help="without MACs, stop scanning once N purifiers were found",
+    )
+    parser.add_argument(
+        "--known", action="store_true", help="target every purifier found in earlier runs"
+    )
+    parser.add_argument(
+        "--cache",
+        default=discovery.DEFAULT_CACHE,
+        help="known devices file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always scan, and do not update the known devices file",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_OPERATION_TIMEOUT,
+        help="seconds before an operation counts as failed",
+    )
+    parser.add_argument(
+        "--simulate",
+        type=int,
+        metavar="N",
+        help="run against N simulated purifiers instead of real devices",
+    )
+    parser.add_argument("--record", metavar="DIR", help="record GATT traffic per device here")
+    parser.add_argument("--output", help="write a latency summary JSON here")
+    parser.add_argument("--verbose", action="store_true", help="show client logs on stderr")
+    args = parser.parse_args(argv)
+
+    try:
+        steps = parse_script(args.script_file.read() if args.script_file else args.script)
+    except ScriptError as err:
+        parser.error(str(err))
+    args.addresses = [address.upper() for address in args.addresses]
+    args.known_devices = discovery.KnownDevices(args.cache)
+    if args.known and not args.addresses:
+        args.addresses = args.known_devices.addresses
+        if not args.addresses:
+            parser.error(f"no known devices in {args.cache}, run a scan first")
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.CRITICAL,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    try:
+        records = asyncio.run(_async_main(args, steps))
+    except KeyboardInterrupt:
+        return 130
+    except (BleakError, OSError) as err:
+        print(f"Bluetooth error: {err}", file=sys.stderr)
+        return 1
+
+    if args.output:
+        document = results_io.build_document(
+            "cli",
+            summarize(records),
+            devices=sorted({record["device"] for record in records}),
+            script=args.script_file.name if args.script_file else args.script,
+            simulated=bool(args.simulate),
+        )
+        results_io.write_document(document, args.output)
+    return 0 if records and all(record["ok"] for record in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,708 @@
+"""Keep purifiers connected and serve their state over a local HTTP API.
+
+A headless daemon for controllers that do not run Home Assistant. Each
+purifier gets the XiaomiCarAirPurifierBLEClient the integration uses and
+stays connected: polls run from the integration's PollScheduler, and reads
+and writes go through the coordinator's retry loop and connection pacing,
+so a command is a write and a read-back on a warm connection rather than a
+reconnect. Reads are answered from the state cached by the last poll or
+command without touching Bluetooth.
+
+    GET  /devices                  cached state of every purifier (?address= to filter)
+    GET  /devices/<mac>            cached state of one purifier
+    POST /devices/<mac>/power      {"power": true}
+    POST /devices/<mac>/mode       {"mode": "Strong"}
+    POST /devices/<mac>/refresh    read the status now
+    POST /batch                    {"devices": [...], "power": ..., "mode": ..., "max_parallel": 3}
+    GET  /metrics                  request and Bluetooth latencies
+
+Bodies and responses are JSON. Devices are looked up as by tools.cli.
+
+    python -m tools.daemon AA:BB:CC:DD:EE:FF 11:22:33:44:55:66
+    python -m tools.daemon --known --port 8765 --interval 10
+    python -m tools.daemon --simulate 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable
+import contextlib
+from dataclasses import dataclass, field
+from http import HTTPStatus
+import json
+import logging
+import signal
+import statistics
+import sys
+import time
+from typing import Any
+from urllib.parse import SplitResult, parse_qs, unquote, urlsplit
+
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+
+from custom_components.xiaomi_car_air_purifier.ble_client import (
+    XiaomiCarAirPurifierBLEClient,
+)
+from custom_components.xiaomi_car_air_purifier.connection_gate import ConnectionGate
+from custom_components.xiaomi_car_air_purifier.const import (
+    CONSECUTIVE_FAILURES_THRESHOLD,
+    DEFAULT_ADAPTER_PARALLELISM,
+    DEFAULT_CONNECT_WINDOW,
+    DEFAULT_SCAN_INTERVAL,
+    MAX_ADAPTER_PARALLELISM,
+    MODE_CHAR_UUID,
+    MODE_VALUES,
+    POWER_CHAR_UUID,
+    POWER_OFF,
+    POWER_ON,
+)
+from custom_components.xiaomi_car_air_purifier.poll_scheduler import PollScheduler
+from custom_components.xiaomi_car_air_purifier.retry import run_with_retries
+from custom_components.xiaomi_car_air_purifier.worker import bleak_transport
+
+from . import discovery
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SCAN_TIMEOUT = 10.0  # seconds
+DEFAULT_OPERATION_TIMEOUT = 30.0  # seconds before a command is answered 504
+
+LATENCY_SAMPLES = 1024  # most recent samples kept per metric
+MAX_BODY = 64 * 1024  # bytes
+MAX_HEADERS = 64
+IDLE_TIMEOUT = 60.0  # seconds before an idle HTTP connection is closed
+
+_MODES = {name.lower(): name for name in MODE_VALUES}
+
+
+class HttpError(Exception):
+    """A request answered with an error status."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        """Initialize the error."""
+        super().__init__(message)
+        self.status = status
+
+
+class Latency:
+    """Count, failures and recent durations of one kind of operation."""
+
+    __slots__ = ("count", "failed", "samples")
+
+    def __init__(self) -> None:
+        """Initialize with no samples."""
+        self.count = 0
+        self.failed = 0
+        self.samples: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        """Record one operation."""
+        self.count += 1
+        if ok:
+            self.samples.append(seconds * 1e3)
+        else:
+            self.failed += 1
+
+    def summary(self) -> dict[str, Any]:
+        """Return the count and percentiles of the recent successful samples."""
+        times = sorted(self.samples)
+        return {
+            "count": self.count,
+            "failed": self.failed,
+            "ms": {
+                "mean": statistics.fmean(times) if times else 0.0,
+                "p50": times[len(times) // 2] if times else 0.0,
+                "p95": times[min(len(times) - 1, int(len(times) * 0.95))] if times else 0.0,
+                "p99": times[min(len(times) - 1, int(len(times) * 0.99))] if times else 0.0,
+                "max": times[-1] if times else 0.0,
+            },
+        }
+
+
+class Metrics:
+    """Latencies by operation name."""
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self.started = time.monotonic()
+        self.latencies: dict[str, Latency] = {}
+
+    def add(self, name: str, seconds: float, ok: bool = True) -> None:
+        """Record one operation named ``name``."""
+        if (latency := self.latencies.get(name)) is None:
+            latency = self.latencies[name] = Latency()
+        latency.add(seconds, ok)
+
+    def summary(self, prefix: str) -> dict[str, Any]:
+        """Return the summaries of the operations starting with ``prefix``."""
+        return {
+            name[len(prefix) :]: latency.summary()
+            for name, latency in sorted(self.latencies.items())
+            if name.startswith(prefix)
+        }
+
+
+@dataclass
+class Purifier:
+    """A purifier in the pool and its cached state."""
+
+    address: str
+    name: str | None
+    client: XiaomiCarAirPurifierBLEClient
+    rssi: int | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    status: dict[str, Any] | None = None
+    updated: float | None = None  # loop time of the last successful read or write
+    failures: int = 0
+
+    def state(self, now: float) -> dict[str, Any]:
+        """Return the cached state; nothing is read from the purifier."""
+        status = self.status or {}
+        return {
+            "address": self.address,
+            "name": self.name,
+            "power": status.get("power"),
+            "mode": status.get("mode"),
+            "available": self.status is not None
+            and self.failures < CONSECUTIVE_FAILURES_THRESHOLD,
+            "connected": self.client.is_connected,
+            "age": None if self.updated is None else round(now - self.updated, 3),
+        }
+
+
+class PurifierPool:
+    """Warm connections to a fixed set of purifiers, with their state cached.
+
+    Every purifier is polled every ``interval`` seconds, which also
+    reconnects one whose link dropped, so commands find it connected.
+    Connection attempts are paced through a ConnectionGate as in the
+    integration, and operations on one purifier never overlap.
+    """
+
+    def __init__(
+        self,
+        purifiers: Iterable[Purifier],
+        metrics: Metrics,
+        *,
+        interval: float = DEFAULT_SCAN_INTERVAL,
+        window: float = DEFAULT_CONNECT_WINDOW,
+    ) -> None:
+        """Initialize the pool; nothing connects before ``start``."""
+        self.purifiers = {purifier.address: purifier for purifier in purifiers}
+        self.metrics = metrics
+        self.interval = interval
+        self.window = window
+        self.connects = 0
+        self._scheduler = PollScheduler()
+        self._gate = ConnectionGate()
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Connect to every purifier and start polling."""
+        for purifier in self.purifiers.values():
+            self._gate.add_device()
+            self._spawn(self._poll(purifier))
+
+    async def close(self) -> None:
+        """Stop polling and disconnect every purifier."""
+        for address in self.purifiers:
+            self._scheduler.remove(address)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(
+            *(purifier.client.disconnect() for purifier in self.purifiers.values()),
+            return_exceptions=True,
+        )
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        """Run ``coro`` in the background, keeping a reference until it ends."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _poll(self, purifier: Purifier) -> None:
+        """Poll on schedule, then queue the next poll."""
+        await self.refresh(purifier, "poll")
+        self._scheduler.schedule(
+            purifier.address, self.interval, lambda: self._spawn(self._poll(purifier))
+        )
+
+    async def _wait_to_connect(self, purifier: Purifier) -> None:
+        """Wait for the purifier's turn to connect."""
+        self.connects += 1
+        await self._gate.async_acquire(purifier.rssi, self.window)
+
+    async def _run(
+        self,
+        purifier: Purifier,
+        name: str,
+        operation: Callable[[], Awaitable[dict[str, Any] | None]],
+    ) -> dict[str, Any] | None:
+        """Run a read or write with retries and cache the status it returns."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with purifier.lock:
+            status = await run_with_retries(
+                purifier.client,
+                name,
+                operation,
+                before_connect=lambda: self._wait_to_connect(purifier),
+            )
+        now = loop.time()
+        self.metrics.add(f"ble {name}", now - start, status is not None)
+        if status is None:
+            purifier.failures += 1
+            if purifier.failures == CONSECUTIVE_FAILURES_THRESHOLD:
+                purifier.client.log.warning("Unavailable after %d failures", purifier.failures)
+            return None
+        purifier.failures = 0
+        purifier.status = status
+        purifier.updated = now
+        purifier.client.log.flush()
+        return status
+
+    async def refresh(self, purifier: Purifier, name: str = "refresh") -> dict[str, Any] | None:
+        """Read the purifier's status now."""
+        return await self._run(purifier, name, purifier.client.get_status)
+
+    async def write(
+        self, purifier: Purifier, name: str, char_uuid: str, data: bytes
+    ) -> dict[str, Any] | None:
+        """Write and verify a characteristic, as the coordinator does."""
+        return await self._run(
+            purifier,
+            name,
+            lambda: purifier.client.write_and_verify(char_uuid, data, purifier.status),
+        )
+
+    async def set_state(
+        self, purifier: Purifier, power: bool | None, mode: str | None
+    ) -> bool:
+        """Write the power, then the mode; return True if all writes applied."""
+        if power is not None and await self.write(
+            purifier, "power", POWER_CHAR_UUID, POWER_ON if power else POWER_OFF
+        ) is None:
+            return False
+        if mode is not None and await self.write(
+            purifier, "mode", MODE_CHAR_UUID, MODE_VALUES[mode]
+        ) is None:
+            return False
+        return True
+
+
+def _route(path: str) -> str | None:
+    """Return the route ``path`` matches, with the address as a placeholder."""
+    parts = path.strip("/").split("/")
+    if parts in (["devices"], ["batch"], ["metrics"]):
+        return f"/{parts[0]}"
+    if parts[0] == "devices" and len(parts) == 2:
+        return "/devices/{address}"
+    if parts[0] == "devices" and len(parts) == 3 and parts[2] in ("power", "mode", "refresh"):
+        return f"/devices/{{address}}/{parts[2]}"
+    return None
+
+
+def _json_body(body: bytes) -> dict[str, Any]:
+    """Decode a request body that must be a JSON object."""
+    try:
+        value = json.loads(body or b"{}")
+    except ValueError as err:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Body is not valid JSON: {err}") from err
+    if not isinstance(value, dict):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+    return value
+
+
+def _power(value: Any) -> bool:
+    """Validate a power value."""
+    if not isinstance(value, bool):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "power must be true or false")
+    return value
+
+
+def _mode(value: Any) -> str:
+    """Validate a mode name, in any case."""
+    if not isinstance(value, str) or (mode := _MODES.get(value.lower())) is None:
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST, f"mode must be one of {list(MODE_VALUES)}"
+        )
+    return mode
+
+
+class ApiServer:
+    """The HTTP API, on plain asyncio streams; connections are kept alive."""
+
+    def __init__(
+        self,
+        pool: PurifierPool,
+        metrics: Metrics,
+        *,
+        timeout: float = DEFAULT_OPERATION_TIMEOUT,
+    ) -> None:
+        """Initialize the API for ``pool``."""
+        self.pool = pool
+        self.metrics = metrics
+        self.timeout = timeout
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        """Listen on ``host:port``."""
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    def _purifier(self, address: str) -> Purifier:
+        """Return the purifier at ``address``."""
+        if (purifier := self.pool.purifiers.get(address.upper())) is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown purifier {address}")
+        return purifier
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer requests on one connection until it closes."""
+        loop = asyncio.get_running_loop()
+        keep_alive = True
+        try:
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), IDLE_TIMEOUT)
+                except HttpError as err:
+                    writer.write(_response(err.status, {"error": str(err)}, False))
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                start = loop.time()
+                url = urlsplit(target)
+                route = _route(url.path)
+                try:
+                    status, payload = await self._dispatch(method, route, url, body)
+                except HttpError as err:
+                    status, payload = err.status, {"error": str(err)}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                self.metrics.add(
+                    f"http {method} {route or 'unknown'}", loop.time() - start, status < 400
+                )
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _dispatch(
+        self, method: str, route: str | None, url: SplitResult, body: bytes
+    ) -> tuple[HTTPStatus, dict[str, Any]]:
+        """Answer a request; return the status and response body."""
+        if route is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No such route {url.path}")
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        now = asyncio.get_running_loop().time()
+
+        if (method, route) == ("GET", "/devices"):
+            wanted = parse_qs(url.query).get("address", [])
+            purifiers = [self._purifier(address) for address in wanted]
+            return HTTPStatus.OK, {
+                "devices": {
+                    purifier.address: purifier.state(now)
+                    for purifier in purifiers or self.pool.purifiers.values()
+                }
+            }
+        if (method, route) == ("GET", "/devices/{address}"):
+            return HTTPStatus.OK, self._purifier(parts[1]).state(now)
+        if method == "POST" and route.startswith("/devices/{address}/"):
+            purifier = self._purifier(parts[1])
+            data = _json_body(body)
+            if parts[2] == "power":
+                operation = self.pool.set_state(purifier, _power(data.get("power")), None)
+            elif parts[2] == "mode":
+                operation = self.pool.set_state(purifier, None, _mode(data.get("mode")))
+            else:
+                operation = self.pool.refresh(purifier)
+            return await self._command(purifier, operation)
+        if (method, route) == ("POST", "/batch"):
+            return HTTPStatus.OK, await self._batch(_json_body(body))
+        if (method, route) == ("GET", "/metrics"):
+            return HTTPStatus.OK, self._metrics(now)
+        raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {route}")
+
+    async def _command(
+        self, purifier: Purifier, operation: Awaitable[Any]
+    ) -> tuple[HTTPStatus, dict[str, Any]]:
+        """Run a command on one purifier; answer with its state."""
+        try:
+            ok = await asyncio.wait_for(operation, self.timeout)
+        except asyncio.TimeoutError:
+            status = HTTPStatus.GATEWAY_TIMEOUT
+        else:
+            status = HTTPStatus.OK if ok else HTTPStatus.BAD_GATEWAY
+        return status, purifier.state(asyncio.get_running_loop().time())
+
+    async def _batch(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Push a power and/or mode to many purifiers, ``max_parallel`` at a time."""
+        power = _power(data["power"]) if data.get("power") is not None else None
+        mode = _mode(data["mode"]) if data.get("mode") is not None else None
+        if power is None and mode is None:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Give power, mode or both")
+        max_parallel = data.get("max_parallel", DEFAULT_ADAPTER_PARALLELISM)
+        if (
+            not isinstance(max_parallel, int)
+            or not 1 <= max_parallel <= MAX_ADAPTER_PARALLELISM
+        ):
+            raise HttpError(
+                HTTPStatus.BAD_REQUEST,
+                f"max_parallel must be between 1 and {MAX_ADAPTER_PARALLELISM}",
+            )
+        addresses = data.get("devices")
+        if addresses is not None and not (
+            isinstance(addresses, list) and all(isinstance(a, str) for a in addresses)
+        ):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "devices must be a list of addresses")
+        purifiers = (
+            [self._purifier(address) for address in addresses]
+            if addresses is not None
+            else list(self.pool.purifiers.values())
+        )
+
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(max_parallel)
+        start = loop.time()
+
+        async def _set_one(purifier: Purifier) -> dict[str, Any]:
+            queued = loop.time()
+            async with slots:
+                started = loop.time()
+                try:
+                    success = await asyncio.wait_for(
+                        self.pool.set_state(purifier, power, mode), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    success = False
+                return {
+                    "success": success,
+                    "queued_seconds": round(started - queued, 3),
+                    "seconds": round(loop.time() - started, 3),
+                    "state": purifier.state(loop.time()),
+                }
+
+        results = await asyncio.gather(*(_set_one(purifier) for purifier in purifiers))
+        succeeded = sum(result["success"] for result in results)
+        return {
+            "seconds": round(loop.time() - start, 3),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "devices": {
+                purifier.address: result for purifier, result in zip(purifiers, results)
+            },
+        }
+
+    def _metrics(self, now: float) -> dict[str, Any]:
+        """Return the pool's health and the latency summaries."""
+        purifiers = self.pool.purifiers.values()
+        ages = [now - purifier.updated for purifier in purifiers if purifier.updated is not None]
+        return {
+            "uptime_seconds": round(time.monotonic() - self.metrics.started, 3),
+            "devices": len(purifiers),
+            "connected": sum(purifier.client.is_connected for purifier in purifiers),
+            "available": sum(purifier.state(now)["available"] for purifier in purifiers),
+            "connection_attempts": self.pool.connects,
+            "max_state_age_seconds": round(max(ages), 3) if ages else None,
+            "http": self.metrics.summary("http "),
+            "ble": self.metrics.summary("ble "),
+        }
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> tuple[str, str, dict[str, str], bytes] | None:
+    """Read one request; return None if the client closed the connection."""
+    try:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _version = line.decode("latin-1").split()
+        except ValueError as err:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line") from err
+        headers: dict[str, str] = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(
+                    HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers"
+                )
+            name, sep, value = line.decode("latin-1").partition(":")
+            if not sep:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed header")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError as err:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length") from err
+        if not 0 <= length <= MAX_BODY:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large")
+        body = await reader.readexactly(length) if length else b""
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError as err:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Line too long") from err
+    return method.upper(), target, headers, body
+
+
+def _response(status: HTTPStatus, payload: dict[str, Any], keep_alive: bool) -> bytes:
+    """Return a JSON response."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+    )
+    if not keep_alive:
+        head += "Connection: close\r\n"
+    return (head + "\r\n").encode() + body
+
+
+async def _create_purifiers(args: argparse.Namespace) -> list[Purifier]:
+    """Build a client for every configured purifier."""
+    if args.simulate:
+        from .simulator import SimulatedPurifier, simulated_address
+
+        addresses = args.addresses or [simulated_address(i) for i in range(args.simulate)]
+        purifiers = []
+        for index, address in enumerate(addresses):
+            simulated = SimulatedPurifier(address, name=f"MI-CAR-{index:04d}", seed=index)
+            purifiers.append(
+                Purifier(
+                    simulated.address,
+                    simulated.name,
+                    XiaomiCarAirPurifierBLEClient(
+                        simulated.ble_device, connector=simulated.connect
+                    ),
+                    simulated.rssi,
+                )
+            )
+        return purifiers
+
+    found = await discovery.resolve(
+        args.addresses, timeout=args.scan_timeout, use_cache=not args.no_cache
+    )
+    if not args.no_cache:
+        args.known_devices.update(found)
+    purifiers = []
+    for address in args.addresses:
+        if (resolved := found.get(address)) is not None:
+            device = resolved.device
+            client = XiaomiCarAirPurifierBLEClient(device)
+        else:
+            # Looked up again whenever it connects, so it can come into range later
+            _LOGGER.warning("%s not found within %ss, still trying", address, args.scan_timeout)
+            device = BLEDevice(address, None, None, rssi=0)
+            client = XiaomiCarAirPurifierBLEClient(device, bleak_transport(address))
+        purifiers.append(Purifier(address, device.name, client))
+    return purifiers
+
+
+async def _async_main(args: argparse.Namespace) -> None:
+    """Connect the pool and serve the API until interrupted."""
+    loop = asyncio.get_running_loop()
+    metrics = Metrics()
+    pool = PurifierPool(
+        await _create_purifiers(args), metrics, interval=args.interval, window=args.window
+    )
+    server = await ApiServer(pool, metrics, timeout=args.timeout).start(args.host, args.port)
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    pool.start()
+    for sock in server.sockets:
+        host, port = sock.getsockname()[:2]
+        print(
+            f"Serving {len(pool.purifiers)} purifiers on http://{host}:{port}",
+            file=sys.stderr,
+            flush=True,
+        )
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await pool.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("addresses", nargs="*", metavar="MAC", help="purifier addresses")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_SCAN_INTERVAL,
+        help="seconds between polls of each purifier",
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=DEFAULT_CONNECT_WINDOW,
+        help="seconds to spread reconnects over after a restart",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_OPERATION_TIMEOUT,
+        help="seconds before a command is answered 504",
+    )
+    parser.add_argument(
+        "--scan-timeout", type=float, default=DEFAULT_SCAN_TIMEOUT, help="seconds to look for devices"
+    )
+    parser.add_argument(
+        "--known", action="store_true", help="serve every purifier found in earlier runs"
+    )
+    parser.add_argument(
+        "--cache",
+        default=discovery.DEFAULT_CACHE,
+        help="known devices file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always scan, and do not update the known devices file",
+    )
+    parser.add_argument(
+        "--simulate",
+        type=int,
+        metavar="N",
+        help="serve N simulated purifiers instead of real devices",
+    )
+    parser.add_argument("--verbose", action="store_true", help="show client logs on stderr")
+    args = parser.parse_args(argv)
+
+    args.addresses = [address.upper() for address in args.addresses]
+    args.known_devices = discovery.KnownDevices(args.cache)
+    if args.known and not args.addresses:
+        args.addresses = args.known_devices.addresses
+    if not args.addresses and not args.simulate:
+        parser.error("give purifier addresses, --known or --simulate")
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    try:
+        asyncio.run(_async_main(args))
+    except KeyboardInterrupt:
+        return 130
+    except (BleakError, OSError) as err:
+        print(f"Error: {err}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
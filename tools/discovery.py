@@ -0,0 +1,145 @@
+"""Fast purifier discovery for the command-line tools.
+
+``resolve()`` turns addresses into BLEDevices as cheaply as it can:
+addresses the Bluetooth stack already knows (BlueZ's device cache on Linux)
+are used directly without scanning, and the rest are found by a scan whose
+detection callback stops it as soon as every requested address has been
+seen. ``scan()`` without addresses looks for devices advertising a name
+matched by manifest.json.
+
+Addresses found are remembered in a small JSON file so later runs can
+target them (``--known``) without naming them again.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Collection, Mapping
+import contextlib
+import fnmatch
+import json
+from pathlib import Path
+import re
+from typing import NamedTuple
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak_retry_connector import get_device
+
+MANIFEST = (
+    Path(__file__).resolve().parents[1]
+    / "custom_components"
+    / "xiaomi_car_air_purifier"
+    / "manifest.json"
+)
+DEFAULT_CACHE = Path.home() / ".cache" / "xiaomi_car_air_purifier" / "known_devices.json"
+
+SOURCE_CACHE = "cache"  # known to the Bluetooth stack, no scan needed
+SOURCE_SCAN = "scan"
+
+
+def _name_pattern() -> re.Pattern[str]:
+    """Compile the manifest's ``local_name`` matchers into one pattern."""
+    matchers = json.loads(MANIFEST.read_text())["bluetooth"]
+    return re.compile(
+        "|".join(fnmatch.translate(m["local_name"]) for m in matchers if "local_name" in m)
+    )
+
+
+NAME_PATTERN = _name_pattern()
+
+
+class Resolved(NamedTuple):
+    """A device found by ``resolve`` or ``scan``."""
+
+    device: BLEDevice
+    source: str
+    seconds: float  # from the start of the lookup until the device was found
+
+
+def matches_name(name: str | None) -> bool:
+    """Return True if ``name`` is a purifier name from manifest.json."""
+    return name is not None and NAME_PATTERN.match(name) is not None
+
+
+async def scan(
+    addresses: Collection[str] = (),
+    *,
+    timeout: float,
+    expect: int | None = None,
+) -> dict[str, Resolved]:
+    """Scan until the wanted devices have been seen, or ``timeout`` expires.
+
+    With ``addresses`` the scan stops once all of them were seen. Without,
+    it collects purifiers by advertised name and stops after ``expect`` of
+    them, or runs for the whole timeout if ``expect`` is not given.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    wanted = {address.upper() for address in addresses}
+    found: dict[str, Resolved] = {}
+    done = asyncio.Event()
+
+    def _on_advertisement(device: BLEDevice, advertisement: AdvertisementData) -> None:
+        address = device.address.upper()
+        if address in found:
+            return
+        if wanted:
+            if address not in wanted:
+                return
+        elif not matches_name(advertisement.local_name or device.name):
+            return
+        found[address] = Resolved(device, SOURCE_SCAN, loop.time() - start)
+        if len(found) == len(wanted) or (expect is not None and len(found) >= expect):
+            done.set()
+
+    async with BleakScanner(detection_callback=_on_advertisement):
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(done.wait(), timeout)
+    return found
+
+
+async def resolve(
+    addresses: Collection[str], *, timeout: float, use_cache: bool = True
+) -> dict[str, Resolved]:
+    """Return a BLEDevice for each address that could be found."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    found: dict[str, Resolved] = {}
+    if use_cache:
+        devices = await asyncio.gather(*(get_device(address) for address in addresses))
+        elapsed = loop.time() - start
+        for address, device in zip(addresses, devices):
+            if device is not None:
+                found[address] = Resolved(device, SOURCE_CACHE, elapsed)
+    if missing := [address for address in addresses if address not in found]:
+        offset = loop.time() - start
+        for address, resolved in (await scan(missing, timeout=timeout)).items():
+            found[address] = resolved._replace(seconds=offset + resolved.seconds)
+    return found
+
+
+class KnownDevices:
+    """Purifier addresses and names seen in earlier runs."""
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE) -> None:
+        """Load the known devices from ``path``, if it exists."""
+        self.path = Path(path)
+        try:
+            self.names: dict[str, str] = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.names = {}
+
+    @property
+    def addresses(self) -> list[str]:
+        """Return the known addresses."""
+        return sorted(self.names)
+
+    def update(self, found: Mapping[str, Resolved]) -> None:
+        """Remember the devices in ``found`` and save the file."""
+        names = {address: resolved.device.name or "" for address, resolved in found.items()}
+        if names.items() <= self.names.items():
+            return
+        self.names.update(names)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.names, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,382 @@
+"""Fault-injection harness for the coordinator's retry and caching logic.
+
+Drives the real XiaomiCarAirPurifierCoordinator against a SimulatedPurifier on
+a virtual clock, injects link faults from scripted windows or seeded random
+rates, and reports how long failures take to detect and recover from, how
+many commands are lost and how stale the state shown to the user gets.
+
+Runs are deterministic for a given seed, so results can be compared across
+commits:
+
+    python -m tools.fault_injection --output baseline.json
+    python -m tools.fault_injection --compare baseline.json
+    python -m tools.fault_injection --scenario outage_10min --verbose
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from pathlib import Path
+import random
+import statistics
+import sys
+from typing import Any
+
+from custom_components.xiaomi_car_air_purifier.const import DEFAULT_SCAN_INTERVAL
+from custom_components.xiaomi_car_air_purifier.gatt_log import GattRecorder
+
+from . import results as results_io
+from .simulator import (
+    FAULT_BLEAK_ERROR,
+    FAULT_CONNECT_FAIL,
+    FAULT_DISCONNECT,
+    FAULT_HANG,
+    FAULT_OUT_OF_RANGE,
+    OP_CONNECT,
+    OP_READ,
+    OP_WRITE,
+    Fault,
+    SimulatedPurifier,
+    async_create_hass,
+    create_coordinator,
+    run,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+ALL_OPERATIONS = frozenset({OP_CONNECT, OP_READ, OP_WRITE})
+
+# Operations each fault kind can apply to
+FAULT_OPERATIONS = {
+    FAULT_CONNECT_FAIL: frozenset({OP_CONNECT}),
+    FAULT_DISCONNECT: frozenset({OP_READ, OP_WRITE}),
+    FAULT_HANG: ALL_OPERATIONS,
+    FAULT_BLEAK_ERROR: frozenset({OP_READ, OP_WRITE}),
+    FAULT_OUT_OF_RANGE: ALL_OPERATIONS,
+}
+
+# Scripted windows of these kinds are tracked as incidents to detect and recover from
+INCIDENT_KINDS = frozenset({FAULT_CONNECT_FAIL, FAULT_HANG, FAULT_OUT_OF_RANGE})
+
+# A command is issued every COMMAND_INTERVAL seconds, cycling through these
+COMMAND_SCRIPT: tuple[tuple[str, Any], ...] = (
+    ("mode", "Strong"),
+    ("power", False),
+    ("power", True),
+    ("mode", "Silent"),
+    ("mode", "Auto"),
+)
+COMMAND_INTERVAL = 97.0  # seconds; deliberately out of phase with polling
+COMMAND_TIMEOUT = 600.0  # commands still pending after this count as hung
+# Changes in seconds this small are not regressions; counts have no floor
+MIN_DELTA = {"seconds": 1.0, "mean": 1.0, "max": 1.0}
+
+
+@dataclass(frozen=True)
+class FaultWindow:
+    """A fault applied to matching operations between two scenario times."""
+
+    start: float
+    end: float
+    kind: str
+    probability: float = 1.0
+    hang: float = 30.0
+
+    def covers(self, operation: str, elapsed: float) -> bool:
+        """Return whether the window applies to ``operation`` at ``elapsed``."""
+        return self.start <= elapsed < self.end and operation in FAULT_OPERATIONS[self.kind]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A named fault plan."""
+
+    description: str
+    windows: tuple[FaultWindow, ...] = ()
+    rates: dict[str, float] = field(default_factory=dict)
+    hang: float = 30.0
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "no_faults": Scenario("Healthy link; sanity baseline"),
+    "outage_60s": Scenario(
+        "Device out of range for one minute",
+        windows=(FaultWindow(600, 660, FAULT_OUT_OF_RANGE),),
+    ),
+    "outage_10min": Scenario(
+        "Device out of range for ten minutes, past the unavailable threshold",
+        windows=(FaultWindow(600, 1200, FAULT_OUT_OF_RANGE),),
+    ),
+    "connect_refused": Scenario(
+        "Link drops, then every connect attempt fails for five minutes",
+        windows=(
+            FaultWindow(600, 630, FAULT_DISCONNECT),
+            FaultWindow(600, 900, FAULT_CONNECT_FAIL),
+        ),
+    ),
+    "hung_operations": Scenario(
+        "Operations stall for 30 s before failing, for five minutes",
+        windows=(FaultWindow(600, 900, FAULT_HANG, hang=30.0),),
+    ),
+    "midread_disconnects": Scenario(
+        "10% of reads and writes lose the link mid-operation",
+        rates={FAULT_DISCONNECT: 0.10},
+    ),
+    "flaky_connects": Scenario(
+        "5% of reads and writes lose the link and 30% of reconnects fail",
+        rates={FAULT_DISCONNECT: 0.05, FAULT_CONNECT_FAIL: 0.30},
+    ),
+    "bleak_errors": Scenario(
+        "5% of reads and writes raise BleakError",
+        rates={FAULT_BLEAK_ERROR: 0.05},
+    ),
+}
+
+
+class FaultPlan:
+    """Fault policy combining scripted windows with seeded random faults."""
+
+    def __init__(self, scenario: Scenario, start: float, seed: int) -> None:
+        """Initialize the plan; scenario times are relative to ``start``."""
+        self._scenario = scenario
+        self._start = start
+        self._rng = random.Random(seed)
+
+    def __call__(self, operation: str, now: float) -> Fault | None:
+        """Return the fault for ``operation`` at loop time ``now``."""
+        elapsed = now - self._start
+        for window in self._scenario.windows:
+            if window.covers(operation, elapsed) and (
+                window.probability >= 1.0 or self._rng.random() < window.probability
+            ):
+                return Fault(window.kind, window.hang)
+        for kind, rate in self._scenario.rates.items():
+            if operation in FAULT_OPERATIONS[kind] and self._rng.random() < rate:
+                return Fault(kind, self._scenario.hang)
+        return None
+
+
+@dataclass
+class _Incident:
+    """Tracking for one scripted fault window."""
+
+    window: FaultWindow
+    detected_at: float | None = None
+    recovered_at: float | None = None
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    """Return max/mean of ``values`` (zeros when empty)."""
+    if not values:
+        return {"max": 0.0, "mean": 0.0}
+    return {"max": max(values), "mean": statistics.fmean(values)}
+
+
+async def run_scenario(
+    scenario: Scenario,
+    *,
+    seed: int,
+    duration: float,
+    scan_interval: int,
+    sample_interval: float = 1.0,
+    record_path: Path | None = None,
+) -> dict[str, Any]:
+    """Run one scenario against a fresh coordinator and return its metrics.
+
+    With ``record_path`` the coordinator's GATT traffic is recorded there for
+    ``tools.replay``.
+    """
+    loop = asyncio.get_running_loop()
+    # DataUpdateCoordinator draws its poll offset from the global RNG
+    random.seed(seed)
+    hass = await async_create_hass()
+    purifier = SimulatedPurifier("F0:0D:00:00:00:01", seed=seed)
+    coordinator = create_coordinator(hass, purifier, scan_interval=scan_interval)
+    if record_path is not None:
+        record_path.unlink(missing_ok=True)
+        coordinator._client.recorder = GattRecorder(record_path)
+    start = loop.time()
+    purifier.fault_policy = FaultPlan(scenario, start, seed)
+
+    incidents = [
+        _Incident(window) for window in scenario.windows if window.kind in INCIDENT_KINDS
+    ]
+    state_writes = 0
+    unavailable_since: float | None = None
+    unavailable_seconds = 0.0
+
+    def _on_update() -> None:
+        nonlocal state_writes, unavailable_since, unavailable_seconds
+        now = loop.time()
+        elapsed = now - start
+        state_writes += 1
+        available = coordinator.last_update_success
+        if not available and unavailable_since is None:
+            unavailable_since = now
+        elif available and unavailable_since is not None:
+            unavailable_seconds += now - unavailable_since
+            unavailable_since = None
+        fresh = purifier.last_status_read
+        for incident in incidents:
+            if elapsed < incident.window.start or incident.recovered_at is not None:
+                continue
+            if not available and incident.detected_at is None:
+                incident.detected_at = elapsed
+            if (
+                available
+                and elapsed >= incident.window.end
+                and fresh is not None
+                and fresh - start >= incident.window.end
+            ):
+                incident.recovered_at = elapsed
+
+    unsub = coordinator.async_add_listener(_on_update)
+    await coordinator.async_refresh()
+
+    command_latencies: list[float] = []
+    commands_lost = 0
+
+    commands_hung = 0
+
+    async def _run_command(kind: str, value: Any) -> None:
+        nonlocal commands_lost, commands_hung
+        issued = loop.time()
+        if kind == "power":
+            command = coordinator.async_set_power(value)
+        else:
+            command = coordinator.async_set_mode(value)
+        try:
+            await asyncio.wait_for(command, COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            commands_hung += 1
+        command_latencies.append(loop.time() - issued)
+        if purifier.state[kind] != value:
+            commands_lost += 1
+
+    command_tasks: list[asyncio.Task] = []
+    next_command = COMMAND_INTERVAL
+    command_index = 0
+    stale_seconds = 0.0
+    data_ages: list[float] = []
+
+    while (elapsed := loop.time() - start) < duration:
+        if elapsed >= next_command:
+            kind, value = COMMAND_SCRIPT[command_index % len(COMMAND_SCRIPT)]
+            command_tasks.append(asyncio.create_task(_run_command(kind, value)))
+            command_index += 1
+            next_command += COMMAND_INTERVAL
+        if coordinator.last_update_success and coordinator.data:
+            shown = {"power": coordinator.data.get("power"), "mode": coordinator.data.get("mode")}
+            if shown != purifier.state:
+                stale_seconds += sample_interval
+            if (fresh := purifier.last_status_read) is not None:
+                data_ages.append(loop.time() - fresh)
+        await asyncio.sleep(sample_interval)
+
+    await asyncio.gather(*command_tasks)
+    unsub()
+    await coordinator.async_shutdown()
+    if unavailable_since is not None:
+        unavailable_seconds += loop.time() - unavailable_since
+
+    detect = [i.detected_at - i.window.start for i in incidents if i.detected_at is not None]
+    recover = [i.recovered_at - i.window.end for i in incidents if i.recovered_at is not None]
+    return {
+        "incidents": len(incidents),
+        "undetected_incidents": sum(i.detected_at is None for i in incidents),
+        "unrecovered_incidents": sum(i.recovered_at is None for i in incidents),
+        "time_to_detect": _summary(detect),
+        "time_to_recover": _summary(recover),
+        "unavailable_seconds": unavailable_seconds,
+        "commands": {
+            "issued": len(command_latencies),
+            "lost": commands_lost,
+            "hung": commands_hung,
+            "latency": _summary(command_latencies),
+        },
+        "staleness": {
+            "wrong_state_seconds": stale_seconds,
+            "data_age": _summary(data_ages),
+        },
+        "state_writes": state_writes,
+        "device_operations": dict(sorted(purifier.stats.items())),
+    }
+
+
+async def _async_main(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the selected scenarios."""
+    names = args.scenario or list(SCENARIOS)
+    results: dict[str, Any] = {}
+    for name in names:
+        _LOGGER.info("Running scenario %s: %s", name, SCENARIOS[name].description)
+        results[name] = await run_scenario(
+            SCENARIOS[name],
+            seed=args.seed,
+            duration=args.duration,
+            scan_interval=args.scan_interval,
+            record_path=Path(args.record, f"{name}.gattlog") if args.record else None,
+        )
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="scenario to run (repeatable, default: all)",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--duration", type=float, default=3600.0, help="virtual seconds per scenario"
+    )
+    parser.add_argument("--scan-interval", type=int, default=DEFAULT_SCAN_INTERVAL)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved run")
+    parser.add_argument("--tolerance", type=float, default=results_io.DEFAULT_TOLERANCE)
+    parser.add_argument(
+        "--record", metavar="DIR", help="record each scenario's GATT traffic into DIR"
+    )
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--verbose", action="store_true", help="show integration logs")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<22} {scenario.description}")
+        return 0
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    if not args.verbose:
+        logging.getLogger("custom_components").setLevel(logging.CRITICAL)
+        logging.getLogger("homeassistant").setLevel(logging.CRITICAL)
+
+    results = run(_async_main(args))
+    document = results_io.build_document(
+        "fault_injection",
+        results,
+        seed=args.seed,
+        duration=args.duration,
+        scan_interval=args.scan_interval,
+    )
+    results_io.write_document(document, args.output)
+
+    if args.compare:
+        baseline = results_io.load_document(args.compare)
+        ok = results_io.report_comparison(
+            results_io.compare(document, baseline, min_delta=MIN_DELTA),
+            tolerance=args.tolerance,
+        )
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Import-time benchmark for the integration's modules.
+
+Each scenario imports what Home Assistant has already loaded at that point
+(its core, the Bluetooth integration, the entity platforms), then the
+integration's modules, in a fresh interpreter under ``python -X importtime``.
+Only imports after that point are counted, so the numbers are what this
+integration adds to Home Assistant's boot, config flow and setup. Each
+scenario runs ``--repeat`` times after one warm-up run and reports the median.
+Bytecode goes to a private cache that the warm-up run fills, so the
+numbers are for compiled imports, as in an installed Home Assistant, even
+with ``PYTHONDONTWRITEBYTECODE`` set and without writing into the tree.
+
+    python -m tools.import_time --output imports.json
+    python -m tools.import_time --compare imports.json
+    python -m tools.import_time --scenario client --verbose
+"""
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+import os
+from pathlib import Path
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, NamedTuple
+
+from . import results as results_io
+
+ROOT = Path(__file__).resolve().parents[1]
+PACKAGE = "custom_components.xiaomi_car_air_purifier"
+# Import time changes this small are noise; a module count has no floor
+MIN_DELTA = {"ms": 2.0}
+
+_HA_CORE = ("homeassistant.core", "homeassistant.config_entries")
+_HA_BLUETOOTH = (*_HA_CORE, "homeassistant.components.bluetooth")
+_HA_PLATFORMS = (
+    *_HA_BLUETOOTH,
+    "homeassistant.components.fan",
+    "homeassistant.components.sensor",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.service",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+)
+
+# name: (modules already loaded, modules under test)
+SCENARIOS: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    # Home Assistant imports every configured integration's package at boot
+    "package": (_HA_CORE, (PACKAGE,)),
+    # ... and its config flow when the integration is loaded or discovered
+    "config_flow": (_HA_BLUETOOTH, (PACKAGE, f"{PACKAGE}.config_flow")),
+    # Setting up an entry loads the coordinator, platforms and services
+    "setup": (
+        _HA_PLATFORMS,
+        (
+            PACKAGE,
+            f"{PACKAGE}.coordinator",
+            f"{PACKAGE}.fan",
+            f"{PACKAGE}.sensor",
+            f"{PACKAGE}.services",
+        ),
+    ),
+    # The BLE client on its own, as the command-line tools use it
+    "client": ((), (f"{PACKAGE}.ble_client",)),
+}
+
+_ENV = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+_MARKER = "-- import_time: measuring --"
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$", re.MULTILINE)
+
+
+class Measurement(NamedTuple):
+    """Imports counted in one run of a scenario."""
+
+    ms: float  # cumulative import time
+    modules: int  # modules imported
+    packages: Counter[str]  # self time in microseconds per top-level package
+
+
+def measure(
+    preload: tuple[str, ...], modules: tuple[str, ...], pycache: str
+) -> Measurement:
+    """Import ``modules`` after ``preload`` in a fresh interpreter."""
+    code = "\n".join(
+        [
+            *(f"import {module}" for module in preload),
+            f"import sys; sys.stderr.write({_MARKER!r} + '\\n')",
+            *(f"import {module}" for module in modules),
+        ]
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env={**_ENV, "PYTHONPYCACHEPREFIX": pycache},
+        check=False,
+    )
+    if process.returncode:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    measured = process.stderr.partition(_MARKER)[2]
+    total = 0
+    count = 0
+    packages: Counter[str] = Counter()
+    for self_us, cumulative_us, indent, name in _LINE.findall(measured):
+        count += 1
+        packages[name.split(".")[0]] += int(self_us)
+        if not indent:
+            total += int(cumulative_us)
+    return Measurement(total / 1e3, count, packages)
+
+
+def run_scenario(
+    name: str, repeat: int, pycache: str
+) -> tuple[dict[str, Any], Measurement]:
+    """Return the median time and module count of a scenario."""
+    preload, modules = SCENARIOS[name]
+    measure(preload, modules, pycache)  # warm-up: compiles bytecode, fills the page cache
+    runs = [measure(preload, modules, pycache) for _ in range(repeat)]
+    median = sorted(runs, key=lambda run: run.ms)[len(runs) // 2]
+    return {
+        "ms": round(statistics.median(run.ms for run in runs), 3),
+        "modules": median.modules,
+    }, median
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=tuple(SCENARIOS),
+        help="scenario to run (repeatable, default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the slowest packages of each scenario"
+    )
+    args = parser.parse_args(argv)
+
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="import_time_") as pycache:
+        for name in args.scenario or SCENARIOS:
+            try:
+                results[name], median = run_scenario(name, args.repeat, pycache)
+            except RuntimeError as err:
+                # Scenarios that need Home Assistant are skipped without it
+                print(f"# {name}: skipped ({err})", file=sys.stderr)
+                continue
+            print(
+                f"# {name}: {results[name]['ms']:.1f} ms, {results[name]['modules']} modules",
+                file=sys.stderr,
+            )
+            if args.verbose:
+                for package, self_us in median.packages.most_common(8):
+                    print(f"#     {package:<32} {self_us / 1e3:8.1f} ms", file=sys.stderr)
+
+    document = results_io.build_document("import_time", results, repeat=args.repeat)
+    results_io.write_document(document, args.output)
+
+    if args.compare:
+        baseline = results_io.load_document(args.compare)
+        ok = results_io.report_comparison(
+            results_io.compare(document, baseline, min_delta=MIN_DELTA),
+            tolerance=args.tolerance,
+        )
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Fleet load test: many simulated purifiers on one event loop.
+
+Creates N coordinators, each with its own polling timer, retry sleeps and
+logging, against simulated purifiers with realistic latency and random
+dropouts, and measures how the event loop copes as N grows:
+
+- event-loop lag: overshoot of a 50 ms sleep probe
+- CPU per device: process CPU time per device per second of wall time
+- memory per coordinator: traced allocations for creating a coordinator and
+  its first refresh
+- state-write rate: coordinator listener updates per second
+
+This runs on the real clock, so each step takes ``--duration`` seconds.
+With ``--worker``, the purifiers run in the BLE worker process instead, as
+with the "Run Bluetooth in a separate process" option; CPU and memory are
+then Home Assistant's side, and the worker's CPU is reported separately.
+
+    python -m tools.loadtest --devices 1,10,50,100 --output fleet.json
+    python -m tools.loadtest --compare fleet.json
+    python -m tools.loadtest --worker --compare fleet.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from custom_components.xiaomi_car_air_purifier.const import (
+    CONF_WORKER,
+    DATA_WORKER,
+    DEFAULT_SCAN_INTERVAL,
+)
+from custom_components.xiaomi_car_air_purifier.fan import XiaomiCarAirPurifierFan
+from custom_components.xiaomi_car_air_purifier.sensor import SENSORS, XiaomiSensorEntity
+from custom_components.xiaomi_car_air_purifier.worker_supervisor import WorkerSupervisor
+
+from . import results as results_io
+from .fault_injection import FaultPlan, Scenario
+from .simulator import (
+    FAULT_CONNECT_FAIL,
+    FAULT_DISCONNECT,
+    SimulatedConfigEntry,
+    SimulatedPurifier,
+    async_create_hass,
+    create_coordinator,
+    run,
+    simulated_address,
+)
+
+LAG_PROBE_INTERVAL = 0.05  # seconds
+DEFAULT_TOLERANCE = 0.25
+# Measurements moving this little are noise; failure counts have no floor
+MIN_DELTA = dict.fromkeys(
+    ("percent", "second", "seconds", "per_coordinator", "mean", "max", "p50", "p95", "p99"), 0.5
+)
+
+# Background dropout applied to every simulated purifier
+DROPOUT = Scenario(
+    "2% of operations lose the link, 10% of reconnects fail",
+    rates={FAULT_DISCONNECT: 0.02, FAULT_CONNECT_FAIL: 0.10},
+)
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Return the ``fraction`` percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _simulated_purifier(index: int, seed: int) -> SimulatedPurifier:
+    """Return the ``index``-th purifier of the fleet, with background dropout."""
+    purifier = SimulatedPurifier(
+        simulated_address(index),
+        name=f"MI-CAR-{index:04d}",
+        rssi=-50 - index % 40,
+        latency=0.08,
+        jitter=0.04,
+        seed=seed + index,
+    )
+    purifier.fault_policy = FaultPlan(DROPOUT, asyncio.get_running_loop().time(), seed + index)
+    return purifier
+
+
+def worker_transport(address: str) -> Any:
+    """Connect the BLE worker to the ``--worker`` fleet's purifiers.
+
+    Runs in the worker process, which does not know ``--seed``: purifiers
+    are seeded by their index, as with ``--seed 0``.
+    """
+    index = int(address.replace(":", "")[-6:], 16)
+    return _simulated_purifier(index, 0).connect
+
+
+def _create_fleet(
+    hass: Any, devices: int, scan_interval: int, seed: int, *, worker: bool = False
+) -> list[tuple[Any, SimulatedPurifier, list[Any]]]:
+    """Create coordinators, purifiers and entities for ``devices`` devices."""
+    fleet = []
+    for index in range(devices):
+        # With a worker, this purifier only stands in for the one in the worker
+        purifier = _simulated_purifier(index, seed)
+        coordinator = create_coordinator(
+            hass, purifier, scan_interval=scan_interval, options={CONF_WORKER: worker}
+        )
+        entry = SimulatedConfigEntry(purifier.address, title=purifier.name)
+        entities = [XiaomiCarAirPurifierFan(coordinator, entry)] + [
+            XiaomiSensorEntity(coordinator, entry, description) for description in SENSORS
+        ]
+        fleet.append((coordinator, purifier, entities))
+    return fleet
+
+
+async def run_step(
+    devices: int, *, duration: float, scan_interval: int, seed: int, worker: bool = False
+) -> dict[str, Any]:
+    """Run one fleet size and return its metrics."""
+    loop = asyncio.get_running_loop()
+    random.seed(seed)
+    hass = await async_create_hass()
+    supervisor = None
+    if worker:
+        supervisor = hass.data[DATA_WORKER] = WorkerSupervisor(
+            transport="tools.loadtest:worker_transport"
+        )
+
+    # Memory: trace creating the fleet and its first refresh
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    fleet = _create_fleet(hass, devices, scan_interval, seed, worker=worker)
+    startup = time.perf_counter()
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator, _, _ in fleet))
+    startup = time.perf_counter() - startup
+    allocated = sum(
+        stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, "filename")
+    )
+    tracemalloc.stop()
+
+    state_writes = 0
+    unsubs = []
+    for coordinator, _, entities in fleet:
+
+        def _on_update(entities: list[Any] = entities) -> None:
+            nonlocal state_writes
+            # What each entity's async_write_ha_state would evaluate
+            for entity in entities:
+                state_writes += 1
+                entity.available  # noqa: B018
+                if hasattr(entity, "preset_mode"):
+                    entity.is_on  # noqa: B018
+                    entity.preset_mode  # noqa: B018
+                else:
+                    entity.native_value  # noqa: B018
+
+        unsubs.append(coordinator.async_add_listener(_on_update))
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+
+    async def _probe() -> None:
+        while not stop.is_set():
+            start = loop.time()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lags.append(loop.time() - start - LAG_PROBE_INTERVAL)
+
+    probe = asyncio.create_task(_probe())
+    worker_stats = supervisor and await supervisor.async_stats()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(duration)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    stop.set()
+    await probe
+
+    for unsub in unsubs:
+        unsub()
+    await asyncio.gather(*(coordinator.async_shutdown() for coordinator, _, _ in fleet))
+    worker_metrics: dict[str, Any] = {}
+    if supervisor is not None:
+        if worker_stats and (stats := await supervisor.async_stats()):
+            worker_cpu = stats["cpu_seconds"] - worker_stats["cpu_seconds"]
+            worker_metrics["worker_cpu_percent"] = 100 * worker_cpu / wall
+        worker_metrics["worker_restarts"] = supervisor.restarts
+        await supervisor.async_stop()
+
+    ordered = sorted(lag * 1e3 for lag in lags)
+    failed = sum(not coordinator.last_update_success for coordinator, _, _ in fleet)
+    operations = sum(
+        purifier.stats["read"] + purifier.stats["write"] + purifier.stats["connect"]
+        for _, purifier, _ in fleet
+    )
+    metrics = {
+        "startup_seconds": startup,
+        "loop_lag_ms": {
+            "mean": statistics.fmean(ordered) if ordered else 0.0,
+            "p50": _percentile(ordered, 0.50),
+            "p95": _percentile(ordered, 0.95),
+            "p99": _percentile(ordered, 0.99),
+            "max": ordered[-1] if ordered else 0.0,
+        },
+        "cpu_percent": 100 * cpu / wall,
+        "cpu_ms_per_device_second": 1e3 * cpu / wall / devices,
+        "memory_bytes_per_coordinator": allocated / devices,
+        "state_writes_per_second": state_writes / wall,
+        "gatt_operations_per_second": operations / wall,
+        "unavailable_devices": failed,
+        **worker_metrics,
+    }
+    if worker:
+        # The purifiers polled are in the worker process
+        del metrics["gatt_operations_per_second"]
+    return metrics
+
+
+async def _async_main(args: argparse.Namespace) -> dict[str, Any]:
+    """Run every fleet size in turn."""
+    results: dict[str, Any] = {}
+    for devices in args.devices:
+        logging.getLogger(__name__).warning("Running %d devices for %ss", devices, args.duration)
+        results[f"devices_{devices}"] = await run_step(
+            devices,
+            duration=args.duration,
+            scan_interval=args.scan_interval,
+            seed=args.seed,
+            worker=args.worker,
+        )
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--devices",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=[1, 10, 50, 100],
+        help="comma separated fleet sizes (default: 1,10,50,100)",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=60.0, help="wall seconds per fleet size"
+    )
+    parser.add_argument("--scan-interval", type=int, default=DEFAULT_SCAN_INTERVAL)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--worker", action="store_true", help="run the purifiers in the BLE worker process"
+    )
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    # Integration logs go through real formatting and I/O, as they would in HA
+    logging.basicConfig(level=logging.WARNING, filename=os.devnull)
+    logging.getLogger(__name__).addHandler(logging.StreamHandler())
+
+    results = run(_async_main(args), virtual_time=False)
+    document = results_io.build_document(
+        "loadtest",
+        results,
+        devices=args.devices,
+        duration=args.duration,
+        scan_interval=args.scan_interval,
+        seed=args.seed,
+        worker=args.worker,
+    )
+    results_io.write_document(document, args.output)
+
+    if args.compare:
+        baseline = results_io.load_document(args.compare)
+        ok = results_io.report_comparison(
+            results_io.compare(document, baseline, min_delta=MIN_DELTA),
+            tolerance=args.tolerance,
+        )
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""Replay recorded GATT traffic into the coordinator.
+
+Recordings come from the ``record_gatt`` option of the integration, or from
+``python -m tools.fault_injection --record DIR``. Replay answers every
+connect, read and write the coordinator issues with the recorded outcome
+nearest in time, so a bad afternoon in the garage becomes a repeatable test
+case. On the virtual clock a replay is deterministic and runs far faster
+than real time; ``--real-time --speed N`` replays on the wall clock, N times
+faster, with the poll interval compressed to match.
+
+    python -m tools.replay dump purifier.gattlog
+    python -m tools.replay run purifier.gattlog --output replay.json
+    python -m tools.replay run purifier.gattlog --compare replay.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+from collections import Counter
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+import logging
+import random
+import sys
+from typing import Any
+
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+
+from custom_components.xiaomi_car_air_purifier.const import (
+    DATA_POLL_SCHEDULER,
+    DEFAULT_SCAN_INTERVAL,
+    MODE_CHAR_UUID,
+    POLL_TICK,
+    POWER_CHAR_UUID,
+)
+from custom_components.xiaomi_car_air_purifier.gatt_log import (
+    OP_CONNECT,
+    OP_NAMES,
+    OP_READ,
+    OP_WRITE,
+    OUTCOME_NAMES,
+    OUTCOME_OK,
+    OUTCOME_TIMEOUT,
+    GattRecord,
+    describe_value,
+    full_uuid,
+    iter_records,
+    short_uuid,
+)
+from custom_components.xiaomi_car_air_purifier.poll_scheduler import PollScheduler
+
+from . import results as results_io
+from .simulator import async_create_hass, create_coordinator, run
+
+_POWER = short_uuid(POWER_CHAR_UUID)
+_MODE = short_uuid(MODE_CHAR_UUID)
+
+# Changes in seconds this small are not regressions; counts have no floor
+MIN_DELTA = {"seconds": 1.0, "mean": 1.0, "max": 1.0}
+
+
+class _Timeline:
+    """Records of one kind, searchable by time."""
+
+    def __init__(self) -> None:
+        self.times: list[float] = []
+        self.records: list[GattRecord] = []
+
+    def add(self, offset: float, record: GattRecord) -> None:
+        self.times.append(offset)
+        self.records.append(record)
+
+    def nearest(self, position: float) -> GattRecord | None:
+        """Return the record closest to ``position`` (earlier wins ties)."""
+        if not self.times:
+            return None
+        index = bisect.bisect_left(self.times, position)
+        if index == 0:
+            return self.records[0]
+        if index == len(self.times):
+            return self.records[-1]
+        before, after = self.times[index - 1], self.times[index]
+        return self.records[index - 1 if position - before <= after - position else index]
+
+
+class ReplayTransport:
+    """Serves GATT operations from a recording, usable as a client connector."""
+
+    def __init__(
+        self,
+        records: Iterable[GattRecord],
+        *,
+        address: str = "F0:0D:00:00:00:01",
+        name: str = "MI-CAR-REPLAY",
+        speed: float = 1.0,
+    ) -> None:
+        """Initialize the transport; ``speed`` compresses recorded time."""
+        records = sorted(records, key=lambda record: record.started)
+        if not records:
+            raise ValueError("Recording is empty")
+        self.address = address
+        self.name = name
+        self.speed = speed
+        self.ble_device = BLEDevice(address, name, None, rssi=-60)
+        self.origin = records[0].started
+        self.span = records[-1].started + records[-1].duration - self.origin
+        self.stats: Counter[str] = Counter()
+        self.last_status_read: float | None = None
+        self._last_read: dict[int, float] = {}
+        self._exact: dict[tuple[int, int], _Timeline] = {}
+        self._by_op: dict[int, _Timeline] = {}
+        self._any = _Timeline()
+        for record in records:
+            offset = record.started - self.origin
+            self._exact.setdefault((record.op, record.char), _Timeline()).add(offset, record)
+            self._by_op.setdefault(record.op, _Timeline()).add(offset, record)
+            self._any.add(offset, record)
+        self._start: float | None = None
+        self._client: ReplayBleakClient | None = None
+
+    def start(self) -> None:
+        """Start the replay clock at the current loop time."""
+        self._start = asyncio.get_running_loop().time()
+
+    @property
+    def position(self) -> float:
+        """Return the current position in recorded seconds."""
+        if self._start is None:
+            self.start()
+        return (asyncio.get_running_loop().time() - self._start) * self.speed
+
+    def lookup(self, op: int, char: int) -> GattRecord | None:
+        """Return the recorded outcome for ``op`` on ``char`` at this moment.
+
+        Falls back to the same operation on any characteristic, then (except
+        for reads, which need a recorded value) to any operation, as a proxy
+        for link health at that time.
+        """
+        position = self.position
+        if (timeline := self._exact.get((op, char))) is not None:
+            return timeline.nearest(position)
+        if op == OP_READ:
+            return None
+        if (timeline := self._by_op.get(op)) is not None:
+            return timeline.nearest(position)
+        return self._any.nearest(position)
+
+    async def replay(self, op: int, char: int) -> GattRecord:
+        """Reproduce the recorded timing and outcome of one operation."""
+        self.stats[OP_NAMES[op]] += 1
+        record = self.lookup(op, char)
+        if record is None:
+            raise BleakError(f"Characteristic {full_uuid(char)} is not in the recording")
+        await asyncio.sleep(record.duration / self.speed)
+        if record.outcome != OUTCOME_OK:
+            self.stats[f"{OP_NAMES[op]}_{OUTCOME_NAMES[record.outcome]}"] += 1
+            if self._client is not None:
+                self._client.connected = False
+            message = record.payload.decode(errors="replace") or "replayed failure"
+            if record.outcome == OUTCOME_TIMEOUT:
+                raise TimeoutError(message)
+            raise BleakError(message)
+        if op == OP_READ:
+            now = asyncio.get_running_loop().time()
+            self._last_read[char] = now
+            if _POWER in self._last_read and _MODE in self._last_read:
+                self.last_status_read = min(self._last_read[_POWER], self._last_read[_MODE])
+        return record
+
+    async def connect(self, device: BLEDevice) -> ReplayBleakClient:
+        """Open a replayed connection."""
+        await self.replay(OP_CONNECT, 0)
+        self._client = ReplayBleakClient(self)
+        return self._client
+
+
+class ReplayBleakClient:
+    """The subset of BleakClient the integration uses, backed by a recording."""
+
+    def __init__(self, transport: ReplayTransport) -> None:
+        """Initialize the replay client."""
+        self._transport = transport
+        self.connected = True
+
+    @property
+    def is_connected(self) -> bool:
+        """Return connection status."""
+        return self.connected
+
+    async def read_gatt_char(self, char_specifier: Any, **kwargs: Any) -> bytearray:
+        """Read a characteristic from the recording."""
+        if not self.connected:
+            raise BleakError("Not connected")
+        record = await self._transport.replay(OP_READ, short_uuid(str(char_specifier)))
+        return bytearray(record.payload)
+
+    async def write_gatt_char(
+        self, char_specifier: Any, data: bytes, response: bool | None = None
+    ) -> None:
+        """Write a characteristic with the recorded outcome."""
+        if not self.connected:
+            raise BleakError("Not connected")
+        await self._transport.replay(OP_WRITE, short_uuid(str(char_specifier)))
+
+    async def disconnect(self) -> bool:
+        """Disconnect."""
+        self.connected = False
+        return True
+
+
+async def run_replay(
+    transport: ReplayTransport, *, scan_interval: int, seed: int
+) -> dict[str, Any]:
+    """Run the coordinator over the whole recording and return its metrics."""
+    loop = asyncio.get_running_loop()
+    random.seed(seed)
+    hass = await async_create_hass()
+    speed = transport.speed
+    # Compress polling along with the recording, down to the scheduler's
+    # tick, so the interval is not rounded to whole seconds; fixed retry
+    # sleeps stay as they are
+    hass.data[DATA_POLL_SCHEDULER] = PollScheduler(tick=POLL_TICK / speed)
+    coordinator = create_coordinator(hass, transport, scan_interval=scan_interval)
+    coordinator.update_interval = timedelta(seconds=scan_interval / speed)
+    transport.start()
+
+    updates = Counter()
+    unavailable_since: float | None = None
+    unavailable_seconds = 0.0
+
+    def _on_update() -> None:
+        nonlocal unavailable_since, unavailable_seconds
+        now = loop.time()
+        available = coordinator.last_update_success
+        updates["ok" if available else "failed"] += 1
+        if not available and unavailable_since is None:
+            unavailable_since = now
+        elif available and unavailable_since is not None:
+            unavailable_seconds += now - unavailable_since
+            unavailable_since = None
+
+    unsub = coordinator.async_add_listener(_on_update)
+    await coordinator.async_refresh()
+
+    data_ages = []
+    end = loop.time() + transport.span / speed
+    while loop.time() < end:
+        if coordinator.last_update_success and transport.last_status_read is not None:
+            data_ages.append((loop.time() - transport.last_status_read) * speed)
+        await asyncio.sleep(1.0 / speed)
+
+    unsub()
+    await coordinator.async_shutdown()
+    if unavailable_since is not None:
+        unavailable_seconds += loop.time() - unavailable_since
+
+    return {
+        "recording_seconds": transport.span,
+        "updates": {"ok": updates["ok"], "failed": updates["failed"]},
+        "unavailable_seconds": unavailable_seconds * speed,
+        "data_age": {
+            "max": max(data_ages, default=0.0),
+            "mean": sum(data_ages) / len(data_ages) if data_ages else 0.0,
+        },
+        "operations": dict(sorted(transport.stats.items())),
+    }
+
+
+def dump(path: str) -> None:
+    """Print a recording as a readable timeline."""
+    origin: float | None = None
+    for record in iter_records(path):
+        if origin is None:
+            origin = record.started
+            print(f"# recording starts {datetime.fromtimestamp(origin).isoformat()}")
+        char = f"{record.char:04X}" if record.char else "----"
+        if record.outcome == OUTCOME_OK:
+            detail = describe_value(record.char, record.payload)
+        else:
+            detail = record.payload.decode(errors="replace")
+        print(
+            f"{record.started - origin:+11.3f}s {OP_NAMES[record.op]:<10} {char} "
+            f"{OUTCOME_NAMES[record.outcome]:<7} {record.duration * 1e3:8.1f} ms  {detail}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    dump_parser = commands.add_parser("dump", help="print a recording")
+    dump_parser.add_argument("recording")
+    run_parser = commands.add_parser("run", help="replay a recording into the coordinator")
+    run_parser.add_argument("recording")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="time compression factor")
+    run_parser.add_argument(
+        "--real-time", action="store_true", help="replay on the wall clock"
+    )
+    run_parser.add_argument("--scan-interval", type=int, default=DEFAULT_SCAN_INTERVAL)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved run")
+    run_parser.add_argument("--tolerance", type=float, default=results_io.DEFAULT_TOLERANCE)
+    run_parser.add_argument("--verbose", action="store_true", help="show integration logs")
+    args = parser.parse_args(argv)
+
+    if args.command == "dump":
+        dump(args.recording)
+        return 0
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.CRITICAL,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    transport = ReplayTransport(iter_records(args.recording), speed=args.speed)
+    results = run(
+        run_replay(transport, scan_interval=args.scan_interval, seed=args.seed),
+        virtual_time=not args.real_time,
+    )
+    document = results_io.build_document(
+        "replay",
+        results,
+        recording=args.recording,
+        speed=args.speed,
+        scan_interval=args.scan_interval,
+        seed=args.seed,
+    )
+    results_io.write_document(document, args.output)
+
+    if args.compare:
+        baseline = results_io.load_document(args.compare)
+        ok = results_io.report_comparison(
+            results_io.compare(
+                document, baseline, higher_is_better=("ok",), min_delta=MIN_DELTA
+            ),
+            tolerance=args.tolerance,
+        )
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Machine-readable results and baseline comparison for the offline tools.
+
+Every tool writes one JSON document: a ``meta`` block identifying the run and
+a nested ``results`` dict of numbers. ``compare`` flattens both documents to
+dotted keys and flags metrics that moved the wrong way.
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
+import math
+from pathlib import Path
+import platform
+import subprocess
+import sys
+from typing import Any
+
+# Relative change tolerated before a metric counts as a regression
+DEFAULT_TOLERANCE = 0.05
+# Failure counts where any increase is a regression, whatever the tolerance
+STRICT_METRICS = ("lost", "hung", "unrecovered_incidents", "undetected_incidents")
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """One metric compared against its baseline value."""
+
+    key: str
+    baseline: float
+    current: float
+    higher_is_better: bool
+    min_delta: float = 0.0  # absolute change below which it is noise
+    strict: bool = False  # any change for the worse is a regression
+
+    @property
+    def change(self) -> float:
+        """Return the relative change, signed so that positive is worse."""
+        delta = self.current - self.baseline
+        if self.higher_is_better:
+            delta = -delta
+        if self.baseline == 0:
+            return 0.0 if delta == 0 else math.copysign(math.inf, delta)
+        return delta / abs(self.baseline)
+
+    def is_regression(self, tolerance: float) -> bool:
+        """Return whether the metric got worse beyond the tolerances."""
+        if self.strict:
+            return self.change > 0
+        if abs(self.current - self.baseline) <= self.min_delta:
+            return False
+        return self.change > tolerance
+
+
+def _git_revision() -> str | None:
+    """Return the current git revision, if available."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_document(tool: str, results: dict[str, Any], **params: Any) -> dict[str, Any]:
+    """Wrap ``results`` with metadata identifying the run."""
+    return {
+        "meta": {
+            "tool": tool,
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "params": params,
+        },
+        "results": results,
+    }
+
+
+def write_document(document: dict[str, Any], path: str | None) -> None:
+    """Write ``document`` to ``path``, or to stdout when no path is given."""
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if path is None or path == "-":
+        print(text)
+    else:
+        Path(path).write_text(text + "\n", encoding="utf-8")
+
+
+def load_document(path: str) -> dict[str, Any]:
+    """Load a document written by ``write_document``."""
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    """Flatten nested results to ``{"a.b.c": number}``, skipping non-numbers."""
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(
+    current: dict[str, Any],
+    baseline: dict[str, Any],
+    *,
+    higher_is_better: tuple[str, ...] = (),
+    min_delta: Mapping[str, float] | None = None,
+) -> list[Comparison]:
+    """Compare the metrics present in both documents.
+
+    Metrics are lower-is-better unless their last key component is listed in
+    ``higher_is_better``. ``min_delta`` maps endings of the last key
+    component, such as ``"_ms"``, to the absolute change a matching metric
+    must exceed to count as a regression, so timing noise is not flagged.
+    Other metrics, such as counts, get no floor, and the failure counts in
+    ``STRICT_METRICS`` regress on any increase.
+    """
+    cur = flatten(current["results"])
+    base = flatten(baseline["results"])
+    floors = min_delta or {}
+    comparisons = []
+    for key in sorted(cur.keys() & base.keys()):
+        name = key.rsplit(".", 1)[-1]
+        comparisons.append(
+            Comparison(
+                key,
+                base[key],
+                cur[key],
+                name in higher_is_better,
+                min_delta=next(
+                    (floor for ending, floor in floors.items() if name.endswith(ending)), 0.0
+                ),
+                strict=name in STRICT_METRICS,
+            )
+        )
+    return comparisons
+
+
+def report_comparison(
+    comparisons: list[Comparison],
+    *,
+    tolerance: float = DEFAULT_TOLERANCE,
+    stream: Any = sys.stderr,
+) -> bool:
+    """Print a comparison table and return True when nothing regressed."""
+    ok = True
+    for item in comparisons:
+        regressed = item.is_regression(tolerance)
+        ok = ok and not regressed
+        if item.baseline == item.current:
+            continue
+        direction = "worse" if item.change > 0 else "better"
+        change = "" if math.isinf(item.change) else f"{abs(item.change):.1%} "
+        print(
+            f"{'REGRESSION' if regressed else 'ok':<10} {item.key:<60} "
+            f"{item.baseline:>12.6g} -> {item.current:<12.6g} ({change}{direction})",
+            file=stream,
+        )
+    print(
+        f"{len(comparisons)} metrics compared: {'no regressions' if ok else 'REGRESSIONS FOUND'}",
+        file=stream,
+    )
+    return ok
@@ -0,0 +1,495 @@
+"""Simulated purifiers and a virtual-time event loop for the offline tools.
+
+The tools drive the real integration code. Only the BleakClient underneath
+XiaomiCarAirPurifierBLEClient is replaced, through the client's ``connector``
+hook, by a SimulatedBleakClient talking to an in-memory SimulatedPurifier.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable, Coroutine
+from dataclasses import dataclass
+import functools
+import random
+import selectors
+import tempfile
+from typing import Any, Protocol, TypeVar
+from unittest.mock import patch
+import uuid
+
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+
+from custom_components.xiaomi_car_air_purifier.const import (
+    CONF_SCAN_INTERVAL,
+    DEFAULT_SCAN_INTERVAL,
+    MODE_AUTO,
+    MODE_CHAR_UUID,
+    MODE_NAMES,
+    POWER_CHAR_UUID,
+    POWER_ON,
+    SERVICE_UUID,
+)
+
+_T = TypeVar("_T")
+
+# Operations a fault policy is consulted for
+OP_CONNECT = "connect"
+OP_READ = "read"
+OP_WRITE = "write"
+
+# Fault kinds understood by the simulated transport
+FAULT_CONNECT_FAIL = "connect_fail"  # connect raises BleakError
+FAULT_DISCONNECT = "disconnect"  # link drops in the middle of a read/write
+FAULT_HANG = "hang"  # operation stalls, then fails as a backend timeout
+FAULT_BLEAK_ERROR = "bleak_error"  # operation raises BleakError, link stays up
+FAULT_OUT_OF_RANGE = "out_of_range"  # device unreachable until the fault ends
+
+ADAPTER_REJECT_LATENCY = 0.05  # seconds until a busy adapter rejects a connect
+
+
+@dataclass(frozen=True)
+class Fault:
+    """A fault to apply to one simulated operation."""
+
+    kind: str
+    duration: float = 0.0  # stall length for FAULT_HANG
+
+
+# Called as policy(operation, loop_time) before every simulated operation
+FaultPolicy = Callable[[str, float], Fault | None]
+
+
+class SimulatedAdapter:
+    """A Bluetooth adapter that sets up only a few connections at a time.
+
+    BlueZ and ESPHome proxies reject connection attempts while all their
+    slots are busy setting up other connections; so does this adapter.
+    """
+
+    def __init__(self, slots: int = 2) -> None:
+        """Initialize an idle adapter."""
+        self.slots = slots
+        self.connecting = 0
+        self.stats: Counter[str] = Counter()
+
+
+class SimulatedPurifier:
+    """In-memory model of one purifier's FFD0 service and radio link."""
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        name: str = "MI-CAR-SIM",
+        rssi: int = -60,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        connect_latency: float = 0.5,
+        connect_timeout: float = 10.0,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the simulated purifier."""
+        self.address = address.upper()
+        self.name = name
+        self.rssi = rssi
+        self.latency = latency
+        self.jitter = jitter
+        self.connect_latency = connect_latency
+        self.connect_timeout = connect_timeout
+        self.fault_policy: FaultPolicy | None = None
+        self.adapter: SimulatedAdapter | None = None
+        self.characteristics: dict[str, bytes] = {
+            POWER_CHAR_UUID: POWER_ON,
+            MODE_CHAR_UUID: MODE_AUTO,
+        }
+        self.ble_device = BLEDevice(self.address, name, None, rssi=rssi)
+        self.stats: Counter[str] = Counter()
+        self.last_read: dict[str, float] = {}
+        self._client: SimulatedBleakClient | None = None
+        self._rng = random.Random(seed if seed is not None else self.address)
+
+    @property
+    def state(self) -> dict[str, Any]:
+        """Return the device-side power and mode."""
+        return {
+            "power": bool(self.characteristics[POWER_CHAR_UUID][0]),
+            "mode": MODE_NAMES.get(self.characteristics[MODE_CHAR_UUID][0], "Unknown"),
+        }
+
+    @property
+    def last_status_read(self) -> float | None:
+        """Return when both status characteristics were last read successfully."""
+        if POWER_CHAR_UUID not in self.last_read or MODE_CHAR_UUID not in self.last_read:
+            return None
+        return min(self.last_read[POWER_CHAR_UUID], self.last_read[MODE_CHAR_UUID])
+
+    def delay(self, base: float) -> float:
+        """Return a jittered delay around ``base``."""
+        if not self.jitter:
+            return base
+        return max(0.0, base + self._rng.uniform(-self.jitter, self.jitter))
+
+    def fault(self, operation: str) -> Fault | None:
+        """Return the fault to apply to ``operation``, if any."""
+        if self.fault_policy is None:
+            return None
+        return self.fault_policy(operation, asyncio.get_running_loop().time())
+
+    def drop_link(self) -> None:
+        """Drop the current connection, as if the device went away."""
+        if self._client is not None:
+            self._client.connected = False
+            self._client = None
+
+    async def connect(self, device: BLEDevice) -> SimulatedBleakClient:
+        """Open a simulated connection; usable as a BLE client connector."""
+        self.stats["connect"] += 1
+        adapter = self.adapter
+        if adapter is None:
+            return await self._connect()
+        adapter.stats["connect"] += 1
+        if adapter.connecting >= adapter.slots:
+            adapter.stats["rejected"] += 1
+            await asyncio.sleep(ADAPTER_REJECT_LATENCY)
+            raise BleakError(f"{self.address}: adapter busy, connection rejected")
+        adapter.connecting += 1
+        try:
+            return await self._connect()
+        finally:
+            adapter.connecting -= 1
+
+    async def _connect(self) -> SimulatedBleakClient:
+        """Open a simulated connection through a free adapter slot."""
+        fault = self.fault(OP_CONNECT)
+        if fault is not None:
+            self.stats[f"fault_{fault.kind}"] += 1
+            if fault.kind == FAULT_OUT_OF_RANGE:
+                await asyncio.sleep(self.connect_timeout)
+                raise BleakError(f"{self.address}: device not found")
+            if fault.kind == FAULT_HANG:
+                await asyncio.sleep(fault.duration)
+                raise BleakError(f"{self.address}: connection timed out")
+            await asyncio.sleep(self.delay(self.connect_latency))
+            raise BleakError(f"{self.address}: connection failed")
+
+        await asyncio.sleep(self.delay(self.connect_latency))
+        self.drop_link()
+        self._client = SimulatedBleakClient(self)
+        return self._client
+
+    async def run_operation(
+        self, client: SimulatedBleakClient, operation: str, uuid_: str
+    ) -> None:
+        """Apply latency and any fault to a GATT operation on ``client``."""
+        self.stats[operation] += 1
+        if not client.connected:
+            raise BleakError("Not connected")
+        fault = self.fault(operation)
+        if fault is not None:
+            self.stats[f"fault_{fault.kind}"] += 1
+            if fault.kind == FAULT_HANG:
+                await asyncio.sleep(fault.duration)
+                self.drop_link()
+                raise BleakError(f"{operation} {uuid_} timed out")
+            if fault.kind in (FAULT_DISCONNECT, FAULT_OUT_OF_RANGE):
+                await asyncio.sleep(self.delay(self.latency) / 2)
+                self.drop_link()
+                raise BleakError(f"Disconnected during {operation} of {uuid_}")
+            await asyncio.sleep(self.delay(self.latency))
+            raise BleakError(f"{operation} {uuid_} failed: Operation failed with ATT error")
+        await asyncio.sleep(self.delay(self.latency))
+        if not client.connected:
+            raise BleakError("Not connected")
+        if uuid_ not in self.characteristics:
+            raise BleakError(f"Characteristic {uuid_} was not found!")
+
+
+@dataclass(frozen=True)
+class SimulatedCharacteristic:
+    """The parts of a BleakGATTCharacteristic the survey tool uses."""
+
+    uuid: str
+    handle: int
+    properties: tuple[str, ...]
+    service_uuid: str
+
+
+@dataclass(frozen=True)
+class SimulatedService:
+    """The parts of a BleakGATTService the survey tool uses."""
+
+    uuid: str
+    characteristics: tuple[SimulatedCharacteristic, ...]
+
+
+class SimulatedBleakClient:
+    """The subset of BleakClient the integration uses, backed by a simulator."""
+
+    def __init__(self, purifier: SimulatedPurifier) -> None:
+        """Initialize the simulated client."""
+        self._purifier = purifier
+        self.connected = True
+
+    @property
+    def is_connected(self) -> bool:
+        """Return connection status."""
+        return self.connected
+
+    @property
+    def services(self) -> list[SimulatedService]:
+        """Return the FFD0 service with one characteristic per simulated value."""
+        return [
+            SimulatedService(
+                SERVICE_UUID,
+                tuple(
+                    SimulatedCharacteristic(uuid_, 0x0011 + 2 * index, ("read", "write"), SERVICE_UUID)
+                    for index, uuid_ in enumerate(self._purifier.characteristics)
+                ),
+            )
+        ]
+
+    async def read_gatt_char(self, char_specifier: Any, **kwargs: Any) -> bytearray:
+        """Read a characteristic, given by UUID or characteristic object."""
+        uuid_ = str(getattr(char_specifier, "uuid", char_specifier)).upper()
+        await self._purifier.run_operation(self, OP_READ, uuid_)
+        self._purifier.last_read[uuid_] = asyncio.get_running_loop().time()
+        return bytearray(self._purifier.characteristics[uuid_])
+
+    async def write_gatt_char(
+        self, char_specifier: Any, data: bytes, response: bool | None = None
+    ) -> None:
+        """Write a characteristic."""
+        uuid_ = str(char_specifier).upper()
+        await self._purifier.run_operation(self, OP_WRITE, uuid_)
+        self._purifier.characteristics[uuid_] = bytes(data)
+
+    async def disconnect(self) -> bool:
+        """Disconnect from the simulated device."""
+        if self.connected:
+            self._purifier.drop_link()
+        return True
+
+
+class _VirtualTimeSelector(selectors.BaseSelector):
+    """Selector that advances the loop clock instead of sleeping."""
+
+    def __init__(self, loop: VirtualClockEventLoop) -> None:
+        self._loop = loop
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj: Any, events: int, data: Any = None) -> selectors.SelectorKey:
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj: Any) -> selectors.SelectorKey:
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj: Any, events: int, data: Any = None) -> selectors.SelectorKey:
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout: float | None = None) -> list:
+        ready = self._selector.select(0)
+        if ready:
+            return ready
+        if timeout is None:
+            # Nothing is scheduled, so only real I/O (e.g. an executor) can wake us
+            return self._selector.select(None)
+        if timeout > 0:
+            self._loop.advance(timeout)
+        return []
+
+    def close(self) -> None:
+        self._selector.close()
+
+    def get_key(self, fileobj: Any) -> selectors.SelectorKey:
+        return self._selector.get_key(fileobj)
+
+    def get_map(self) -> Any:
+        return self._selector.get_map()
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """Event loop whose clock jumps ahead whenever it would otherwise sleep.
+
+    Timers, retry sleeps and poll intervals all complete instantly in wall
+    time while keeping their relative order, so runs are fast and
+    reproducible.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the loop at virtual time zero."""
+        self._virtual_now = 0.0
+        super().__init__(_VirtualTimeSelector(self))
+
+    def time(self) -> float:
+        """Return the virtual time."""
+        return self._virtual_now
+
+    def advance(self, seconds: float) -> None:
+        """Move the virtual clock forward."""
+        self._virtual_now += seconds
+
+
+def run(main: Coroutine[Any, Any, _T], *, virtual_time: bool = True) -> _T:
+    """Run ``main`` to completion, on a virtual clock unless disabled."""
+    loop = VirtualClockEventLoop() if virtual_time else asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+async def timed(awaitable: Awaitable[_T]) -> tuple[_T, float]:
+    """Await ``awaitable`` and return its result with the elapsed loop time."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await awaitable
+    return result, loop.time() - start
+
+
+class SimulatedConfigEntry:
+    """Stand-in for a ConfigEntry carrying what the coordinator reads."""
+
+    def __init__(
+        self, unique_id: str, *, title: str | None = None, options: dict | None = None
+    ) -> None:
+        """Initialize the entry."""
+        self.entry_id = uuid.uuid4().hex
+        self.unique_id = unique_id
+        self.title = title or unique_id
+        self.data: dict[str, Any] = {}
+        self.options: dict[str, Any] = dict(options or {})
+        self.pref_disable_polling = False
+        self._on_unload: list[Callable[[], Any]] = []
+        self._update_listeners: list[Callable[..., Awaitable[None]]] = []
+        self._background_tasks: set[asyncio.Task] = set()
+
+    def async_on_unload(self, func: Callable[[], Any]) -> None:
+        """Register a callback to run when the entry is unloaded."""
+        self._on_unload.append(func)
+
+    def async_create_background_task(
+        self, hass: Any, target: Coroutine[Any, Any, _T], name: str, eager_start: bool = True
+    ) -> asyncio.Task[_T]:
+        """Run ``target`` until it ends or the entry is unloaded."""
+        task = hass.async_create_background_task(target, name, eager_start)
+        if not task.done():
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def add_update_listener(
+        self, listener: Callable[..., Awaitable[None]]
+    ) -> Callable[[], None]:
+        """Register an options update listener."""
+        self._update_listeners.append(listener)
+        return functools.partial(self._update_listeners.remove, listener)
+
+    async def async_update_options(self, hass: Any, options: dict[str, Any]) -> None:
+        """Replace the options and notify listeners, like an options flow."""
+        self.options = {**self.options, **options}
+        for listener in list(self._update_listeners):
+            await listener(hass, self)
+
+    def async_unload(self) -> None:
+        """Run the registered unload callbacks and cancel background tasks."""
+        while self._on_unload:
+            self._on_unload.pop()()
+        for task in self._background_tasks:
+            task.cancel()
+
+
+async def async_create_hass() -> Any:
+    """Create a bare Home Assistant core bound to the running loop."""
+    from homeassistant.core import HomeAssistant
+
+    return HomeAssistant(tempfile.gettempdir())
+
+
+@dataclass(frozen=True)
+class SimulatedAdvertisement:
+    """The parts of a BluetoothServiceInfoBleak the coordinator reads."""
+
+    address: str
+    name: str
+    rssi: int | None
+
+
+class Transport(Protocol):
+    """A device the coordinator can be wired to, simulated or replayed."""
+
+    address: str
+    name: str
+    ble_device: BLEDevice
+
+    async def connect(self, device: BLEDevice) -> Any:
+        """Open a connection; used as the BLE client's connector."""
+
+
+def create_coordinator(
+    hass: Any,
+    purifier: Transport,
+    *,
+    scan_interval: int = DEFAULT_SCAN_INTERVAL,
+    options: dict[str, Any] | None = None,
+) -> Any:
+    """Create a real coordinator whose BLE client talks to ``purifier``."""
+    from homeassistant.components.bluetooth import BluetoothChange
+
+    from custom_components.xiaomi_car_air_purifier import coordinator as coordinator_module
+
+    def _register_callback(
+        hass: Any, callback: Callable[..., None], matcher: Any, mode: Any
+    ) -> Callable[[], None]:
+        # Like Home Assistant, replay the last advertisement straight away
+        advertisement = SimulatedAdvertisement(
+            purifier.address, purifier.name, getattr(purifier, "rssi", None)
+        )
+        callback(advertisement, BluetoothChange.ADVERTISEMENT)
+        return lambda: None
+
+    client_class = coordinator_module.XiaomiCarAirPurifierBLEClient
+
+    def _create_client(device: BLEDevice) -> Any:
+        client = client_class(device, connector=purifier.connect)
+        # Repeats and rate windows follow the loop clock, virtual or not
+        client.log.clock = asyncio.get_running_loop().time
+        return client
+
+    entry = SimulatedConfigEntry(
+        purifier.address,
+        title=purifier.name,
+        options={CONF_SCAN_INTERVAL: scan_interval, **(options or {})},
+    )
+    with patch.object(
+        coordinator_module.bluetooth,
+        "async_ble_device_from_address",
+        return_value=purifier.ble_device,
+    ), patch.object(
+        coordinator_module.bluetooth, "async_register_callback", _register_callback
+    ), patch.object(coordinator_module, "XiaomiCarAirPurifierBLEClient", _create_client):
+        return coordinator_module.XiaomiCarAirPurifierCoordinator(hass, entry)
+
+
+def simulated_address(index: int) -> str:
+    """Return a stable fake MAC address for the ``index``-th simulated device."""
+    return "F0:0D:00:{:02X}:{:02X}:{:02X}".format(
+        (index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF
+    )
+
+
+def worker_transport(address: str) -> Callable[[BLEDevice], Awaitable[Any]]:
+    """Connect the BLE worker to a simulated purifier.
+
+    For ``worker --transport tools.simulator:worker_transport``: called in
+    the worker process once per purifier it is given.
+    """
+    return SimulatedPurifier(address).connect
@@ -0,0 +1,426 @@
+"""Read every readable characteristic of a purifier and diff the snapshots.
+
+``run`` connects once and takes a snapshot of every readable characteristic
+on the device, in all services, every ``--interval`` seconds. Reads within a
+snapshot run concurrently, at most ``--parallel`` at a time, so a snapshot
+takes a few connection intervals rather than a round trip per
+characteristic. Snapshots are appended to a JSON Lines file and the changes
+since the previous one are printed as they come in:
+
+    python -m tools.survey run AA:BB:CC:DD:EE:FF --samples 120 --interval 5 --output drive.jsonl
+    python -m tools.survey run AA:BB:CC:DD:EE:FF --label "windows open" --output drive.jsonl
+    python -m tools.survey diff drive.jsonl
+
+``diff`` replays a file and ends with the bytes that changed, split into
+changes that came with a power or mode change and changes that did not. The
+latter are the candidates for air quality sensors.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime
+import json
+import logging
+from pathlib import Path
+import sys
+from typing import Any, NamedTuple, TextIO
+
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakError
+
+from custom_components.xiaomi_car_air_purifier.ble_client import (
+    Connector,
+    establish_bleak_connection,
+)
+from custom_components.xiaomi_car_air_purifier.const import (
+    MODE_CHAR_UUID,
+    MODE_NAMES,
+    POWER_CHAR_UUID,
+)
+from custom_components.xiaomi_car_air_purifier.gatt_log import describe_value, short_uuid
+
+from . import discovery
+
+DEFAULT_INTERVAL = 10.0  # seconds between snapshots
+DEFAULT_PARALLEL = 4  # concurrent reads within a snapshot
+DEFAULT_READ_TIMEOUT = 10.0  # seconds
+DEFAULT_SCAN_TIMEOUT = 10.0  # seconds
+
+_SNAPSHOT_KEYS = {"device", "sample", "time", "seconds", "characteristics"}
+
+
+class Change(NamedTuple):
+    """A characteristic whose value differs between two snapshots."""
+
+    handle: str
+    uuid: str
+    old: bytes | None  # None if it was not read successfully
+    new: bytes | None
+    changed: tuple[int, ...]  # indexes of the bytes that differ
+
+
+def _value(entry: dict[str, Any] | None) -> bytes | None:
+    if entry is None or "value" not in entry:
+        return None
+    return bytes.fromhex(entry["value"])
+
+
+def char_name(uuid: str) -> str:
+    """Return the 16-bit form of a base UUID, or the full UUID."""
+    return f"{short:04X}" if (short := short_uuid(uuid)) else uuid
+
+
+async def take_snapshot(
+    client: Any, *, parallel: int = DEFAULT_PARALLEL, timeout: float = DEFAULT_READ_TIMEOUT
+) -> dict[str, Any]:
+    """Read every readable characteristic of a connected BleakClient.
+
+    The result maps "0x<handle>" to the characteristic's UUID, service,
+    properties and either its value as hex or the error the read raised.
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(parallel)
+    readable = [
+        char
+        for service in client.services
+        for char in service.characteristics
+        if "read" in char.properties
+    ]
+
+    async def _read(char: Any) -> tuple[str, dict[str, Any]]:
+        entry: dict[str, Any] = {
+            "uuid": char.uuid.upper(),
+            "service": char.service_uuid.upper(),
+            "properties": sorted(char.properties),
+        }
+        async with slots:
+            try:
+                value = await asyncio.wait_for(client.read_gatt_char(char), timeout)
+            except TimeoutError:
+                entry["error"] = f"timed out after {timeout}s"
+            except BleakError as err:
+                entry["error"] = str(err)
+            else:
+                entry["value"] = bytes(value).hex()
+        return f"0x{char.handle:04X}", entry
+
+    start = loop.time()
+    entries = await asyncio.gather(*(_read(char) for char in readable))
+    return {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "seconds": round(loop.time() - start, 3),
+        "characteristics": dict(sorted(entries)),
+    }
+
+
+def diff_snapshots(previous: dict[str, Any], current: dict[str, Any]) -> list[Change]:
+    """Return the characteristics whose value differs between two snapshots."""
+    before = previous["characteristics"]
+    after = current["characteristics"]
+    changes = []
+    for handle in sorted(before.keys() | after.keys()):
+        old, new = _value(before.get(handle)), _value(after.get(handle))
+        if old == new:
+            continue
+        if old is None or new is None:
+            changed: tuple[int, ...] = ()
+        else:
+            changed = tuple(
+                index
+                for index in range(max(len(old), len(new)))
+                if index >= len(old) or index >= len(new) or old[index] != new[index]
+            )
+        entry = after.get(handle) or before[handle]
+        changes.append(Change(handle, entry["uuid"], old, new, changed))
+    return changes
+
+
+def status(snapshot: dict[str, Any]) -> tuple[bool | None, str | None]:
+    """Return the power state and mode name recorded in a snapshot."""
+    power = mode = None
+    for entry in snapshot["characteristics"].values():
+        value = _value(entry)
+        if not value:
+            continue
+        if entry["uuid"] == POWER_CHAR_UUID:
+            power = bool(value[0])
+        elif entry["uuid"] == MODE_CHAR_UUID:
+            mode = MODE_NAMES.get(value[0], "Unknown")
+    return power, mode
+
+
+def format_value(value: bytes | None, changed: Iterable[int] = ()) -> str:
+    """Return hex bytes with the changed ones in brackets."""
+    if value is None:
+        return "(unreadable)"
+    if not value:
+        return "(empty)"
+    changed = set(changed)
+    return " ".join(
+        f"[{byte:02x}]" if index in changed else f"{byte:02x}" for index, byte in enumerate(value)
+    )
+
+
+def _header(snapshot: dict[str, Any], previous: dict[str, Any] | None) -> str:
+    power, mode = status(snapshot)
+    parts = [f"# {snapshot['device']} sample {snapshot['sample']} at {snapshot['time']}"]
+    if previous is not None:
+        elapsed = datetime.fromisoformat(snapshot["time"]) - datetime.fromisoformat(
+            previous["time"]
+        )
+        parts.append(f"(+{elapsed.total_seconds():.1f}s)")
+    if power is not None:
+        parts.append(f"power {'ON' if power else 'OFF'}")
+    if mode is not None:
+        parts.append(f"mode {mode}")
+    if snapshot.get("label"):
+        parts.append(f"[{snapshot['label']}]")
+    parts.append(f"read in {snapshot['seconds'] * 1e3:.0f} ms")
+    return " ".join(parts)
+
+
+def print_snapshot(snapshot: dict[str, Any], previous: dict[str, Any] | None) -> list[Change]:
+    """Print a snapshot in full, or its changes since ``previous``."""
+    print(_header(snapshot, previous))
+    if previous is None:
+        for handle, entry in snapshot["characteristics"].items():
+            value = _value(entry)
+            short = short_uuid(entry["uuid"])
+            detail = (
+                describe_value(short, value) if value is not None else f"error: {entry['error']}"
+            )
+            properties = ",".join(entry["properties"])
+            print(f"    {handle} {char_name(entry['uuid']):<8} {properties:<28} {detail}")
+        return []
+    changes = diff_snapshots(previous, snapshot)
+    for change in changes:
+        print(
+            f"    {change.handle} {char_name(change.uuid):<8} "
+            f"{format_value(change.old)}  ->  {format_value(change.new, change.changed)}"
+        )
+    if not changes:
+        print("    (no changes)")
+    return changes
+
+
+class ByteStats:
+    """How often each byte of each characteristic changed."""
+
+    def __init__(self) -> None:
+        self.with_state: Counter[tuple[str, str, int]] = Counter()
+        self.without_state: Counter[tuple[str, str, int]] = Counter()
+
+    def add(
+        self, previous: dict[str, Any], current: dict[str, Any], changes: list[Change]
+    ) -> None:
+        """Count the bytes in ``changes``, by whether power or mode changed too."""
+        counter = self.with_state if status(previous) != status(current) else self.without_state
+        for change in changes:
+            for index in change.changed:
+                counter[(current["device"], change.uuid, index)] += 1
+
+    def print(self) -> None:
+        keys = sorted(self.with_state.keys() | self.without_state.keys())
+        if not keys:
+            print("# no byte changed")
+            return
+        print("# changed bytes: total (with a power/mode change, without)")
+        for device, uuid, index in keys:
+            key = (device, uuid, index)
+            with_state, without_state = self.with_state[key], self.without_state[key]
+            print(
+                f"    {device} {char_name(uuid):<8} byte {index:<3} "
+                f"{with_state + without_state:5d} ({with_state}, {without_state})"
+            )
+
+
+async def run_survey(
+    device: BLEDevice,
+    connector: Connector,
+    emit: Callable[[dict[str, Any]], None],
+    *,
+    samples: int,
+    interval: float,
+    parallel: int,
+    timeout: float,
+    label: str | None = None,
+) -> None:
+    """Take ``samples`` snapshots ``interval`` seconds apart over one connection.
+
+    The connection is only reopened if it drops between snapshots.
+    """
+    loop = asyncio.get_running_loop()
+    client: Any = None
+    try:
+        for sample in range(samples):
+            started = loop.time()
+            if client is None or not client.is_connected:
+                try:
+                    client = await connector(device)
+                except BleakError as err:
+                    print(f"# {device.address}: connect failed: {err}", file=sys.stderr)
+                    client = None
+            if client is not None:
+                snapshot = {"device": device.address, "sample": sample}
+                if label:
+                    snapshot["label"] = label
+                snapshot.update(await take_snapshot(client, parallel=parallel, timeout=timeout))
+                emit(snapshot)
+            if sample + 1 < samples:
+                await asyncio.sleep(max(0.0, started + interval - loop.time()))
+    finally:
+        if client is not None and client.is_connected:
+            await client.disconnect()
+
+
+def iter_snapshots(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Yield the snapshots of a survey file in order.
+
+    A last line cut short, as left by an interrupted ``run``, is skipped with
+    a warning; any other malformed line raises ValueError.
+    """
+    with Path(path).open() as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                snapshot = json.loads(line)
+            except ValueError as err:
+                if not line.endswith("\n"):
+                    print(f"# {path}:{number}: skipping truncated last line", file=sys.stderr)
+                    return
+                raise ValueError(f"{path}:{number}: malformed snapshot: {err}") from None
+            if not isinstance(snapshot, dict) or not _SNAPSHOT_KEYS <= snapshot.keys():
+                raise ValueError(f"{path}:{number}: not a survey snapshot")
+            yield snapshot
+
+
+def diff(path: str) -> None:
+    """Print a survey file as consecutive diffs, then the per-byte counts."""
+    previous: dict[str, dict[str, Any]] = {}
+    stats = ByteStats()
+    for snapshot in iter_snapshots(path):
+        before = previous.get(snapshot["device"])
+        changes = print_snapshot(snapshot, before)
+        if before is not None:
+            stats.add(before, snapshot, changes)
+        previous[snapshot["device"]] = snapshot
+    stats.print()
+
+
+async def _async_run(args: argparse.Namespace) -> int:
+    """Resolve the purifier and run the survey."""
+    try:
+        output = Path(args.output).open("a") if args.output else None
+    except OSError as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+    try:
+        return await _async_survey(args, output)
+    finally:
+        if output is not None:
+            output.close()
+
+
+async def _async_survey(args: argparse.Namespace, output: TextIO | None) -> int:
+    """Survey the purifier, appending the snapshots to ``output``."""
+    if args.simulate:
+        from .simulator import SimulatedPurifier
+
+        purifier = SimulatedPurifier(args.address, seed=0)
+        device, connector = purifier.ble_device, purifier.connect
+    else:
+        found = await discovery.resolve([args.address], timeout=args.scan_timeout)
+        if (resolved := found.get(args.address)) is None:
+            print(f"{args.address} not found within {args.scan_timeout}s", file=sys.stderr)
+            return 1
+        device, connector = resolved.device, establish_bleak_connection
+
+    previous: dict[str, Any] | None = None
+    stats = ByteStats()
+
+    def _emit(snapshot: dict[str, Any]) -> None:
+        nonlocal previous
+        if output is not None:
+            output.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            output.flush()
+        changes = print_snapshot(snapshot, previous)
+        if previous is not None:
+            stats.add(previous, snapshot, changes)
+        previous = snapshot
+
+    await run_survey(
+        device,
+        connector,
+        _emit,
+        samples=args.samples,
+        interval=args.interval,
+        parallel=args.parallel,
+        timeout=args.timeout,
+        label=args.label,
+    )
+    if args.samples > 1:
+        stats.print()
+    return 0 if previous is not None else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="take snapshots of a purifier")
+    run_parser.add_argument("address", metavar="MAC")
+    run_parser.add_argument("--samples", type=int, default=1, help="number of snapshots")
+    run_parser.add_argument(
+        "--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between snapshots"
+    )
+    run_parser.add_argument(
+        "--parallel", type=int, default=DEFAULT_PARALLEL, help="concurrent reads per snapshot"
+    )
+    run_parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_READ_TIMEOUT, help="seconds per read"
+    )
+    run_parser.add_argument(
+        "--scan-timeout", type=float, default=DEFAULT_SCAN_TIMEOUT, help="seconds to look for it"
+    )
+    run_parser.add_argument("--label", help="note stored with every snapshot of this run")
+    run_parser.add_argument("--output", help="append snapshots to this JSON Lines file")
+    run_parser.add_argument(
+        "--simulate", action="store_true", help="survey a simulated purifier"
+    )
+    run_parser.add_argument("--verbose", action="store_true", help="show Bluetooth logs")
+    diff_parser = commands.add_parser("diff", help="print the changes in a survey file")
+    diff_parser.add_argument("survey")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        try:
+            diff(args.survey)
+        except BrokenPipeError:
+            pass
+        except (OSError, ValueError) as err:
+            print(f"error: {err}", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.samples < 1 or args.parallel < 1:
+        parser.error("--samples and --parallel must be at least 1")
+    args.address = args.address.upper()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.CRITICAL,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    try:
+        return asyncio.run(_async_run(args))
+    except KeyboardInterrupt:
+        return 130
+    except (BleakError, OSError) as err:
+        print(f"Bluetooth error: {err}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())